@@ -1,9 +1,18 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
-from api.routes import events, registrations, miniapp
+from api.routes import events, registrations, miniapp, profiling
+from config import settings
 from database.database import init_db
+from database.instrumentation import check_query_budget, start_query_tracking, stop_query_tracking
+from utils import metrics, loop_watchdog
+from utils.logging_setup import setup_logging
+
+# Логи приложения - через очередь (uvicorn настраивает только свои логгеры)
+setup_logging()
 
 app = FastAPI(title="Event Registration API", version="1.0.0")
 
@@ -16,18 +25,75 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Профилирование по запросу (/api/profiling); пока сессии нет - одна проверка на запрос
+app.add_middleware(profiling.ProfilingMiddleware)
+
+
+class LoopWatchdogMiddleware:
+    """Привязывает задачу запроса к маршруту для отчётов сторожа event loop'а.
+    
+    Добавлен раньше metrics_middleware, т.е. работает внутри задачи, которую создаёт
+    BaseHTTPMiddleware, - там же, где выполняется async-обработчик.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with loop_watchdog.track(f"{scope['method']} {scope['path']}", "http"):
+            await self.app(scope, receive, send)
+
+
+if settings.LOOP_WATCHDOG_ENABLED:
+    app.add_middleware(LoopWatchdogMiddleware)
+
+    @app.on_event("startup")
+    async def start_watchdog():
+        loop_watchdog.start_loop_watchdog(settings.LOOP_WATCHDOG_INTERVAL_MS, settings.LOOP_BLOCK_THRESHOLD_MS)
+
+    @app.on_event("shutdown")
+    async def stop_watchdog():
+        loop_watchdog.stop_loop_watchdog()
+
+if settings.METRICS_ENABLED:
+    metrics.register_default_collectors()
+
+    @app.middleware("http")
+    async def metrics_middleware(request: Request, call_next):
+        """Время запроса и число SQL-запросов по маршрутам"""
+        # Маршрут известен только после роутинга - до этого в slow-query логе будет путь
+        stats, token = start_query_tracking(f"{request.method} {request.url.path}")
+        started = time.perf_counter()
+        status = "500"
+        try:
+            response = await call_next(request)
+            status = f"{response.status_code // 100}xx"
+            return response
+        finally:
+            stop_query_tracking(token)
+            route = request.scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            metrics.HTTP_SECONDS.labels(request.method, path, status).observe(time.perf_counter() - started)
+            metrics.HTTP_QUERIES.labels(path).observe(stats.count)
+            check_query_budget(stats, f"{request.method} {path}")
+
 # Статические файлы для мини-приложения
 miniapp_path = Path(__file__).parent.parent / "miniapp"
 if miniapp_path.exists():
     app.mount("/static", StaticFiles(directory=str(miniapp_path)), name="static")
 
-# Инициализация БД
-init_db()
+# Проверка схемы БД - при старте сервера, а не при импорте модуля; миграции применяет бот
+@app.on_event("startup")
+def check_database_schema():
+    init_db(upgrade=False)
 
 # Регистрация роутеров
 app.include_router(events.router)
 app.include_router(registrations.router)
 app.include_router(miniapp.router)
+app.include_router(profiling.router)
 
 
 @app.get("/")
@@ -39,3 +105,9 @@ async def root():
 async def health():
     return {"status": "ok"}
 
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Метрики в текстовом формате Prometheus (sync: хуки читают БД в пуле потоков)"""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
@@ -1,3 +1,4 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
@@ -6,7 +7,8 @@ from database.models import Event, EventStatus, EventField, FieldType
 from api.models.event import EventResponse, EventListResponse
 from typing import List
 from config import settings
-from aiogram import Bot
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/events", tags=["events"])
 
@@ -18,12 +20,11 @@ async def get_active_events(db: Session = Depends(get_db)):
         Event.status.in_([EventStatus.APPROVED, EventStatus.ACTIVE])
     ).order_by(Event.date_time.asc()).all()
     
-    # Логирование для отладки
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.info(f"Найдено событий: {len(events)}")
-    for event in events:
-        logger.info(f"Событие: {event.id} - {event.title} - {event.status.value}")
+    # Логирование для отладки (на каждый запрос мини-приложения - только DEBUG)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Найдено событий: {len(events)}")
+        for event in events:
+            logger.debug(f"Событие: {event.id} - {event.title} - {event.status.value}")
     
     return EventListResponse(events=[
             EventResponse(
@@ -59,13 +60,14 @@ async def get_event_photo(event_id: int, db: Session = Depends(get_db)):
     if event.status not in [EventStatus.APPROVED, EventStatus.ACTIVE]:
         raise HTTPException(status_code=403, detail="Событие недоступно")
     
-    # Получаем URL файла через Telegram Bot API
+    # Получаем URL файла через Telegram Bot API (aiogram грузится ~2 с - только при первом запросе фото)
+    from bot.utils.telegram import create_bot, file_url
+    
     try:
-        bot = Bot(token=settings.BOT_TOKEN)
+        bot = create_bot()
         file = await bot.get_file(event.photo_file_id)
-        file_url = f"https://api.telegram.org/file/bot{settings.BOT_TOKEN}/{file.file_path}"
         await bot.session.close()
-        return RedirectResponse(url=file_url)
+        return RedirectResponse(url=file_url(file.file_path))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения фото: {str(e)}")
 
@@ -0,0 +1,111 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response
+from database.models import User
+from api.routes.registrations import get_current_user
+from config import settings
+from utils import profiling
+from utils.permissions import is_admin
+
+router = APIRouter(prefix="/api/profiling", tags=["profiling"])
+
+
+class ProfilingMiddleware:
+    """ASGI-middleware: отмечает запросы, попавшие под фильтр активной сессии.
+    
+    Чистый ASGI, а не @app.middleware("http"): пока сессии нет, стоимость - одна проверка.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        session = profiling.active_session()
+        if session is None or scope["type"] != "http" or not session.matches(scope["path"]):
+            return await self.app(scope, receive, send)
+        with session.track():
+            await self.app(scope, receive, send)
+
+
+async def get_admin_user(user: User = Depends(get_current_user)) -> User:
+    if not is_admin(user) and user.telegram_id not in settings.admin_ids:
+        raise HTTPException(status_code=403, detail="Доступно только администраторам")
+    return user
+
+
+def _status(session) -> dict:
+    return {
+        "prefix": session.prefix,
+        "requests": session.updates,
+        "samples": sum(session.samples.values()),
+        "finished": session.finished,
+        "started_at": session.started_at.isoformat(),
+    }
+
+
+@router.post("/start")
+async def start_profiling(
+    requests: int = 0,
+    seconds: int = 0,
+    prefix: str = "",
+    user: User = Depends(get_admin_user)
+):
+    """Профилировать следующие `requests` запросов или `seconds` секунд с путём, начинающимся с `prefix`.
+    
+    Результат (collapsed stacks) отправляется администратору документом в Telegram
+    и доступен через GET /api/profiling/result.
+    """
+    if not requests and not seconds:
+        raise HTTPException(status_code=400, detail="Укажите requests или seconds")
+    chat_id = user.telegram_id
+    
+    async def send_result(session):
+        if not session.samples:
+            return
+        # aiogram не импортируется при старте API
+        from aiogram.types import BufferedInputFile
+        from bot.utils.telegram import create_bot
+        
+        bot = create_bot()
+        try:
+            document = BufferedInputFile(
+                profiling.render_collapsed(session), filename=profiling.result_filename(session, "api")
+            )
+            await bot.send_document(chat_id, document, caption=session.describe())
+        finally:
+            await bot.session.close()
+    
+    try:
+        session = profiling.start_profiling(
+            prefix=prefix,
+            updates=min(requests, settings.PROFILING_MAX_UPDATES),
+            seconds=min(seconds, settings.PROFILING_MAX_SECONDS),
+            interval_ms=settings.PROFILING_INTERVAL_MS,
+            on_finish=send_result,
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _status(session)
+
+
+@router.post("/stop")
+async def stop_profiling(user: User = Depends(get_admin_user)):
+    session = profiling.stop_profiling()
+    if session is None:
+        raise HTTPException(status_code=404, detail="Профилирование не запущено")
+    return _status(session)
+
+
+@router.get("/result")
+async def get_result(user: User = Depends(get_admin_user)):
+    """Последний результат в формате collapsed stacks"""
+    if profiling.active_session() is not None:
+        raise HTTPException(status_code=409, detail="Профилирование ещё идёт")
+    session = profiling.last_session()
+    if session is None:
+        raise HTTPException(status_code=404, detail="Результатов нет")
+    filename = profiling.result_filename(session, "api")
+    return Response(
+        profiling.render_collapsed(session),
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,78 @@
+"""Наполнение БД для бенчмарков через Core bulk insert"""
+from datetime import timedelta
+from sqlalchemy import insert, select
+from database.models import (
+    Base, User, UserRole, Event, EventStatus, EventField, FieldType,
+    EventNotification, Registration, ReminderJob
+)
+from utils.timezone import get_utc_now
+
+ADMIN_TELEGRAM_ID = 1
+USER_TELEGRAM_ID_BASE = 1_000_000
+CHUNK = 5000
+
+FIELDS = (
+    ("Имя", FieldType.TEXT, None),
+    ("Email", FieldType.EMAIL, None),
+    ("Телефон", FieldType.PHONE, None),
+)
+FIELD_VALUES = ("Участник", "user@example.com", "+7 900 000-00-00")
+
+
+def _insert(conn, model, rows):
+    for start in range(0, len(rows), CHUNK):
+        conn.execute(insert(model.__table__), rows[start:start + CHUNK])
+
+
+def reset(engine):
+    """Пустая схема с одним администратором"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), {
+            "telegram_id": ADMIN_TELEGRAM_ID, "full_name": "Admin", "role": UserRole.ADMIN, "created_at": get_utc_now(),
+        })
+
+
+def seed_event(engine, registrations: int, due_reminder: bool = False, title: str = "Бенчмарк") -> int:
+    """
+    Событие через неделю с полями, одной настройкой уведомлений и `registrations`
+    регистрациями; `due_reminder` - с наступившим неразосланным напоминанием.
+    Возвращает id события.
+    """
+    now = get_utc_now()
+    with engine.begin() as conn:
+        admin_id = conn.execute(select(User.id).where(User.telegram_id == ADMIN_TELEGRAM_ID)).scalar_one()
+
+        event_id = conn.execute(insert(Event.__table__), {
+            "title": title, "description": "Описание события", "date_time": now + timedelta(days=7),
+            "status": EventStatus.ACTIVE, "created_by": admin_id,
+            "archived_registrations_count": 0, "created_at": now, "updated_at": now,
+        }).inserted_primary_key[0]
+        _insert(conn, EventField, [
+            {"event_id": event_id, "field_name": name, "field_type": field_type,
+             "required": True, "options": options, "order": order}
+            for order, (name, field_type, options) in enumerate(FIELDS)
+        ])
+        conn.execute(insert(EventNotification.__table__), {
+            "event_id": event_id, "custom_time": 60, "enabled": True, "include_buttons": True,
+        })
+
+        base = USER_TELEGRAM_ID_BASE + event_id * 10_000_000
+        _insert(conn, User, [
+            {"telegram_id": base + i, "username": f"user{i}", "full_name": f"User {i}",
+             "role": UserRole.USER, "created_at": now}
+            for i in range(registrations)
+        ])
+        data = dict(zip((name for name, _, _ in FIELDS), FIELD_VALUES))
+        _insert(conn, Registration, [
+            {"event_id": event_id, "user_telegram_id": base + i, "data_json": data, "created_at": now}
+            for i in range(registrations)
+        ])
+
+        if due_reminder:
+            conn.execute(insert(ReminderJob.__table__), {
+                "event_id": event_id, "notification_type": "custom",
+                "scheduled_time": now - timedelta(minutes=1), "sent": False, "created_at": now,
+            })
+    return event_id
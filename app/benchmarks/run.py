@@ -0,0 +1,386 @@
+"""
+Бенчмарки бота: handlers через настоящий Dispatcher, планировщик уведомлений и экспорт.
+
+Апдейты aiogram прогоняются через `create_dispatcher()` (те же роутеры и AuthMiddleware,
+что и в bot/main.py), а Bot API подменяется сессией без сети. Для каждого сценария
+считаются p50/p99 задержки и число SQL-запросов на апдейт; для планировщика и экспорта -
+пропускная способность при разном числе регистраций.
+
+БД всегда временная (SQLite) или берётся из BENCH_DATABASE_URL - таблицы в ней пересоздаются.
+
+Запуск из каталога app/:
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --sizes 1000 --iterations 50 --baseline bench.json
+    python -m benchmarks.run --sizes 1000 --iterations 20 --check-budgets
+"""
+import os
+import tempfile
+
+# Настройки читаются при импорте модулей приложения - задаём их до импортов
+_tmp_dir = tempfile.mkdtemp(prefix="mclassbot-bench-")
+os.environ["DATABASE_URL"] = os.environ.get("BENCH_DATABASE_URL") or f"sqlite:///{_tmp_dir}/bench.db"
+os.environ["BOT_TOKEN"] = "123456:benchmark"
+os.environ["ADMIN_USER_IDS"] = "1"
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import shutil
+import sys
+import time
+from datetime import datetime
+from aiogram import Bot
+from aiogram.types import Update
+from sqlalchemy import event as sa_event, select
+from benchmarks import dataset
+from benchmarks.fake_telegram import FakeTelegramSession
+from bot.main import create_dispatcher
+from database.database import engine, background_engine, SessionLocal
+from database.instrumentation import budget_violations, start_query_tracking, stop_query_tracking
+from database.models import Registration
+from services import outbox, scheduler
+from utils.export import export_registrations_to_csv, export_registrations_to_excel
+from utils.logging_setup import TEXT_FORMAT, setup_logging, shutdown_logging
+
+FLOW_EVENT_REGISTRATIONS = 1000
+FLOW_USER_ID_BASE = 500_000
+
+# Бюджеты SQL-запросов на один апдейт сценария для --check-budgets:
+# (запросов, повторов одного statement'а)
+FLOW_QUERY_BUDGETS = {
+    "start": (10, 3),
+    "event_detail": (10, 3),
+    "registration_form": (30, 5),
+    "admin_registrations": (10, 3),
+    "confirm_participation": (10, 3),
+}
+
+
+class QueryCounter:
+    """Счётчик SQL-запросов по обоим пулам"""
+
+    def __init__(self, *engines):
+        self.count = 0
+        for target in engines:
+            sa_event.listen(target, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, queries, over_budget, budget_example) -> dict:
+    return {
+        "updates": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "queries_per_update": sum(queries) / len(queries),
+        "max_queries_per_update": max(queries),
+        "updates_over_budget": over_budget,
+        "budget_example": budget_example,
+    }
+
+
+def _user(telegram_id: int) -> dict:
+    return {"id": telegram_id, "is_bot": False, "first_name": "User", "username": f"u{telegram_id}"}
+
+
+def _chat(telegram_id: int) -> dict:
+    return {"id": telegram_id, "type": "private"}
+
+
+class UpdateFactory:
+    def __init__(self):
+        self.update_id = 0
+
+    def _next(self) -> int:
+        self.update_id += 1
+        return self.update_id
+
+    def message(self, telegram_id: int, text: str) -> Update:
+        update_id = self._next()
+        return Update.model_validate({
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id, "date": int(time.time()), "text": text,
+                "chat": _chat(telegram_id), "from": _user(telegram_id),
+            },
+        })
+
+    def callback(self, telegram_id: int, data: str) -> Update:
+        update_id = self._next()
+        return Update.model_validate({
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id), "chat_instance": "bench", "data": data, "from": _user(telegram_id),
+                "message": {
+                    "message_id": update_id, "date": int(time.time()), "text": "...",
+                    "chat": _chat(telegram_id), "from": _user(telegram_id),
+                },
+            },
+        })
+
+
+async def run_flows(iterations: int) -> dict:
+    """Основные сценарии: /start, карточка события, анкета регистрации, просмотр регистраций админом"""
+    dataset.reset(engine)
+    event_id = dataset.seed_event(engine, FLOW_EVENT_REGISTRATIONS)
+    with engine.connect() as conn:
+        registrations = conn.execute(
+            select(Registration.id, Registration.user_telegram_id)
+            .where(Registration.event_id == event_id)
+            .order_by(Registration.id)
+        ).all()
+
+    session = FakeTelegramSession()
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = create_dispatcher()
+    counter = QueryCounter(engine, background_engine)
+    updates = UpdateFactory()
+
+    flows = {
+        "start": lambda i: [updates.message(FLOW_USER_ID_BASE + i, "/start")],
+        "event_detail": lambda i: [updates.callback(FLOW_USER_ID_BASE + i, f"user_event_{event_id}")],
+        "registration_form": lambda i: (
+            [updates.callback(FLOW_USER_ID_BASE + i, f"user_register_{event_id}")]
+            + [updates.message(FLOW_USER_ID_BASE + i, value) for value in dataset.FIELD_VALUES]
+        ),
+        "admin_registrations": lambda i: [
+            updates.callback(dataset.ADMIN_TELEGRAM_ID, f"admin_registrations_{event_id}")
+        ],
+        # Ответ на напоминание: уведомление организаторов идёт через буфер сводок
+        "confirm_participation": lambda i: [
+            updates.callback(registrations[i][1], f"confirm_participation_{registrations[i][0]}")
+        ],
+    }
+
+    results = {}
+    for name, make_updates in flows.items():
+        max_queries, max_repeats = FLOW_QUERY_BUDGETS[name]
+        latencies, queries = [], []
+        over_budget, budget_example = 0, []
+        for i in range(iterations):
+            for update in make_updates(i):
+                before = counter.count
+                stats, token = start_query_tracking(name)
+                started = time.perf_counter()
+                try:
+                    await dp.feed_update(bot, update)
+                finally:
+                    stop_query_tracking(token)
+                latencies.append(time.perf_counter() - started)
+                queries.append(counter.count - before)
+                problems = budget_violations(stats, max_queries=max_queries, max_repeats=max_repeats)
+                if problems:
+                    over_budget += 1
+                    budget_example = budget_example or problems
+        results[name] = summarize(latencies, queries, over_budget, budget_example)
+        print(
+            f"{name:<22} p50={results[name]['p50_ms']:7.2f} ms  p99={results[name]['p99_ms']:7.2f} ms  "
+            f"queries/update={results[name]['queries_per_update']:.1f}"
+        )
+        if over_budget:
+            print(f"{'':<22} over budget: {over_budget} updates, e.g. {'; '.join(budget_example)[:300]}")
+    results["api_calls"] = dict(session.calls)
+    await bot.session.close()
+    return results
+
+
+async def run_scheduler(size: int) -> dict:
+    """Напоминание событию с `size` регистрациями: тик check_and_send_notifications и проход outbox"""
+    dataset.reset(engine)
+    dataset.seed_event(engine, size, due_reminder=True)
+
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=FakeTelegramSession())
+    scheduler.set_bot_instance(bot)
+    counter = QueryCounter(background_engine)
+
+    started = time.perf_counter()
+    await scheduler.check_and_send_notifications()
+    # Тик только запускает outbox в фоне; этот проход начинается раньше фонового и ждёт доставки
+    await outbox.drain(bot)
+    elapsed = time.perf_counter() - started
+    await bot.session.close()
+    return {
+        "notifications": size,
+        "seconds": elapsed,
+        "per_second": size / elapsed,
+        "queries_per_notification": counter.count / size,
+    }
+
+
+def run_exports(size: int) -> dict:
+    """Экспорт события с `size` регистрациями в CSV и Excel"""
+    dataset.reset(engine)
+    event_id = dataset.seed_event(engine, size)
+
+    results = {}
+    for name, export in (("csv", export_registrations_to_csv), ("excel", export_registrations_to_excel)):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            export(db, event_id)
+            elapsed = time.perf_counter() - started
+        finally:
+            db.close()
+        results[name] = {"seconds": elapsed, "rows_per_second": size / elapsed}
+    return results
+
+
+def run_logging(size: int) -> dict:
+    """
+    DEBUG-строка на каждую из `size` регистраций события - как в горячем цикле по получателям:
+    синхронный StreamHandler против очереди с лимитами из настроек.
+    Вывод идёт в /dev/null - замеряется цена самого логирования, а не терминала.
+    """
+    root = logging.getLogger()
+    hot_logger = logging.getLogger("services.notification_service")
+    saved_level = root.level
+    results = {}
+    with open(os.devnull, "w") as sink:
+        for pipeline in ("sync", "queue"):
+            dataset.reset(engine)
+            event_id = dataset.seed_event(engine, size)
+            if pipeline == "sync":
+                handler = logging.StreamHandler(sink)
+                handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+                root.handlers = [handler]
+            else:
+                setup_logging(level="WARNING", fmt="json", stream=sink)
+            # Только этот логгер: DEBUG на корне включил бы и логи SQL из SQLAlchemy
+            hot_logger.setLevel(logging.DEBUG)
+            db = SessionLocal()
+            try:
+                registration_ids = db.execute(
+                    select(Registration.id).where(Registration.event_id == event_id)
+                ).scalars().all()
+                started = time.perf_counter()
+                for registration_id in registration_ids:
+                    hot_logger.debug(
+                        "Queued reminder for registration %s, event %s", registration_id, event_id
+                    )
+                elapsed = time.perf_counter() - started
+            finally:
+                db.close()
+                shutdown_logging()
+                hot_logger.setLevel(logging.NOTSET)
+            results[pipeline] = {"seconds": elapsed, "per_second": size / elapsed}
+    # Обычная очередь в stderr для остальных замеров
+    setup_logging(level=logging.getLevelName(saved_level))
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Сравнить с прошлым прогоном: задержки не должны вырасти, а пропускная способность - упасть"""
+    regressions = []
+
+    def check(path: str, new: float, old: float, lower_is_better: bool):
+        if not old:
+            return
+        change = (new - old) / old if lower_is_better else (old - new) / old
+        marker = "REGRESSION" if change > tolerance else "ok"
+        print(f"{marker:<10} {path}: {old:.3f} -> {new:.3f}")
+        if change > tolerance:
+            regressions.append(path)
+
+    for name, flow in results["flows"].items():
+        old = baseline.get("flows", {}).get(name)
+        if name == "api_calls" or not old:
+            continue
+        for key in ("p50_ms", "p99_ms", "queries_per_update"):
+            check(f"flows.{name}.{key}", flow[key], old[key], lower_is_better=True)
+    for size, data in results["scheduler"].items():
+        old = baseline.get("scheduler", {}).get(size)
+        if old:
+            check(f"scheduler.{size}.per_second", data["per_second"], old["per_second"], lower_is_better=False)
+    for pipeline, data in results.get("logging", {}).items():
+        old = baseline.get("logging", {}).get(pipeline)
+        if old:
+            check(f"logging.{pipeline}.per_second", data["per_second"], old["per_second"], lower_is_better=False)
+    for size, data in results["exports"].items():
+        for kind, values in data.items():
+            old = baseline.get("exports", {}).get(size, {}).get(kind)
+            if old:
+                check(f"exports.{size}.{kind}.rows_per_second", values["rows_per_second"],
+                      old["rows_per_second"], lower_is_better=False)
+    return regressions
+
+
+async def run(args) -> dict:
+    results = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "iterations": args.iterations,
+        },
+        "flows": await run_flows(args.iterations),
+        "scheduler": {},
+        "exports": {},
+        "logging": run_logging(FLOW_EVENT_REGISTRATIONS),
+    }
+    for pipeline, data in results["logging"].items():
+        print(f"scheduling with {pipeline:<5} logging: {data['per_second']:9.1f} registrations/s")
+    for size in args.sizes:
+        results["scheduler"][str(size)] = data = await run_scheduler(size)
+        print(f"scheduler  {size:>7} notifications: {data['per_second']:9.1f}/s  "
+              f"queries/notification={data['queries_per_notification']:.1f}")
+        results["exports"][str(size)] = data = run_exports(size)
+        print(f"export     {size:>7} registrations: csv {data['csv']['rows_per_second']:9.1f} rows/s, "
+              f"excel {data['excel']['rows_per_second']:9.1f} rows/s")
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарки handlers, планировщика и экспорта")
+    parser.add_argument("--iterations", type=int, default=200, help="Апдейтов на сценарий")
+    parser.add_argument(
+        "--sizes", type=lambda value: [int(v) for v in value.split(",")], default=[1000, 10000, 100000],
+        help="Число регистраций для планировщика и экспорта, через запятую"
+    )
+    parser.add_argument("--output", default="benchmark_results.json", help="Файл с результатами (JSON)")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимое ухудшение (доля)")
+    parser.add_argument(
+        "--check-budgets", action="store_true",
+        help="Завершиться с ошибкой, если сценарий превысил FLOW_QUERY_BUDGETS"
+    )
+    args = parser.parse_args(argv)
+
+    # Handlers и планировщик пишут INFO на каждое действие - это исказило бы замеры
+    # (setup_logging уже вызван при импорте bot.main, поэтому меняем уровень напрямую).
+    # Предупреждения о бюджетах из MetricsMiddleware дублируют итоговый отчёт
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("database.instrumentation").setLevel(logging.ERROR)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        engine.dispose()
+        background_engine.dispose()
+        shutil.rmtree(_tmp_dir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {args.output}")
+
+    failed = False
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failed = bool(compare(results, json.load(f), args.tolerance))
+    if args.check_budgets:
+        over_budget = [name for name in FLOW_QUERY_BUDGETS if results["flows"][name]["updates_over_budget"]]
+        if over_budget:
+            print(f"Превышен бюджет SQL-запросов: {', '.join(over_budget)}")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
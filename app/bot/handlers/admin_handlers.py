@@ -1,8 +1,9 @@
 from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from database.models import User, Event, EventStatus, UserRole, Registration, EventField, FieldType, EventNotification, NotificationTemplate, UserEventPermission, ScheduledNotification
+from database.models import User, Event, EventStatus, UserRole, Registration, EventField, FieldType, EventNotification, NotificationTemplate, UserEventPermission, ReminderJob
 from bot.handlers.event_management import EditEventStates
 from bot.keyboards.admin_keyboards import (
     get_admin_events_menu,
@@ -13,10 +14,18 @@ from bot.keyboards.admin_keyboards import (
     get_export_format_keyboard
 )
 from utils.permissions import is_admin
-from utils.export import export_registrations_to_csv, export_registrations_to_excel
-from datetime import datetime
+from utils.user_loader import get_user_loader
+from services.retention import restore_event_registrations, purge_event_archive
+from services.event_lifecycle import cancel_pending_notifications, notify_events_archived
+from services.organizer_recipients import notifying_assistant_ids
+from services.notification_service import DROP_REASON_TITLES, sync_event_reminders
+from services import delivery_health
+from utils import profiling
+from config import settings
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, and_
 import io
-from database.database import SessionLocal
+from database.database import SessionLocal, BackgroundSessionLocal
 
 router = Router()
 
@@ -174,7 +183,7 @@ async def admin_event_detail(callback: CallbackQuery, user: User):
         text += f"📊 Статус: {event.status.value}\n"
         text += f"👤 Создано: {event.creator.full_name or 'Неизвестно'}\n"
         
-        registrations_count = len(event.registrations)
+        registrations_count = len(event.registrations) + event.archived_registrations_count
         text += f"📋 Регистраций: {registrations_count}"
         if event.max_participants:
             text += f" / {event.max_participants} (лимит)"
@@ -213,6 +222,76 @@ async def admin_event_detail(callback: CallbackQuery, user: User):
         db.close()
 
 
+SCHEDULE_PAGE_SIZE = 10
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _schedule_key(scheduled: ReminderJob) -> str:
+    """Ключ строки расписания для callback_data: микросекунды scheduled_time и id"""
+    return f"{(scheduled.scheduled_time - _EPOCH) // timedelta(microseconds=1)}_{scheduled.id}"
+
+
+def get_schedule_counts(db, event_id: int):
+    """(всего, отправлено) одним GROUP BY вместо загрузки всех строк"""
+    rows = db.query(ReminderJob.sent, func.count(ReminderJob.id)).filter(
+        ReminderJob.event_id == event_id
+    ).group_by(ReminderJob.sent).all()
+    counts = {bool(sent): count for sent, count in rows}
+    return sum(counts.values()), counts.get(True, 0)
+
+
+def get_schedule_page(db, event_id: int, direction: str = "next", key: str = None):
+    """
+    Страница расписания по ключу (scheduled_time, id) - стоимость не зависит от того,
+    насколько далеко листать. `key` - граничная строка предыдущей страницы,
+    direction - "next" (после неё) или "prev" (перед ней).
+    Возвращает (строки по возрастанию времени, есть ли ещё строки в этом направлении).
+    """
+    query = db.query(ReminderJob).filter(ReminderJob.event_id == event_id)
+    if key:
+        micros, notification_id = (int(part) for part in key.split("_"))
+        boundary = _EPOCH + timedelta(microseconds=micros)
+        if direction == "prev":
+            query = query.filter(or_(
+                ReminderJob.scheduled_time < boundary,
+                and_(ReminderJob.scheduled_time == boundary, ReminderJob.id < notification_id)
+            ))
+        else:
+            query = query.filter(or_(
+                ReminderJob.scheduled_time > boundary,
+                and_(ReminderJob.scheduled_time == boundary, ReminderJob.id > notification_id)
+            ))
+    if direction == "prev":
+        query = query.order_by(ReminderJob.scheduled_time.desc(), ReminderJob.id.desc())
+    else:
+        query = query.order_by(ReminderJob.scheduled_time.asc(), ReminderJob.id.asc())
+    
+    rows = query.limit(SCHEDULE_PAGE_SIZE + 1).all()
+    has_more = len(rows) > SCHEDULE_PAGE_SIZE
+    rows = rows[:SCHEDULE_PAGE_SIZE]
+    if direction == "prev":
+        rows.reverse()
+    return rows, has_more
+
+
+def format_schedule_rows(rows) -> str:
+    from utils.timezone import utc_to_local
+    
+    text = ""
+    for s in rows:
+        local_dt = utc_to_local(s.scheduled_time)
+        if s.dropped_reason:
+            status = f"⏭ не отправлено: {DROP_REASON_TITLES.get(s.dropped_reason, s.dropped_reason)}"
+        elif s.sent:
+            status = f"✅ отправлено: {s.recipients_count or 0}"
+            if s.skipped_count:
+                status += f", недоступны: {s.skipped_count}"
+        else:
+            status = "⏳ запланировано"
+        text += f"• {local_dt.strftime('%d.%m.%Y %H:%M')} ({status})\n"
+    return text
+
+
 @router.callback_query(F.data.startswith("admin_notifications_"))
 async def admin_event_notifications(callback: CallbackQuery, user: User):
     """Настройка уведомлений для события"""
@@ -232,7 +311,15 @@ async def admin_event_notifications(callback: CallbackQuery, user: User):
         from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
         
         notifications = db.query(EventNotification).filter(EventNotification.event_id == event_id).all()
-        templates = db.query(NotificationTemplate).all()
+        # Шаблоны всех настроек - одним запросом
+        template_ids = {n.template_id for n in notifications if n.template_id}
+        templates = {
+            t.id: t for t in db.query(NotificationTemplate).filter(NotificationTemplate.id.in_(template_ids))
+        } if template_ids else {}
+        
+        # Получателей всех настроек грузим одним запросом
+        loader = get_user_loader()
+        loader.load_many(db, [rid for n in notifications for rid in (n.notification_recipients or [])])
         
         text = f"🔔 Уведомления для события: {event.title}\n\n"
         
@@ -242,7 +329,7 @@ async def admin_event_notifications(callback: CallbackQuery, user: User):
             for notif in notifications:
                 line = "• "
                 if notif.template_id:
-                    template = db.query(NotificationTemplate).filter(NotificationTemplate.id == notif.template_id).first()
+                    template = templates.get(notif.template_id)
                     if template:
                         if template.absolute_datetime:
                             line += f"Шаблон: {template.name} ({template.absolute_datetime.strftime('%d.%m.%Y %H:%M')})"
@@ -268,7 +355,7 @@ async def admin_event_notifications(callback: CallbackQuery, user: User):
                 
                 # Показываем получателей
                 if notif.notification_recipients:
-                    recipients = db.query(User).filter(User.id.in_(notif.notification_recipients)).all()
+                    recipients = loader.load_many(db, notif.notification_recipients)
                     if recipients:
                         text += f"  Получатели: {', '.join([r.full_name or f'ID:{r.id}' for r in recipients])}\n"
                 else:
@@ -285,24 +372,22 @@ async def admin_event_notifications(callback: CallbackQuery, user: User):
         else:
             text += "Уведомления не настроены.\n\n"
 
-        # Показать запланированные уведомления (ScheduledNotification)
-        from utils.timezone import utc_to_local
-        scheduled = db.query(ScheduledNotification).filter(
-            ScheduledNotification.event_id == event_id
-        ).order_by(ScheduledNotification.scheduled_time.asc()).all()
+        # Напоминания события (ReminderJob): счётчики и первая страница
+        total, sent = get_schedule_counts(db, event_id)
 
         text += "------------------------\n"
-        if scheduled:
-            total = len(scheduled)
-            sent = sum(1 for s in scheduled if s.sent)
+        if total:
             text += f"📆 Запланированные отправки: всего {total}, отправлено {sent}\n"
-            
-            for s in scheduled[:10]:
-                local_dt = utc_to_local(s.scheduled_time)
-                status = "✅ отправлено" if s.sent else "⏳ запланировано"
-                text += f"• Регистрация #{s.registration_id}: {local_dt.strftime('%d.%m.%Y %H:%M')} ({status})\n"
-            if total > 10:
-                text += f"... и еще {total - 10} уведомлений\n"
+            rows, has_more = get_schedule_page(db, event_id)
+            text += format_schedule_rows(rows)
+            if has_more:
+                text += f"... и еще {total - len(rows)} уведомлений\n"
+                keyboard.append([
+                    InlineKeyboardButton(
+                        text="📆 Всё расписание ▶️",
+                        callback_data=f"admin_sched_{event_id}_next_{_schedule_key(rows[-1])}"
+                    )
+                ])
             text += "\n"
         else:
             text += "Запланированные уведомления отсутствуют.\n\n"
@@ -335,6 +420,51 @@ async def admin_event_notifications(callback: CallbackQuery, user: User):
         db.close()
 
 
+@router.callback_query(F.data.startswith("admin_sched_"))
+async def admin_event_schedule_page(callback: CallbackQuery, user: User):
+    """Постраничный просмотр расписания уведомлений события (keyset-пагинация)"""
+    if not is_admin(user):
+        await callback.answer("У вас нет доступа.", show_alert=True)
+        return
+    
+    # admin_sched_{event_id}_{next|prev}_{микросекунды}_{id}
+    _, _, event_id, direction, micros, notification_id = callback.data.split("_")
+    event_id = int(event_id)
+    db = SessionLocal()
+    try:
+        event = db.query(Event).filter(Event.id == event_id).first()
+        if not event:
+            await callback.answer("Событие не найдено.", show_alert=True)
+            return
+        
+        total, sent = get_schedule_counts(db, event_id)
+        rows, has_more = get_schedule_page(db, event_id, direction, f"{micros}_{notification_id}")
+        
+        text = f"📆 Расписание уведомлений: {event.title}\n"
+        text += f"Всего {total}, отправлено {sent}\n\n"
+        text += format_schedule_rows(rows) or "Больше уведомлений нет.\n"
+        
+        # Кнопка в сторону, откуда пришли, есть всегда: там как минимум граничная строка
+        nav = []
+        if rows and (direction == "next" or has_more):
+            nav.append(InlineKeyboardButton(
+                text="◀️ Раньше", callback_data=f"admin_sched_{event_id}_prev_{_schedule_key(rows[0])}"
+            ))
+        if rows and (direction == "prev" or has_more):
+            nav.append(InlineKeyboardButton(
+                text="Позже ▶️", callback_data=f"admin_sched_{event_id}_next_{_schedule_key(rows[-1])}"
+            ))
+        keyboard = [nav] if nav else []
+        keyboard.append([
+            InlineKeyboardButton(text="◀️ К уведомлениям", callback_data=f"admin_notifications_{event_id}")
+        ])
+        
+        await callback.message.edit_text(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
+        await callback.answer()
+    finally:
+        db.close()
+
+
 @router.callback_query(F.data.startswith("admin_notification_recipients_"))
 async def admin_notification_recipients(callback: CallbackQuery, user: User):
     """Настройка получателей уведомлений"""
@@ -366,25 +496,23 @@ async def admin_notification_recipients(callback: CallbackQuery, user: User):
             db.refresh(event_notif)
         
         # Получаем список доступных получателей
-        # Автор события
-        creator = db.query(User).filter(User.id == event.created_by).first()
-        
-        # Помощники с правами на событие
-        permissions = db.query(UserEventPermission).filter(
-            UserEventPermission.event_id == event_id,
-            UserEventPermission.can_send_notifications == True
-        ).all()
-        assistants = [db.query(User).filter(User.id == p.user_id).first() for p in permissions]
-        assistants = [a for a in assistants if a]
+        assistant_ids = notifying_assistant_ids(db, event_id)
+        current_recipients = event_notif.notification_recipients or []
         
         # Все админы
         all_admins = db.query(User).filter(User.role == UserRole.ADMIN).all()
+        loader = get_user_loader()
+        loader.prime(all_admins)
+        
+        # Автор, помощники и текущие получатели - одним запросом
+        loader.load_many(db, [event.created_by] + assistant_ids + current_recipients)
+        creator = loader.load(db, event.created_by)
+        assistants = loader.load_many(db, assistant_ids)
         
         text = f"👥 Получатели уведомлений для события: {event.title}\n\n"
         
-        current_recipients = event_notif.notification_recipients or []
         if current_recipients:
-            recipients = db.query(User).filter(User.id.in_(current_recipients)).all()
+            recipients = loader.load_many(db, current_recipients)
             text += "Текущие получатели:\n"
             for r in recipients:
                 text += f"• {r.full_name or 'Без имени'} ({r.role.value})\n"
@@ -458,6 +586,12 @@ async def admin_delete_notification(callback: CallbackQuery, user: User):
         db.delete(notif)
         db.commit()
         
+        # Неразосланные напоминания по удалённой настройке больше не нужны
+        from services.notification_service import sync_event_reminders
+        event = db.query(Event).filter(Event.id == event_id).first()
+        if event:
+            sync_event_reminders(db, event)
+        
         await callback.answer("✅ Уведомление удалено.", show_alert=True)
         # Обновляем экран настроек уведомлений для события
         from types import SimpleNamespace
@@ -646,8 +780,8 @@ async def admin_use_template(callback: CallbackQuery, user: User):
         db.commit()
         
         # Создаем запланированные уведомления
-        from services.notification_service import create_scheduled_notifications_for_event
-        create_scheduled_notifications_for_event(db, event)
+        from services.notification_service import sync_event_reminders
+        sync_event_reminders(db, event)
         
         await callback.answer("✅ Уведомление добавлено!", show_alert=True)
         await admin_event_notifications(callback, user)
@@ -726,8 +860,8 @@ async def process_custom_notification_time(message: Message, state: FSMContext,
         db.commit()
         
         # Создаем запланированные уведомления
-        from services.notification_service import create_scheduled_notifications_for_event
-        create_scheduled_notifications_for_event(db, event)
+        from services.notification_service import sync_event_reminders
+        sync_event_reminders(db, event)
         
         await message.answer(f"✅ Уведомление добавлено! Уведомление будет отправлено за {custom_time} минут до события.")
         await state.clear()
@@ -768,10 +902,12 @@ async def admin_export_csv(callback: CallbackQuery, user: User):
         await callback.answer("У вас нет доступа.", show_alert=True)
         return
     
-    event_id = int(callback.data.split("_")[-1])
-    from database.database import SessionLocal
+    # Экспорт нужен редко - модуль (и openpyxl) не грузим при старте бота
+    from utils.export import export_registrations_to_csv
     
-    db = SessionLocal()
+    event_id = int(callback.data.split("_")[-1])
+    # Экспорт - тяжёлая фоновая операция, берём соединение из отдельного пула
+    db = BackgroundSessionLocal()
     try:
         csv_data = export_registrations_to_csv(db, event_id)
         csv_bytes = csv_data.encode('utf-8')
@@ -793,8 +929,10 @@ async def admin_export_excel(callback: CallbackQuery, user: User):
         await callback.answer("У вас нет доступа.", show_alert=True)
         return
     
+    from utils.export import export_registrations_to_excel
+    
     event_id = int(callback.data.split("_")[-1])
-    db = SessionLocal()
+    db = BackgroundSessionLocal()
     try:
         excel_data = export_registrations_to_excel(db, event_id)
         excel_file = BufferedInputFile(excel_data, filename=f"registrations_{event_id}.xlsx")
@@ -953,8 +1091,11 @@ async def admin_view_registrations(callback: CallbackQuery, user: User):
         text += "\n\n"
         
         keyboard = []
+        users_by_tg = get_user_loader().load_many_by_telegram_id(
+            db, [reg.user_telegram_id for reg in registrations[:20]]
+        )
         for i, reg in enumerate(registrations[:20], 1):
-            user_obj = db.query(User).filter(User.telegram_id == reg.user_telegram_id).first()
+            user_obj = users_by_tg.get(reg.user_telegram_id)
             user_name = user_obj.full_name if user_obj else f"ID: {reg.user_telegram_id}"
 
             # Статус подтверждения
@@ -1115,26 +1256,16 @@ async def admin_cancel_registration_confirm(callback: CallbackQuery, user: User,
         event = db.query(Event).filter(Event.id == event_id).first()
         user_obj = db.query(User).filter(User.telegram_id == user_telegram_id).first()
         
-        # Удаляем запланированные уведомления
-        from database.models import ScheduledNotification
-        scheduled_notifications = db.query(ScheduledNotification).filter(
-            ScheduledNotification.registration_id == registration_id
-        ).all()
-        for notif in scheduled_notifications:
-            db.delete(notif)
-        
-        # Удаляем регистрацию
+        # Удаляем регистрацию: напоминания разворачиваются по регистрациям в момент отправки,
+        # а история старых уведомлений удаляется каскадом
         db.delete(registration)
         db.commit()
         
         # Отправляем уведомление пользователю, если нужно
         if should_notify and user_obj:
             try:
-                from aiogram import Bot
-                from config import settings
                 from utils.timezone import format_event_datetime
-                bot = Bot(token=settings.BOT_TOKEN)
-                await bot.send_message(
+                await callback.bot.send_message(
                     chat_id=user_telegram_id,
                     text=(
                         f"❌ Ваша регистрация на событие '{event.title}' была отменена администратором.\n\n"
@@ -1142,12 +1273,12 @@ async def admin_cancel_registration_confirm(callback: CallbackQuery, user: User,
                         f"Если у вас есть вопросы, обратитесь к организаторам."
                     )
                 )
-                await bot.session.close()
             except Exception as e:
                 # Если не удалось отправить уведомление, просто логируем
                 import logging
                 logger = logging.getLogger(__name__)
                 logger.error(f"Не удалось отправить уведомление пользователю {user_telegram_id}: {e}")
+                delivery_health.record_failure(db, user_telegram_id, e)
         
         await callback.answer("✅ Регистрация отменена!", show_alert=True)
         await state.clear()
@@ -1243,21 +1374,19 @@ async def admin_send_message_to_user(callback: CallbackQuery, user: User):
         )
         
         try:
-            from aiogram import Bot
-            from config import settings
             from bot.handlers.notification_handlers import get_notification_keyboard
             
-            bot = Bot(token=settings.BOT_TOKEN)
-            await bot.send_message(
+            await callback.bot.send_message(
                 chat_id=registration.user_telegram_id,
                 text=text,
                 reply_markup=get_notification_keyboard(registration.id)
             )
-            await bot.session.close()
             await callback.answer("Напоминание отправлено пользователю.", show_alert=True)
         except Exception as e:
             # Если не удалось отправить сообщение пользователю, уведомляем админа
-            await callback.message.answer(f"Не удалось отправить сообщение пользователю: {e}")
+            status = delivery_health.record_failure(db, registration.user_telegram_id, e)
+            reason = f" ({delivery_health.STATUS_TITLES[status]})" if status else ""
+            await callback.message.answer(f"Не удалось отправить сообщение пользователю{reason}: {e}")
             await callback.answer()
     finally:
         db.close()
@@ -1368,7 +1497,7 @@ async def process_edit_max_participants(message: Message, state: FSMContext, use
         text += f"📊 Статус: {event.status.value}\n"
         text += f"👤 Создано: {event.creator.full_name or 'Неизвестно'}\n"
         
-        registrations_count = len(event.registrations)
+        registrations_count = len(event.registrations) + event.archived_registrations_count
         text += f"📋 Регистраций: {registrations_count}"
         if event.max_participants:
             text += f" / {event.max_participants} (лимит)"
@@ -1642,7 +1771,9 @@ async def admin_archive_event(callback: CallbackQuery, user: User):
             return
         
         event.status = EventStatus.ARCHIVED
+        cancel_pending_notifications(db, [event_id])
         db.commit()
+        notify_events_archived([event_id])
         
         await callback.answer("⚠️ Событие архивировано!", show_alert=True)
         await admin_event_detail(callback, user)
@@ -1665,7 +1796,11 @@ async def admin_unarchive_event(callback: CallbackQuery, user: User):
             await callback.answer("Событие не найдено.", show_alert=True)
             return
         
+        # Статус, регистрации из архива хранения и напоминания - одной транзакцией
         event.status = EventStatus.ACTIVE
+        restore_event_registrations(db, event_id)
+        # Неразосланные напоминания удалялись при архивировании - создаём заново
+        sync_event_reminders(db, event)
         db.commit()
         
         await callback.answer("✅ Событие разархивировано!", show_alert=True)
@@ -1690,6 +1825,7 @@ async def admin_delete_event_confirm(callback: CallbackQuery, user: User):
             return
         
         registrations_count = db.query(Registration).filter(Registration.event_id == event_id).count()
+        registrations_count += event.archived_registrations_count
         
         from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
         
@@ -1753,6 +1889,8 @@ async def admin_delete_event(callback: CallbackQuery, user: User):
         
         # Удаляем событие (каскадное удаление удалит все связанные записи)
         db.delete(event)
+        # Архивные таблицы не связаны внешними ключами - чистим их явно
+        purge_event_archive(db, event_id)
         db.commit()
         
         await callback.answer(f"✅ Событие '{event_title}' удалено!", show_alert=True)
@@ -1826,3 +1964,68 @@ async def admin_pending_approval(callback: CallbackQuery, user: User):
     finally:
         db.close()
 
+
+PROFILE_USAGE = (
+    "Профилирование следующих апдейтов:\n"
+    "/profile 20 - 20 апдейтов\n"
+    "/profile 60s admin_registrations - 60 секунд, только handler/callback с этим префиксом\n"
+    "/profile stop - остановить досрочно\n\n"
+    "Результат придёт файлом .folded (flamegraph.pl, speedscope.app)."
+)
+
+
+def parse_profile_args(args: str):
+    """'/profile 60s prefix' -> (updates, seconds, prefix)"""
+    updates, seconds, prefix = 0, 0, ""
+    for part in (args or "").split():
+        if part.endswith("s") and part[:-1].isdigit():
+            seconds = int(part[:-1])
+        elif part.isdigit():
+            updates = int(part)
+        else:
+            prefix = part
+    if not updates and not seconds:
+        updates = 20
+    return min(updates, settings.PROFILING_MAX_UPDATES), min(seconds, settings.PROFILING_MAX_SECONDS), prefix
+
+
+@router.message(Command("profile"))
+async def admin_profile(message: Message, command: CommandObject, user: User):
+    """Профилирование следующих N апдейтов или T секунд"""
+    if not is_admin(user):
+        await message.answer("У вас нет доступа к этой функции.")
+        return
+    
+    if command.args and command.args.strip() == "stop":
+        if profiling.stop_profiling() is None:
+            await message.answer("Профилирование не запущено.")
+        return
+    if command.args and command.args.strip() == "help":
+        await message.answer(PROFILE_USAGE)
+        return
+    
+    updates, seconds, prefix = parse_profile_args(command.args)
+    bot = message.bot
+    chat_id = message.chat.id
+    
+    async def send_result(session):
+        if not session.samples:
+            await bot.send_message(chat_id, f"Профилирование завершено, сэмплов нет.\n{session.describe()}")
+            return
+        document = BufferedInputFile(
+            profiling.render_collapsed(session), filename=profiling.result_filename(session, "bot")
+        )
+        await bot.send_document(chat_id, document, caption=session.describe())
+    
+    try:
+        profiling.start_profiling(
+            prefix=prefix, updates=updates, seconds=seconds,
+            interval_ms=settings.PROFILING_INTERVAL_MS, on_finish=send_result,
+        )
+    except RuntimeError as e:
+        await message.answer(f"{e}. Остановить: /profile stop")
+        return
+    
+    limit = f"{seconds} с" if seconds else f"{updates} апдейтов"
+    target = f" с префиксом '{prefix}'" if prefix else ""
+    await message.answer(f"Профилирование запущено: {limit}{target}. Результат пришлю файлом.")
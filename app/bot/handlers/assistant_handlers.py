@@ -9,6 +9,7 @@ from bot.keyboards.assistant_keyboards import (
 )
 from utils.permissions import is_assistant, can_edit_event, can_view_registrations, can_send_notifications, get_user_accessible_events
 from database.database import SessionLocal
+from utils.user_loader import get_user_loader
 from datetime import datetime
 
 router = Router()
@@ -127,7 +128,7 @@ async def assistant_event_detail(callback: CallbackQuery, user: User):
         text += f"📊 Статус: {event.status.value}\n"
         
         if can_view:
-            registrations_count = len(event.registrations)
+            registrations_count = len(event.registrations) + event.archived_registrations_count
             text += f"📋 Регистраций: {registrations_count}"
         
         await callback.message.edit_text(
@@ -260,8 +261,11 @@ async def assistant_view_registrations(callback: CallbackQuery, user: User):
         text = f"📋 Регистрации на событие: {event.title}\n\n"
         text += f"Всего регистраций: {len(registrations)}\n\n"
         
+        users_by_tg = get_user_loader().load_many_by_telegram_id(
+            db, [reg.user_telegram_id for reg in registrations[:10]]
+        )
         for i, reg in enumerate(registrations[:10], 1):
-            user_obj = db.query(User).filter(User.telegram_id == reg.user_telegram_id).first()
+            user_obj = users_by_tg.get(reg.user_telegram_id)
             user_name = user_obj.full_name if user_obj else f"ID: {reg.user_telegram_id}"
             text += f"{i}. {user_name}\n"
             text += f"   Дата: {reg.created_at.strftime('%d.%m.%Y %H:%M')}\n"
@@ -301,15 +305,12 @@ async def assistant_send_notification(callback: CallbackQuery, user: User):
         
         # Отправляем уведомление
         from bot.utils.notifications import send_manual_notification
-        from aiogram import Bot
-        from config import settings
         
-        bot = Bot(token=settings.BOT_TOKEN)
-        sent_count = await send_manual_notification(db, bot, event)
-        await bot.session.close()
+        sent_count = await send_manual_notification(db, callback.bot, event)
         
         await callback.message.answer(
-            f"✅ Уведомление отправлено {sent_count} зарегистрированным пользователям!"
+            f"✅ Уведомление поставлено в очередь для {sent_count} зарегистрированных пользователей. "
+            f"Рассылка идёт в фоне."
         )
         await callback.answer()
     finally:
@@ -13,7 +13,9 @@ from database.models import User, UserRole, Event, EventStatus
 from bot.keyboards.common_keyboards import get_main_menu_keyboard
 from config import settings
 from database.database import SessionLocal
+from utils.user_loader import get_user_loader
 from database.models import Event, Registration
+from sqlalchemy import func
 from datetime import datetime
 import io
 
@@ -230,8 +232,15 @@ async def send_report(message: Message, user: User):
         total_registrations = 0
         active_events = 0
         
+        # Регистрации считаем одним GROUP BY, а не загрузкой всех строк каждого события
+        live_counts = dict(
+            db.query(Registration.event_id, func.count(Registration.id))
+            .group_by(Registration.event_id)
+            .all()
+        )
+        
         for event in events:
-            registrations_count = len(event.registrations)
+            registrations_count = live_counts.get(event.id, 0) + event.archived_registrations_count
             total_registrations += registrations_count
             
             if event.status.value in ["approved", "active"]:
@@ -254,23 +263,39 @@ async def send_report(message: Message, user: User):
         # Также создаем CSV файл с детальной информацией
         csv_lines = ["Событие,Дата,Статус,Регистраций,Участники\n"]
         
+        # Первые 10 участников каждого события - одним запросом (оконная функция), пользователи - вторым
+        position = func.row_number().over(
+            partition_by=Registration.event_id, order_by=Registration.id
+        ).label("position")
+        ranked = db.query(Registration.event_id, Registration.user_telegram_id, position).subquery()
+        first_participants = {}
+        for event_id, telegram_id in db.query(ranked.c.event_id, ranked.c.user_telegram_id).filter(
+            ranked.c.position <= 10
+        ).order_by(ranked.c.event_id, ranked.c.position):
+            first_participants.setdefault(event_id, []).append(telegram_id)
+        loader = get_user_loader()
+        loader.load_many_by_telegram_id(
+            db, [telegram_id for telegram_ids in first_participants.values() for telegram_id in telegram_ids]
+        )
+        
         for event in events:
             event_title = event.title.replace(",", " ").replace("\n", " ")
             from utils.timezone import format_event_datetime
             event_date = format_event_datetime(event.date_time)
             event_status = event.status.value
-            reg_count = len(event.registrations)
+            live_count = live_counts.get(event.id, 0)
+            reg_count = live_count + event.archived_registrations_count
             
             # Список участников
             participants = []
-            for reg in event.registrations[:10]:  # Первые 10 для CSV
-                user_obj = db.query(User).filter(User.telegram_id == reg.user_telegram_id).first()
+            for telegram_id in first_participants.get(event.id, []):  # Первые 10 для CSV
+                user_obj = loader.load_by_telegram_id(db, telegram_id)
                 if user_obj:
-                    participants.append(user_obj.full_name or f"ID:{reg.user_telegram_id}")
+                    participants.append(user_obj.full_name or f"ID:{telegram_id}")
             
             participants_str = "; ".join(participants)
-            if len(event.registrations) > 10:
-                participants_str += f" и еще {len(event.registrations) - 10}"
+            if live_count > 10:
+                participants_str += f" и еще {live_count - 10}"
             
             csv_lines.append(f"{event_title},{event_date},{event_status},{reg_count},{participants_str}\n")
         
@@ -131,6 +131,10 @@ async def process_edit_date(message: Message, state: FSMContext, user: User):
         
         db.commit()
         db.refresh(event)
+        if message.text != "-":
+            # Новое время события - новое время напоминаний
+            from services.notification_service import sync_event_reminders
+            sync_event_reminders(db, event)
         
         await message.answer("Отправьте новое фото для события (или отправьте '-' чтобы оставить текущее, '--' чтобы удалить):")
         await state.set_state(EditEventStates.waiting_photo)
@@ -304,7 +308,7 @@ async def process_edit_photo(message: Message, state: FSMContext, user: User):
             text += f"📊 Статус: {event.status.value}\n"
             text += f"👤 Создано: {event.creator.full_name or 'Неизвестно'}\n"
             
-            registrations_count = len(event.registrations)
+            registrations_count = len(event.registrations) + event.archived_registrations_count
             text += f"📋 Регистраций: {registrations_count}"
             
             if event.photo_file_id:
@@ -331,7 +335,7 @@ async def process_edit_photo(message: Message, state: FSMContext, user: User):
             text += f"📊 Статус: {event.status.value}\n"
             
             if can_view_registrations(db, user, event_id):
-                registrations_count = len(event.registrations)
+                registrations_count = len(event.registrations) + event.archived_registrations_count
                 text += f"📋 Регистраций: {registrations_count}"
             
             if event.photo_file_id:
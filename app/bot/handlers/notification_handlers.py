@@ -1,9 +1,10 @@
-from aiogram import Router, F
+from aiogram import Bot, Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from database.models import User, Registration, Event, UserEventPermission
+from database.models import User, Registration, Event
 from database.database import SessionLocal
 from utils.permissions import is_admin, can_send_notifications
-from aiogram import Bot
+from services.organizer_digest import organizer_digest
+from services.organizer_recipients import get_recipient_chat_ids
 from config import settings
 from sqlalchemy.orm import Session
 
@@ -34,7 +35,7 @@ async def confirm_participation(callback: CallbackQuery, user: User):
         # Уведомляем организаторов
         event = db.query(Event).filter(Event.id == registration.event_id).first()
         if event:
-            await notify_organizers_about_response(db, event, registration, "подтвердил участие")
+            await notify_organizers_about_response(db, callback.bot, event, user, "подтвердил участие", "confirm")
     finally:
         db.close()
 
@@ -63,7 +64,7 @@ async def decline_participation(callback: CallbackQuery, user: User):
         # Уведомляем организаторов
         event = db.query(Event).filter(Event.id == registration.event_id).first()
         if event:
-            await notify_organizers_about_response(db, event, registration, "отказался от участия")
+            await notify_organizers_about_response(db, callback.bot, event, user, "отказался от участия", "decline")
     finally:
         db.close()
 
@@ -88,32 +89,8 @@ async def contact_me(callback: CallbackQuery, user: User):
             await callback.answer("Событие не найдено.", show_alert=True)
             return
         
-        # Получаем список получателей уведомлений
-        from database.models import EventNotification
-        recipient_ids = []
-        
-        event_notif = db.query(EventNotification).filter(
-            EventNotification.event_id == event.id,
-            EventNotification.enabled == True
-        ).first()
-        
-        if event_notif and event_notif.notification_recipients:
-            recipient_ids = event_notif.notification_recipients
-        else:
-            # По умолчанию - автор и помощники
-            if event.created_by:
-                recipient_ids.append(event.created_by)
-            
-            permissions = db.query(UserEventPermission).filter(
-                UserEventPermission.event_id == event.id,
-                UserEventPermission.can_send_notifications == True
-            ).all()
-            recipient_ids.extend([p.user_id for p in permissions])
-        
-        # Убираем дубликаты
-        recipient_ids = list(set(recipient_ids))
-        
-        if not recipient_ids:
+        chat_ids = get_recipient_chat_ids(db, event)
+        if not chat_ids:
             await callback.answer("Нет ответственных за событие.", show_alert=True)
             return
         
@@ -126,60 +103,27 @@ async def contact_me(callback: CallbackQuery, user: User):
             contact_text += f"Username: @{user.username}\n"
         contact_text += f"\nПользователь просит связаться с ним."
         
-        # Отправляем сообщение помощникам
-        bot = Bot(token=settings.BOT_TOKEN)
-        sent_count = 0
-        for recipient_id in recipient_ids:
-            recipient = db.query(User).filter(User.id == recipient_id).first()
-            if recipient:
-                try:
-                    await bot.send_message(
-                        chat_id=recipient.telegram_id,
-                        text=contact_text
-                    )
-                    sent_count += 1
-                except Exception as e:
-                    print(f"Ошибка отправки сообщения: {e}")
-        
-        await bot.session.close()
+        # Срочный запрос уходит сразу, вместе с ответами, накопленными для этих организаторов
+        urgent = settings.ORGANIZER_CONTACT_URGENT
+        line = f"📞 {user.full_name or 'Без имени'} просит связаться"
+        if user.username:
+            line += f" (@{user.username})"
+        sent_count = await organizer_digest.submit(
+            callback.bot, event, chat_ids, line, contact_text, "contact", urgent=urgent
+        )
         
-        await callback.answer(f"✅ Ваш запрос отправлен {sent_count} организатору(ам)!", show_alert=True)
+        if urgent:
+            await callback.answer(f"✅ Ваш запрос отправлен {sent_count} организатору(ам)!", show_alert=True)
+        else:
+            await callback.answer("✅ Ваш запрос передан организаторам!", show_alert=True)
     finally:
         db.close()
 
 
-async def notify_organizers_about_response(db: Session, event: Event, registration: Registration, action: str):
-    """Уведомить организаторов о ответе пользователя"""
-    # Получаем список получателей уведомлений
-    recipient_ids = []
-    
-    # Проверяем настройки уведомлений события
-    from database.models import EventNotification
-    event_notif = db.query(EventNotification).filter(
-        EventNotification.event_id == event.id,
-        EventNotification.enabled == True
-    ).first()
-    
-    if event_notif and event_notif.notification_recipients:
-        recipient_ids = event_notif.notification_recipients
-    else:
-        # По умолчанию - автор и помощники
-        if event.created_by:
-            recipient_ids.append(event.created_by)
-        
-        permissions = db.query(UserEventPermission).filter(
-            UserEventPermission.event_id == event.id,
-            UserEventPermission.can_send_notifications == True
-        ).all()
-        recipient_ids.extend([p.user_id for p in permissions])
-    
-    recipient_ids = list(set(recipient_ids))
-    
-    if not recipient_ids:
-        return
-    
-    user = db.query(User).filter(User.telegram_id == registration.user_telegram_id).first()
-    if not user:
+async def notify_organizers_about_response(db: Session, bot: Bot, event: Event, user: User, action: str, kind: str):
+    """Добавить ответ пользователя в сводки организаторов (services/organizer_digest.py)"""
+    chat_ids = get_recipient_chat_ids(db, event)
+    if not chat_ids:
         return
     
     text = f"📢 Обновление регистрации\n\n"
@@ -187,19 +131,8 @@ async def notify_organizers_about_response(db: Session, event: Event, registrati
     text += f"Пользователь: {user.full_name or 'Без имени'}\n"
     text += f"Действие: {action}"
     
-    bot = Bot(token=settings.BOT_TOKEN)
-    for recipient_id in recipient_ids:
-        recipient = db.query(User).filter(User.id == recipient_id).first()
-        if recipient:
-            try:
-                await bot.send_message(
-                    chat_id=recipient.telegram_id,
-                    text=text
-                )
-            except Exception:
-                pass
-    
-    await bot.session.close()
+    line = f"• {user.full_name or 'Без имени'} - {action}"
+    await organizer_digest.submit(bot, event, chat_ids, line, text, kind)
 
 
 def get_notification_keyboard(registration_id: int) -> InlineKeyboardMarkup:
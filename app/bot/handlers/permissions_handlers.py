@@ -4,6 +4,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from database.models import User, Event, UserRole, UserEventPermission
 from utils.permissions import is_admin
+from utils.user_loader import get_user_loader
 from database.database import SessionLocal
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
@@ -39,8 +40,10 @@ async def admin_permissions_menu(callback: CallbackQuery, user: User):
         
         if permissions:
             text += "Текущие права:\n"
+            loader = get_user_loader()
+            loader.load_many(db, [perm.user_id for perm in permissions])
             for perm in permissions:
-                perm_user = db.query(User).filter(User.id == perm.user_id).first()
+                perm_user = loader.load(db, perm.user_id)
                 if perm_user:
                     text += f"• {perm_user.full_name or 'Без имени'}\n"
                     text += f"  ✏️ Редактирование: {'✅' if perm.can_edit else '❌'}\n"
@@ -6,6 +6,7 @@ from database.models import User, NotificationTemplate, EventNotification, Event
 from bot.keyboards.admin_keyboards import get_admin_events_menu
 from utils.permissions import is_admin
 from database.database import SessionLocal
+from services.delivery_health import STATUS_TITLES, status_counts
 from datetime import datetime
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
@@ -142,7 +143,8 @@ async def process_template_time_minutes(message: Message, state: FSMContext):
                            "Доступные переменные:\n"
                            "{event_title} - название события\n"
                            "{event_date} - дата события\n"
-                           "{event_description} - описание события")
+                           "{event_description} - описание события\n"
+                           "{Название поля анкеты} - ответ участника, например {Имя}")
         await state.set_state(CreateTemplateStates.waiting_message)
     except ValueError:
         await message.answer("❌ Неверный формат. Введите число (минуты до события).")
@@ -160,7 +162,8 @@ async def process_template_time_days(message: Message, state: FSMContext):
                            "Доступные переменные:\n"
                            "{event_title} - название события\n"
                            "{event_date} - дата события\n"
-                           "{event_description} - описание события")
+                           "{event_description} - описание события\n"
+                           "{Название поля анкеты} - ответ участника, например {Имя}")
         await state.set_state(CreateTemplateStates.waiting_message)
     except ValueError:
         await message.answer("❌ Неверный формат. Введите число (дни до события).")
@@ -186,7 +189,8 @@ async def process_template_time_datetime(message: Message, state: FSMContext):
                            "Доступные переменные:\n"
                            "{event_title} - название события\n"
                            "{event_date} - дата события\n"
-                           "{event_description} - описание события")
+                           "{event_description} - описание события\n"
+                           "{Название поля анкеты} - ответ участника, например {Имя}")
         await state.set_state(CreateTemplateStates.waiting_message)
     except ValueError:
         await message.answer("❌ Неверный формат. Используйте формат: ДД.ММ.ГГГГ ЧЧ:ММ\n"
@@ -308,7 +312,8 @@ async def template_view(callback: CallbackQuery, user: User):
         text += "Доступные переменные:\n"
         text += "{event_title} - название события\n"
         text += "{event_date} - дата события\n"
-        text += "{event_description} - описание события"
+        text += "{event_description} - описание события\n"
+        text += "{Название поля анкеты} - ответ участника, например {Имя}"
         
         keyboard = [
             [InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"template_delete_{template_id}")],
@@ -355,10 +360,12 @@ async def settings_stats(callback: CallbackQuery, user: User):
     db = SessionLocal()
     try:
         from database.models import Event, Registration, User as UserModel
+        from sqlalchemy import func
         
         total_events = db.query(Event).count()
         active_events = db.query(Event).filter(Event.status.in_(["approved", "active"])).count()
         total_registrations = db.query(Registration).count()
+        total_registrations += db.query(func.coalesce(func.sum(Event.archived_registrations_count), 0)).scalar()
         total_users = db.query(UserModel).count()
         from database.models import UserRole
         admin_users = db.query(UserModel).filter(UserModel.role == UserRole.ADMIN).count()
@@ -371,7 +378,13 @@ async def settings_stats(callback: CallbackQuery, user: User):
         text += f"👥 Пользователи:\n"
         text += f"   Всего: {total_users}\n"
         text += f"   Админов: {admin_users}\n"
-        text += f"   Помощников: {assistant_users}\n\n"
+        text += f"   Помощников: {assistant_users}\n"
+        undeliverable = status_counts(db)
+        if undeliverable:
+            text += f"   Недоступны для рассылок: {sum(undeliverable.values())}\n"
+            for status, count in sorted(undeliverable.items()):
+                text += f"      {STATUS_TITLES.get(status, status)}: {count}\n"
+        text += "\n"
         text += f"📋 Регистрации:\n"
         text += f"   Всего: {total_registrations}\n"
         
@@ -220,8 +220,8 @@ async def user_start_registration(callback: CallbackQuery, user: User, state: FS
             db.refresh(registration)
             
             # Создаем запланированные уведомления для новой регистрации
-            from services.notification_service import create_scheduled_notifications_for_event
-            create_scheduled_notifications_for_event(db, event)
+            from services.notification_service import sync_event_reminders
+            sync_event_reminders(db, event)
             
             await callback.answer("✅ Вы успешно зарегистрированы!", show_alert=True)
             await user_event_detail(callback, user)
@@ -347,8 +347,8 @@ async def process_field_value(message: Message, state: FSMContext, user: User):
             db.refresh(registration)
             
             # Создаем запланированные уведомления для новой регистрации
-            from services.notification_service import create_scheduled_notifications_for_event
-            create_scheduled_notifications_for_event(db, event)
+            from services.notification_service import sync_event_reminders
+            sync_event_reminders(db, event)
             
             from utils.timezone import format_event_datetime
             await message.answer(
@@ -390,15 +390,8 @@ async def user_cancel_registration(callback: CallbackQuery, user: User):
             await callback.answer("Вы не зарегистрированы на это событие.", show_alert=True)
             return
         
-        # Удаляем запланированные уведомления для этой регистрации
-        from database.models import ScheduledNotification
-        scheduled_notifications = db.query(ScheduledNotification).filter(
-            ScheduledNotification.registration_id == registration.id
-        ).all()
-        for notif in scheduled_notifications:
-            db.delete(notif)
-        
-        # Удаляем регистрацию
+        # Удаляем регистрацию: напоминания разворачиваются по регистрациям в момент отправки,
+        # а история старых уведомлений удаляется каскадом
         db.delete(registration)
         db.commit()
         
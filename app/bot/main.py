@@ -1,21 +1,62 @@
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher
+from aiogram import Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from config import settings
 from bot.middleware.auth_middleware import AuthMiddleware
+from bot.middleware.metrics_middleware import MetricsMiddleware
+from bot.middleware.profiling_middleware import ProfilingMiddleware
+from bot.middleware.watchdog_middleware import LoopWatchdogMiddleware
+from bot.utils.telegram import create_bot
 from bot.handlers import common_handlers, admin_handlers, assistant_handlers, event_management, permissions_handlers, settings_handlers, notification_handlers, user_handlers
 from database.database import init_db
-from services.scheduler import start_scheduler, set_bot_instance
+from services.organizer_digest import organizer_digest
+from services.scheduler import start_scheduler, stop_scheduler, set_bot_instance
+from utils.metrics import register_default_collectors, start_metrics_server
+from utils.loop_watchdog import start_loop_watchdog
+from utils.logging_setup import setup_logging
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Настройка логирования: очередь + отдельный поток записи, JSON, лимиты для горячих циклов
+setup_logging()
 logger = logging.getLogger(__name__)
 
 
+def create_dispatcher(storage=None) -> Dispatcher:
+    """Диспетчер с middleware и роутерами бота"""
+    dp = Dispatcher(storage=storage or MemoryStorage())
+    
+    # Регистрация middleware (метрики - первыми, чтобы учитывать и запросы AuthMiddleware)
+    if settings.METRICS_ENABLED:
+        dp.message.middleware(MetricsMiddleware())
+        dp.callback_query.middleware(MetricsMiddleware())
+    if settings.LOOP_WATCHDOG_ENABLED:
+        dp.message.middleware(LoopWatchdogMiddleware())
+        dp.callback_query.middleware(LoopWatchdogMiddleware())
+    # Профилирование по /profile; пока сессии нет - одна проверка на апдейт
+    dp.message.middleware(ProfilingMiddleware())
+    dp.callback_query.middleware(ProfilingMiddleware())
+    dp.message.middleware(AuthMiddleware())
+    dp.callback_query.middleware(AuthMiddleware())
+    
+    # Регистрация роутеров
+    dp.include_router(common_handlers.router)
+    dp.include_router(user_handlers.router)
+    dp.include_router(admin_handlers.router)
+    dp.include_router(assistant_handlers.router)
+    dp.include_router(event_management.router)
+    dp.include_router(permissions_handlers.router)
+    dp.include_router(settings_handlers.router)
+    dp.include_router(notification_handlers.router)
+    return dp
+
+
+async def on_shutdown(bot):
+    """Остановка polling: планировщик останавливается, аренда лидера отдаётся резервной реплике,
+    накопленные сводки организаторам отправляются (сессия бота ещё открыта)"""
+    stop_scheduler()
+    await organizer_digest.flush(bot)
+
+
 async def main():
     """Основная функция запуска бота"""
     if not settings.BOT_TOKEN:
@@ -27,29 +68,25 @@ async def main():
     logger.info("База данных инициализирована")
     
     # Создание бота и диспетчера
-    bot = Bot(token=settings.BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+    bot = create_bot()
+    dp = create_dispatcher()
     
     # Устанавливаем бот для планировщика уведомлений
     set_bot_instance(bot)
     
     # Запускаем планировщик уведомлений
     start_scheduler()
+    dp.shutdown.register(on_shutdown)
     logger.info("Планировщик уведомлений запущен")
     
-    # Регистрация middleware
-    dp.message.middleware(AuthMiddleware())
-    dp.callback_query.middleware(AuthMiddleware())
+    # Сторож event loop'а: lag и блокировки синхронным кодом
+    if settings.LOOP_WATCHDOG_ENABLED:
+        start_loop_watchdog(settings.LOOP_WATCHDOG_INTERVAL_MS, settings.LOOP_BLOCK_THRESHOLD_MS)
     
-    # Регистрация роутеров
-    dp.include_router(common_handlers.router)
-    dp.include_router(user_handlers.router)
-    dp.include_router(admin_handlers.router)
-    dp.include_router(assistant_handlers.router)
-    dp.include_router(event_management.router)
-    dp.include_router(permissions_handlers.router)
-    dp.include_router(settings_handlers.router)
-    dp.include_router(notification_handlers.router)
+    # Экспортер метрик для Prometheus
+    if settings.METRICS_ENABLED and settings.BOT_METRICS_PORT:
+        register_default_collectors()
+        await start_metrics_server(settings.BOT_METRICS_HOST, settings.BOT_METRICS_PORT)
     
     logger.info("Бот запущен")
     
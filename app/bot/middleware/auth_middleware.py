@@ -4,6 +4,8 @@ from aiogram.types import TelegramObject, User as TelegramUser
 from sqlalchemy.orm import Session
 from database.database import SessionLocal
 from database.models import User, UserRole
+from utils.user_loader import UserLoader, set_user_loader, reset_user_loader
+from services.delivery_health import clear_status
 from config import settings
 
 
@@ -51,6 +53,9 @@ class AuthMiddleware(BaseMiddleware):
                 if telegram_user.id in settings.admin_ids:
                     user.role = UserRole.ADMIN
                 
+                # Пользователь пишет боту - значит, сообщения до него снова доходят
+                clear_status(user)
+                
                 db.commit()
             
             # Добавляем пользователя в data для использования в handlers
@@ -61,9 +66,12 @@ class AuthMiddleware(BaseMiddleware):
             db.rollback()
             raise e
         
+        # Кэш пользователей живёт ровно один апдейт
+        loader_token = set_user_loader(UserLoader())
         try:
             result = await handler(event, data)
         finally:
+            reset_user_loader(loader_token)
             db.close()
         
         return result
@@ -0,0 +1,41 @@
+import time
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from database.instrumentation import check_query_budget, start_query_tracking, stop_query_tracking
+from utils import metrics
+
+
+def handler_label(data: Dict[str, Any]) -> str:
+    """Имя handler'а для меток: модуль.функция (например, admin_handlers.admin_view_registrations)"""
+    handler = data.get("handler")
+    callback = getattr(handler, "callback", None)
+    if callback is None:
+        return "unknown"
+    module = getattr(callback, "__module__", "") or ""
+    return f"{module.rsplit('.', 1)[-1]}.{getattr(callback, '__name__', 'handler')}"
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Время обработки апдейта и число SQL-запросов в нём, по handler'ам; проверка бюджета запросов"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        label = handler_label(data)
+        stats, token = start_query_tracking(label)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            metrics.UPDATE_ERRORS.labels(label).inc()
+            raise
+        finally:
+            metrics.UPDATE_SECONDS.labels(label).observe(time.perf_counter() - started)
+            stop_query_tracking(token)
+            metrics.UPDATE_QUERIES.labels(label).observe(stats.count)
+            metrics.UPDATE_DB_SECONDS.labels(label).observe(stats.duration)
+            check_query_budget(stats, label)
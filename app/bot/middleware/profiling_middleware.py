@@ -0,0 +1,27 @@
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, CallbackQuery
+from bot.middleware.metrics_middleware import handler_label
+from utils import profiling
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    """Отмечает апдейты, попавшие под фильтр активной сессии профилирования"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        session = profiling.active_session()
+        if session is None:
+            return await handler(event, data)
+        
+        label = handler_label(data)
+        callback_data = event.data if isinstance(event, CallbackQuery) else None
+        if not session.matches(label, label.rsplit(".", 1)[-1], callback_data):
+            return await handler(event, data)
+        
+        with session.track():
+            return await handler(event, data)
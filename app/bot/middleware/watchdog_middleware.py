@@ -0,0 +1,18 @@
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from bot.middleware.metrics_middleware import handler_label
+from utils import loop_watchdog
+
+
+class LoopWatchdogMiddleware(BaseMiddleware):
+    """Привязывает задачу апдейта к handler'у, чтобы сторож loop'а мог назвать виновника блокировки"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        with loop_watchdog.track(handler_label(data), type(event).__name__):
+            return await handler(event, data)
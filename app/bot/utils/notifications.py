@@ -1,8 +1,10 @@
 from sqlalchemy.orm import Session
 from typing import Optional
+from uuid import uuid4
 from database.models import Event, Registration, User
-from services.notification_service import create_scheduled_notifications_for_event
+from services import delivery_health, outbox
 from aiogram import Bot
+from bot.utils.outbound import Priority
 
 
 async def send_manual_notification(
@@ -12,11 +14,21 @@ async def send_manual_notification(
     message_text: Optional[str] = None,
     include_buttons: bool = True
 ):
-    """Отправить уведомление вручную всем зарегистрированным пользователям"""
+    """Поставить уведомление всем зарегистрированным пользователям в outbox.
+
+    Возвращает число поставленных сообщений; отправляет их воркер services/outbox.py.
+    """
     from database.models import EventNotification
     from bot.handlers.notification_handlers import get_notification_keyboard
     
-    registrations = db.query(Registration).filter(Registration.event_id == event.id).all()
+    # Заблокировавшие бота отсеиваются в SQL; время перепроверки - см. services/delivery_health.py.
+    # Внешнее соединение, как в напоминаниях: регистрации без строки User тоже получают рассылку
+    registrations = db.query(Registration).outerjoin(
+        User, User.telegram_id == Registration.user_telegram_id
+    ).filter(
+        Registration.event_id == event.id,
+        ~delivery_health.undeliverable()
+    ).all()
     
     if not registrations:
         return 0
@@ -31,25 +43,31 @@ async def send_manual_notification(
         include_buttons = event_notif.include_buttons
     
     from utils.timezone import format_event_datetime
-    text = message_text or f"🔔 Уведомление о событии!\n\n📅 {event.title}\n📆 Дата: {format_event_datetime(event.date_time)}"
+    from services.message_templates import BoundTemplate, compile_text
+    if message_text:
+        # Поля события подставляются один раз на рассылку, для получателя - только поля анкеты
+        renderer = compile_text(message_text).bind(event)
+    else:
+        renderer = BoundTemplate([f"🔔 Уведомление о событии!\n\n📅 {event.title}\n📆 Дата: {format_event_datetime(event.date_time)}"])
     
-    sent_count = 0
+    # Вся рассылка записывается в outbox одной транзакцией; после перезапуска воркер
+    # продолжит с неотправленных строк, а ключ не даст отправить одному получателю дважды
+    broadcast_id = uuid4().hex
+    markup = None
+    messages = []
     for registration in registrations:
-        try:
-            if include_buttons:
-                await bot.send_message(
-                    chat_id=registration.user_telegram_id,
-                    text=text,
-                    reply_markup=get_notification_keyboard(registration.id)
-                )
-            else:
-                await bot.send_message(
-                    chat_id=registration.user_telegram_id,
-                    text=text
-                )
-            sent_count += 1
-        except Exception as e:
-            print(f"Ошибка отправки уведомления пользователю {registration.user_telegram_id}: {e}")
-    
-    return sent_count
-
+        if include_buttons:
+            markup = get_notification_keyboard(registration.id)
+        messages.append(outbox.build_message(
+            f"manual:{broadcast_id}:{registration.id}",
+            registration.user_telegram_id,
+            renderer.render(registration.data_json),
+            source="manual",
+            # Рассылка уступает очереди ответы пользователям и напоминания
+            priority=Priority.BROADCAST,
+            reply_markup=markup,
+        ))
+    queued = outbox.enqueue(db, messages)
+    db.commit()
+    outbox.kick(bot)
+    return queued
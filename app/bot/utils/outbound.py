@@ -0,0 +1,203 @@
+"""
+Общая очередь исходящих сообщений с приоритетами.
+
+Все запросы бота, которые Telegram считает отправкой сообщений (send*/edit*/copy/forward),
+проходят через допуск `OutboundQueue.acquire` - middleware сессии, подключаемый в create_bot().
+Остальные методы (getUpdates, answerCallbackQuery, getFile) идут мимо очереди.
+
+- Общий token bucket на OUTBOUND_RATE_PER_SECOND запросов с запасом OUTBOUND_BURST.
+- Классы приоритета: ответы пользователю > напоминания > рассылки > сводки организаторам.
+  Следующий запрос всегда берётся из самого важного непустого класса, поэтому большая
+  рассылка не замораживает кнопки.
+- Внутри класса чаты обслуживаются по кругу, а фоновым классам Telegram не позволяет
+  писать в один чат чаще раза в OUTBOUND_PER_CHAT_INTERVAL_MS - очередь держит паузу сама.
+- 429 (TelegramRetryAfter) останавливает выдачу на retry_after секунд, запрос повторяется.
+
+Класс задаётся контекстом: `with outbound_priority(Priority.BROADCAST): await bot.send_message(...)`.
+Без контекста запрос считается ответом пользователю (INTERACTIVE).
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Deque, Dict, List, Optional
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from config import settings
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # ответы на действия пользователя
+    REMINDER = 1  # напоминания планировщика
+    BROADCAST = 2  # ручные рассылки
+    DIGEST = 3  # сводки организаторам
+
+
+_priority: ContextVar[Priority] = ContextVar("outbound_priority", default=Priority.INTERACTIVE)
+
+# Методы Bot API, которые расходуют лимит на отправку сообщений
+QUEUED_METHODS = frozenset({
+    "sendMessage", "sendPhoto", "sendDocument", "sendMediaGroup", "sendVideo", "sendAudio",
+    "copyMessage", "forwardMessage",
+    "editMessageText", "editMessageCaption", "editMessageMedia", "editMessageReplyMarkup",
+})
+
+MAX_RETRIES = 3
+
+
+@contextmanager
+def outbound_priority(priority: Priority):
+    """Класс приоритета для запросов бота внутри блока"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class OutboundQueue:
+    def __init__(self, rate: float, burst: int, per_chat_interval: float):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.per_chat_interval = per_chat_interval
+        self._loop = None
+
+    def _bind(self):
+        """Состояние привязано к event loop'у (бенчмарки и тесты запускают несколько)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        # Класс -> чат -> ожидающие (futures); порядок чатов - очередь обхода по кругу
+        self._waiters: List["OrderedDict[int, Deque[asyncio.Future]]"] = [OrderedDict() for _ in Priority]
+        self._chat_ready: Dict[int, float] = {}
+        self._wake = asyncio.Event()
+        self._dispatcher = loop.create_task(self._dispatch())
+
+    async def acquire(self, priority: Priority, chat_id: Optional[int]):
+        """Дождаться права отправить сообщение в чат `chat_id`"""
+        self._bind()
+        waiter = self._loop.create_future()
+        self._waiters[priority].setdefault(chat_id, deque()).append(waiter)
+        metrics.OUTBOUND_QUEUE_DEPTH.labels(priority.name.lower()).inc()
+        self._wake.set()
+        started = time.perf_counter()
+        try:
+            await waiter
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                # Отменённый запрос не должен занимать место в очереди
+                self._discard(priority, chat_id, waiter)
+        metrics.OUTBOUND_QUEUE_WAIT.labels(priority.name.lower()).observe(time.perf_counter() - started)
+
+    def pause(self, seconds: float):
+        """Telegram ответил 429 - не выдавать разрешения `seconds` секунд"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        logger.warning(f"Telegram flood control: outbound queue paused for {seconds} s")
+
+    def _discard(self, priority: Priority, chat_id, waiter):
+        chats = self._waiters[priority]
+        pending = chats.get(chat_id)
+        if pending is not None and waiter in pending:
+            pending.remove(waiter)
+            metrics.OUTBOUND_QUEUE_DEPTH.labels(priority.name.lower()).inc(-1)
+            if not pending:
+                del chats[chat_id]
+
+    def _pick(self, now: float):
+        """(класс, чат) следующего запроса или момент, когда освободится чат"""
+        earliest = None
+        for priority in Priority:
+            chats = self._waiters[priority]
+            for chat_id in chats:
+                ready = self._chat_ready.get(chat_id, 0.0) if priority != Priority.INTERACTIVE else 0.0
+                if ready <= now:
+                    return priority, chat_id, None
+                earliest = ready if earliest is None else min(earliest, ready)
+        return None, None, earliest
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def _dispatch(self):
+        while True:
+            if not any(self._waiters):
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self._refill(now)
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+            priority, chat_id, earliest = self._pick(now)
+            if priority is None:
+                # Все ожидающие упёрлись в паузу своего чата; новый запрос может прийти раньше
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=earliest - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            chats = self._waiters[priority]
+            pending = chats.pop(chat_id)
+            waiter = pending.popleft()
+            if pending:
+                # Чат уходит в конец круга - остальные чаты класса не ждут его очередь целиком
+                chats[chat_id] = pending
+            metrics.OUTBOUND_QUEUE_DEPTH.labels(priority.name.lower()).inc(-1)
+            if waiter.done():
+                continue
+            self.tokens -= 1
+            if chat_id is not None:
+                self._chat_ready[chat_id] = now + self.per_chat_interval
+                if len(self._chat_ready) > 10000:
+                    self._chat_ready = {c: t for c, t in self._chat_ready.items() if t > now}
+            waiter.set_result(None)
+
+
+_queue: Optional[OutboundQueue] = None
+
+
+def get_outbound_queue() -> OutboundQueue:
+    global _queue
+    if _queue is None:
+        _queue = OutboundQueue(
+            settings.OUTBOUND_RATE_PER_SECOND,
+            settings.OUTBOUND_BURST,
+            settings.OUTBOUND_PER_CHAT_INTERVAL_MS / 1000,
+        )
+    return _queue
+
+
+class OutboundQueueMiddleware(BaseRequestMiddleware):
+    """Пропускает запросы на отправку сообщений через общую очередь с приоритетами"""
+
+    async def __call__(self, make_request, bot, method):
+        if method.__api_method__ not in QUEUED_METHODS:
+            return await make_request(bot, method)
+        queue = get_outbound_queue()
+        priority = _priority.get()
+        chat_id = getattr(method, "chat_id", None)
+        chat_id = chat_id if isinstance(chat_id, int) else None
+        for attempt in range(MAX_RETRIES + 1):
+            await queue.acquire(priority, chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                queue.pause(e.retry_after)
+                if attempt == MAX_RETRIES:
+                    raise
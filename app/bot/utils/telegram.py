@@ -0,0 +1,74 @@
+import time
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.client.telegram import TelegramAPIServer, PRODUCTION
+from aiogram.exceptions import (
+    TelegramAPIError, TelegramBadRequest, TelegramConflictError, TelegramEntityTooLarge,
+    TelegramForbiddenError, TelegramNetworkError, TelegramNotFound, TelegramRetryAfter,
+    TelegramServerError, TelegramUnauthorizedError
+)
+from config import settings
+from utils import metrics
+
+_ERROR_CODES = (
+    (TelegramRetryAfter, "429"),
+    (TelegramForbiddenError, "403"),
+    (TelegramNotFound, "404"),
+    (TelegramConflictError, "409"),
+    (TelegramEntityTooLarge, "413"),
+    (TelegramUnauthorizedError, "401"),
+    (TelegramBadRequest, "400"),
+    (TelegramServerError, "5xx"),
+    (TelegramNetworkError, "network"),
+)
+
+
+def error_code(error: TelegramAPIError) -> str:
+    """Код ошибки Bot API для метрик"""
+    for error_type, code in _ERROR_CODES:
+        if isinstance(error, error_type):
+            return code
+    return "other"
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Время запросов к Bot API и коды ошибок"""
+
+    async def __call__(self, make_request, bot, method):
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramAPIError as e:
+            metrics.TELEGRAM_ERRORS.labels(name, error_code(e)).inc()
+            raise
+        finally:
+            metrics.TELEGRAM_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+
+def telegram_api_server() -> TelegramAPIServer:
+    """Адрес Bot API: настоящий Telegram или TELEGRAM_API_BASE_URL (эмулятор, локальный Bot API)"""
+    if settings.TELEGRAM_API_BASE_URL:
+        return TelegramAPIServer.from_base(settings.TELEGRAM_API_BASE_URL)
+    return PRODUCTION
+
+
+def create_bot() -> Bot:
+    """Создать Bot с учётом TELEGRAM_API_BASE_URL"""
+    if settings.TELEGRAM_API_BASE_URL:
+        bot = Bot(token=settings.BOT_TOKEN, session=AiohttpSession(api=telegram_api_server()))
+    else:
+        bot = Bot(token=settings.BOT_TOKEN)
+    if settings.OUTBOUND_QUEUE_ENABLED:
+        # Очередь - внешний слой: время в метриках Bot API не включает ожидание очереди
+        from bot.utils.outbound import OutboundQueueMiddleware
+        bot.session.middleware(OutboundQueueMiddleware())
+    if settings.METRICS_ENABLED:
+        bot.session.middleware(TelegramMetricsMiddleware())
+    return bot
+
+
+def file_url(file_path: str) -> str:
+    """Ссылка на скачивание файла, полученного через getFile"""
+    return telegram_api_server().file_url(settings.BOT_TOKEN, file_path)
@@ -9,12 +9,114 @@ class Settings(BaseSettings):
     BOT_TOKEN: Optional[str] = None
     BOT_USERNAME: Optional[str] = None  # без @, например mclassregbot
     
+    # Адрес Bot API (эмулятор или локальный Bot API), по умолчанию - api.telegram.org
+    TELEGRAM_API_BASE_URL: Optional[str] = None
+    
     # Telegram WebApp
     WEBAPP_URL: Optional[str] = None
     
     # Database
     DATABASE_URL: str = "sqlite:///./event_registration.db"
     
+    # Пул соединений для интерактивной работы (handlers бота, API)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # секунд ожидания свободного соединения
+    DB_POOL_RECYCLE: int = 1800  # секунд жизни соединения, -1 - без ограничения
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # только PostgreSQL, 0 - без ограничения
+    DB_POOL_SLOW_CHECKOUT_MS: int = 200  # предупреждение в лог, если ждали соединение дольше
+    
+    # Отдельный пул для фоновой работы (планировщик, экспорт)
+    DB_BACKGROUND_POOL_SIZE: int = 2
+    DB_BACKGROUND_MAX_OVERFLOW: int = 2
+    DB_BACKGROUND_STATEMENT_TIMEOUT_MS: int = 0
+    
+    # Логирование: очередь + поток-писатель; лимиты только для записей ниже WARNING
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # text (прежний формат) / json
+    # логгер=записей в секунду; правило для пакета действует на все его модули
+    LOG_RATE_LIMITS: str = "services.notification_service=20,services.scheduler=20,api.routes=20"
+    LOG_SAMPLING: str = ""  # логгер=доля (0..1) записей, которые пишутся
+    
+    # Метрики Prometheus: /metrics в API и отдельный экспортер в процессе бота
+    METRICS_ENABLED: bool = True
+    BOT_METRICS_HOST: str = "127.0.0.1"
+    BOT_METRICS_PORT: int = 0  # 0 - экспортер бота выключен
+    
+    # Бюджеты SQL-запросов на апдейт/HTTP-запрос (работают при METRICS_ENABLED), 0 - не проверять
+    DB_QUERY_BUDGET_COUNT: int = 30
+    DB_QUERY_BUDGET_MS: int = 500
+    DB_N_PLUS_ONE_THRESHOLD: int = 10  # одинаковый statement выполнен N раз за апдейт
+    DB_SLOW_QUERY_MS: int = 200  # запросы дольше - в лог database.slow_queries
+    
+    # Сторож event loop'а (бот и API): lag в метриках, блокировки дольше порога - в лог со стеком
+    LOOP_WATCHDOG_ENABLED: bool = True
+    LOOP_WATCHDOG_INTERVAL_MS: int = 100
+    LOOP_BLOCK_THRESHOLD_MS: int = 250
+    
+    # Профилирование по запросу (/profile в боте, /api/profiling в API)
+    PROFILING_INTERVAL_MS: int = 5  # период снятия стеков
+    PROFILING_MAX_SECONDS: int = 600
+    PROFILING_MAX_UPDATES: int = 1000
+    
+    # Очередь исходящих сообщений (bot/utils/outbound.py): общий лимит и приоритеты
+    OUTBOUND_QUEUE_ENABLED: bool = True
+    OUTBOUND_RATE_PER_SECOND: float = 25  # лимит Telegram - около 30 сообщений в секунду на бота
+    OUTBOUND_BURST: int = 25
+    OUTBOUND_PER_CHAT_INTERVAL_MS: int = 1000  # для напоминаний, рассылок и сводок; ответы не ждут
+    
+    # Outbox (services/outbox.py): напоминания и рассылки пишутся в БД вместе с бизнес-изменением
+    OUTBOX_POLL_SECONDS: int = 5  # как часто воркер проверяет таблицу (повторы, продолжение после рестарта)
+    OUTBOX_BATCH_SIZE: int = 100  # строк, забираемых воркером за раз
+    OUTBOX_CONCURRENCY: int = 10  # одновременных запросов к Bot API; темп задаёт очередь отправки
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_RETRY_BASE_SECONDS: int = 30  # пауза перед повтором удваивается с каждой попыткой
+    OUTBOX_RETRY_MAX_SECONDS: int = 3600
+    OUTBOX_CLAIM_TIMEOUT_SECONDS: int = 300  # строка «в отправке» дольше - процесс упал, берётся заново
+    
+    # Несколько реплик бота: фоновые задачи выполняет одна, выбранная через аренду в БД (services/leader.py)
+    SCHEDULER_LEADER_ELECTION: bool = True
+    SCHEDULER_LEASE_SECONDS: int = 30  # аренда, не продлённая за это время, переходит резервной реплике
+    SCHEDULER_LEASE_RENEW_SECONDS: int = 10  # продление лидером и проверка резервом
+    
+    # Напоминания после простоя: наверстываются по порядку scheduled_time, порциями
+    REMINDER_CATCHUP_BATCH: int = 20  # напоминаний (событие, время), разворачиваемых за один тик
+    REMINDER_STALE_AFTER_MINUTES: int = 180  # опоздавшее сильнее не отправляется; 0 - без ограничения
+    REMINDER_OUTBOX_BACKLOG: int = 5000  # не разворачивать новые, пока в outbox столько неотправленных строк
+    
+    # Сводки организаторам: ответы участников копятся по (событие, организатор)
+    ORGANIZER_DIGEST_INTERVAL_SECONDS: int = 60  # 0 - отправлять каждый ответ сразу
+    ORGANIZER_DIGEST_MAX_EVENTS: int = 20  # сводка уходит досрочно, набрав столько ответов
+    ORGANIZER_CONTACT_URGENT: bool = True  # «Свяжитесь со мной» - сразу, вместе с накопленным
+    ORGANIZER_RECIPIENTS_CACHE_SECONDS: int = 600  # страховка от изменений получателей из другого процесса
+    
+    # Недоступные пользователи (заблокировали бота, чат не найден): отправка пропускается,
+    # раз в DELIVERY_REPROBE_HOURS одно сообщение уходит как проверка. Удалённые аккаунты не проверяются
+    DELIVERY_REPROBE_HOURS: int = 168
+    
+    # Автоматическое архивирование прошедших событий
+    EVENT_AUTO_ARCHIVE_ENABLED: bool = True
+    EVENT_AUTO_ARCHIVE_AFTER_HOURS: int = 24  # через сколько часов после начала событие уходит в архив
+    EVENT_LIFECYCLE_INTERVAL_MINUTES: int = 15
+    
+    # Хранение истории: перенос старых данных из горячих таблиц в архивные
+    RETENTION_ENABLED: bool = True
+    RETENTION_INTERVAL_HOURS: int = 24
+    RETENTION_SENT_NOTIFICATIONS_DAYS: int = 30  # отправленные уведомления старше N дней
+    RETENTION_ARCHIVED_EVENTS_DAYS: int = 90  # регистрации архивных событий, прошедших N дней назад
+    RETENTION_BATCH_SIZE: int = 1000  # строк в одной транзакции
+    RETENTION_VACUUM_MIN_ROWS: int = 50000  # VACUUM только если перенесено не меньше строк
+    
+    # SQLite (применяется только если DATABASE_URL указывает на SQLite)
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # байт, 0 - отключить
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    SQLITE_CHECKPOINT_INTERVAL: int = 300  # секунд между checkpoint WAL, 0 - отключить
+    SQLITE_CHECKPOINT_MODE: str = "PASSIVE"  # PASSIVE / FULL / RESTART / TRUNCATE
+    
     # API
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
@@ -1,13 +1,126 @@
-from sqlalchemy import create_engine
+import logging
+import os
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import NullPool
 from config import settings
+from database.pool import InstrumentedQueuePool, PoolStats
+from database.instrumentation import instrument_engine
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+logger = logging.getLogger(__name__)
+
+
+def is_sqlite(url: str = None) -> bool:
+    """Указывает ли URL БД на SQLite"""
+    return (url or settings.DATABASE_URL).startswith("sqlite")
+
+
+def sqlite_pragmas() -> dict:
+    """PRAGMA, которые применяются к каждому новому соединению SQLite"""
+    pragmas = {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        # Отрицательное значение cache_size задаётся в килобайтах
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KB,
+    }
+    if settings.SQLITE_MMAP_SIZE:
+        pragmas["mmap_size"] = settings.SQLITE_MMAP_SIZE
+    return pragmas
+
+
+def configure_sqlite(target: Engine, pragmas: dict = None):
+    """Применять PRAGMA при каждом подключении к SQLite"""
+    pragmas = sqlite_pragmas() if pragmas is None else pragmas
+
+    @event.listens_for(target, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def make_engine(
+    name: str,
+    pool_size: int,
+    max_overflow: int,
+    statement_timeout_ms: int = 0,
+    url: str = None,
+    pool_timeout: int = None
+) -> Engine:
+    """Создать engine с настраиваемым пулом и учётом ожидания соединений"""
+    url = url or settings.DATABASE_URL
+    connect_args = {}
+    pool_kwargs = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+    if is_sqlite(url):
+        connect_args["check_same_thread"] = False
+    elif statement_timeout_ms and url.startswith("postgresql"):
+        connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+
+    # In-memory SQLite живёт в одном соединении - для неё оставляем пул SQLAlchemy по умолчанию
+    instrumented = not (is_sqlite(url) and (":memory:" in url or url.rstrip("/") == "sqlite:"))
+    if instrumented:
+        pool_kwargs.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.DB_POOL_TIMEOUT if pool_timeout is None else pool_timeout,
+        )
+
+    new_engine = create_engine(url, connect_args=connect_args, **pool_kwargs)
+    if instrumented:
+        new_engine.pool.stats = pool_stats[name] = PoolStats(name, settings.DB_POOL_SLOW_CHECKOUT_MS)
+    if settings.METRICS_ENABLED:
+        instrument_engine(new_engine, name)
+    if is_sqlite(url):
+        configure_sqlite(new_engine)
+    return new_engine
+
+
+def get_pool_metrics() -> dict:
+    """Состояние пулов: ожидание соединений и текущая занятость"""
+    metrics = {}
+    for name, pool_engine in (("interactive", engine), ("background", background_engine)):
+        pool = pool_engine.pool
+        data = pool_stats[name].snapshot() if name in pool_stats else {}
+        if hasattr(pool, "checkedout"):
+            data.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+        metrics[name] = data
+    return metrics
+
+
+pool_stats = {}
+
+# Интерактивные запросы: handlers бота и API
+engine = make_engine(
+    "interactive",
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    statement_timeout_ms=settings.DB_STATEMENT_TIMEOUT_MS,
+)
+
+# Фоновая работа (планировщик, экспорт) не должна занимать соединения интерактивного пула
+background_engine = make_engine(
+    "background",
+    pool_size=settings.DB_BACKGROUND_POOL_SIZE,
+    max_overflow=settings.DB_BACKGROUND_MAX_OVERFLOW,
+    statement_timeout_ms=settings.DB_BACKGROUND_STATEMENT_TIMEOUT_MS,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+BackgroundSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=background_engine)
 
 
 def get_db() -> Session:
@@ -19,8 +132,123 @@ def get_db() -> Session:
         db.close()
 
 
-def init_db():
-    """Инициализация БД - создание всех таблиц"""
-    from database.models import Base
-    Base.metadata.create_all(bind=engine)
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# pg_advisory_xact_lock: одновременно миграции применяет одна реплика
+_MIGRATION_LOCK_KEY = 0x6D636C6173736D67
+
+
+# Схема, которую создавал create_all до проверки версии Alembic при старте (max_participants)
+BASELINE_REVISION = "a4d22b0cf1b4"
 
+
+def migration_config(connection=None):
+    """Конфигурация Alembic без alembic.ini; с `connection` env.py выполняет миграции на нём"""
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def migration_scripts():
+    """Каталог миграций Alembic (env.py не запускается)"""
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(migration_config())
+
+
+def init_db(upgrade: bool = True):
+    """
+    Привести схему БД к последней миграции при старте. Совпадающая версия - один SELECT.
+
+    - пустая БД: создаём таблицы и помечаем её последней ревизией;
+    - версия отстаёт: `alembic upgrade head`, вместе с миграциями данных;
+    - таблицы есть, а `alembic_version` нет (БД создана create_all старой версии): помечаем
+      её BASELINE_REVISION и применяем все миграции после неё.
+
+    Миграции применяет процесс бота; реплики в PostgreSQL ждут друг друга на advisory lock.
+    С `upgrade=False` (API) отставшая схема - ошибка старта, а не падение на первом запросе.
+    """
+    from alembic import command
+    from alembic.runtime.migration import MigrationContext
+
+    head = migration_scripts().get_current_head()
+    with engine.connect() as conn:
+        current = MigrationContext.configure(conn).get_current_revision()
+    if current == head:
+        return
+    if not upgrade:
+        raise RuntimeError(
+            f"Схема БД на ревизии {current}, последняя миграция - {head}. "
+            f"Запустите бота (он применяет миграции) или выполните `alembic upgrade head` в каталоге app/"
+        )
+
+    # Без statement_timeout интерактивного пула: миграция данных может идти дольше
+    migration_engine = create_engine(settings.DATABASE_URL, poolclass=NullPool)
+    if is_sqlite():
+        configure_sqlite(migration_engine)
+    try:
+        with migration_engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Снимается вместе с commit; вторая реплика увидит уже обновлённую версию
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+            context = MigrationContext.configure(conn)
+            current = context.get_current_revision()
+            if current == head:
+                return
+            config = migration_config(conn)
+            if current is None:
+                if not conn.dialect.get_table_names(conn):
+                    from database.models import Base
+
+                    Base.metadata.create_all(bind=conn)
+                    command.stamp(config, "head")
+                    logger.info(f"Создана схема БД, ревизия {head}")
+                    return
+                logger.warning(
+                    f"В БД нет версии Alembic (создана через create_all) - "
+                    f"считаем её ревизией {BASELINE_REVISION} и применяем миграции"
+                )
+                command.stamp(config, BASELINE_REVISION)
+            logger.info(f"Миграция схемы БД: {current or BASELINE_REVISION} -> {head}")
+            command.upgrade(config, "head")
+    finally:
+        migration_engine.dispose()
+
+
+def checkpoint_wal(mode: str = None):
+    """Перенести WAL в основной файл БД (только для SQLite в режиме WAL)"""
+    if not is_sqlite() or settings.SQLITE_JOURNAL_MODE.upper() != "WAL":
+        return None
+    mode = (mode or settings.SQLITE_CHECKPOINT_MODE).upper()
+    with background_engine.connect() as conn:
+        busy, log_frames, checkpointed = conn.exec_driver_sql(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    if busy:
+        logger.warning(f"WAL checkpoint ({mode}) не завершён: БД занята, перенесено {checkpointed}/{log_frames} страниц")
+    else:
+        logger.debug(f"WAL checkpoint ({mode}): перенесено {checkpointed}/{log_frames} страниц")
+    return busy, log_frames, checkpointed
+
+
+def backup_sqlite(dest_path: str, pages: int = 1024):
+    """
+    Онлайн‑резервная копия SQLite через backup API: копирование идёт порциями
+    по `pages` страниц и не блокирует работу бота и API.
+    """
+    import sqlite3
+
+    if not is_sqlite():
+        raise ValueError("Резервное копирование через backup API доступно только для SQLite")
+
+    raw = engine.raw_connection()
+    try:
+        dest = sqlite3.connect(dest_path)
+        try:
+            raw.driver_connection.backup(dest, pages=pages)
+        finally:
+            dest.close()
+    finally:
+        raw.close()
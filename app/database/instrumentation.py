@@ -0,0 +1,175 @@
+"""
+Учёт SQL-запросов: время каждого запроса по пулам и привязка к текущему
+апдейту бота или HTTP-запросу через contextvar.
+
+Для каждого апдейта/HTTP-запроса считаются число запросов, их суммарное время и
+повторы одинаковых statement'ов: один и тот же SELECT, выполненный в цикле десятки
+раз, - характерный признак N+1. Превышение бюджетов пишется в лог предупреждением,
+медленные запросы - в отдельный логгер `database.slow_queries`.
+"""
+import logging
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config import settings
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("database.slow_queries")
+
+# Длина statement'а в логах: полный текст больших SELECT'ов только мешает
+STATEMENT_LOG_LIMIT = 500
+
+_recent_slow_queries = deque(maxlen=100)
+
+
+class QueryStats:
+    """Запросы одного апдейта/HTTP-запроса"""
+    __slots__ = ("label", "count", "duration", "statements", "parent")
+
+    def __init__(self, label: str = "", parent: Optional["QueryStats"] = None):
+        self.label = label
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.parent = parent
+
+    def most_repeated(self):
+        """(statement, сколько раз выполнен) для самого частого запроса или (None, 0)"""
+        if not self.statements:
+            return None, 0
+        return self.statements.most_common(1)[0]
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Блок кода выполнил больше запросов, чем разрешено query_budget"""
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def start_query_tracking(label: str = ""):
+    """Начать учёт запросов в текущем контексте; вернуть (stats, token для stop_query_tracking)
+
+    Вложенный учёт не прячет запросы от внешнего: они засчитываются обоим.
+    """
+    stats = QueryStats(label, parent=_current_stats.get())
+    return stats, _current_stats.set(stats)
+
+
+def stop_query_tracking(token):
+    _current_stats.reset(token)
+
+
+def budget_violations(stats: QueryStats, max_queries: int = 0, max_ms: int = 0, max_repeats: int = 0) -> List[str]:
+    """Описание нарушенных бюджетов (0 - бюджет не проверяется)"""
+    problems = []
+    if max_queries and stats.count > max_queries:
+        problems.append(f"{stats.count} SQL queries (budget {max_queries})")
+    if max_ms and stats.duration * 1000 > max_ms:
+        problems.append(f"{stats.duration * 1000:.0f} ms in SQL (budget {max_ms} ms)")
+    statement, repeats = stats.most_repeated()
+    if max_repeats and repeats >= max_repeats:
+        problems.append(f"possible N+1: statement executed {repeats} times: {_shorten(statement)}")
+    return problems
+
+
+def check_query_budget(stats: QueryStats, label: str):
+    """Предупредить в лог, если апдейт/HTTP-запрос вышел за бюджеты из настроек"""
+    problems = budget_violations(
+        stats,
+        max_queries=settings.DB_QUERY_BUDGET_COUNT,
+        max_ms=settings.DB_QUERY_BUDGET_MS,
+        max_repeats=settings.DB_N_PLUS_ONE_THRESHOLD,
+    )
+    if problems:
+        metrics.DB_BUDGET_EXCEEDED.labels(label).inc()
+        logger.warning(f"{label}: " + "; ".join(problems))
+
+
+@contextmanager
+def query_budget(max_queries: int = 0, max_ms: int = 0, max_repeats: int = 0, label: str = "block"):
+    """Проверка бюджета запросов для блока кода (бенчмарки, проверки handlers):
+
+        with query_budget(max_queries=10, max_repeats=3):
+            await dp.feed_update(bot, update)
+
+    При превышении бросает QueryBudgetExceeded (наследник AssertionError).
+    Запросы считаются только на engine'ах, подключённых через instrument_engine.
+    """
+    stats, token = start_query_tracking(label)
+    try:
+        yield stats
+    finally:
+        stop_query_tracking(token)
+    problems = budget_violations(stats, max_queries, max_ms, max_repeats)
+    if problems:
+        raise QueryBudgetExceeded(f"{label}: " + "; ".join(problems))
+
+
+def recent_slow_queries() -> list:
+    """Последние медленные запросы (новые в конце) для диагностики"""
+    return list(_recent_slow_queries)
+
+
+def _shorten(statement: Optional[str]) -> str:
+    statement = " ".join((statement or "").split())
+    if len(statement) > STATEMENT_LOG_LIMIT:
+        return statement[:STATEMENT_LOG_LIMIT] + "..."
+    return statement
+
+
+def _log_slow_query(pool_name: str, statement: str, elapsed: float, stats: Optional[QueryStats]):
+    label = stats.label if stats is not None and stats.label else "-"
+    text = _shorten(statement)
+    _recent_slow_queries.append({
+        "at": datetime.utcnow().isoformat(),
+        "pool": pool_name,
+        "source": label,
+        "ms": round(elapsed * 1000, 1),
+        "statement": text,
+    })
+    # Параметры запросов не пишем: в них персональные данные из анкет
+    slow_query_logger.warning(f"{elapsed * 1000:.0f} ms [{pool_name}] [{label}] {text}")
+
+
+def instrument_engine(target: Engine, pool_name: str):
+    """Подключить учёт запросов к engine"""
+    histogram = metrics.DB_QUERY_SECONDS.labels(pool_name)
+    slow_threshold = settings.DB_SLOW_QUERY_MS / 1000
+
+    @event.listens_for(target, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        histogram.observe(elapsed)
+        stats = _current_stats.get()
+        if slow_threshold and elapsed >= slow_threshold:
+            _log_slow_query(pool_name, statement, elapsed, stats)
+        while stats is not None:
+            stats.count += 1
+            stats.duration += elapsed
+            # Скомпилированный SQL берётся из кэша SQLAlchemy, поэтому строка одна
+            # и та же и её хэш уже посчитан - учёт повторов почти бесплатный
+            stats.statements[statement] += 1
+            stats = stats.parent
+
+
+def refresh_pool_metrics():
+    """Состояние пулов для /metrics"""
+    from database.database import get_pool_metrics
+
+    for name, data in get_pool_metrics().items():
+        if "checked_out" in data:
+            metrics.DB_POOL_CHECKED_OUT.labels(name).set(data["checked_out"])
+        if "wait_seconds_total" in data:
+            metrics.DB_POOL_WAIT_SECONDS.labels(name).set(data["wait_seconds_total"])
+            metrics.DB_POOL_TIMEOUTS.labels(name).set(data["timeouts"])
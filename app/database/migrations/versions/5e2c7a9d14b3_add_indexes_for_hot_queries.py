@@ -0,0 +1,54 @@
+"""Add indexes for hot queries
+
+Revision ID: 5e2c7a9d14b3
+Revises: a4d22b0cf1b4
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2c7a9d14b3'
+down_revision = 'a4d22b0cf1b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Уникальный индекс не создастся при наличии дублей - сообщаем заранее и понятно
+    conn = op.get_bind()
+    duplicates = conn.execute(sa.text(
+        "SELECT event_id, user_telegram_id, COUNT(*) FROM registrations "
+        "GROUP BY event_id, user_telegram_id HAVING COUNT(*) > 1"
+    )).fetchall()
+    if duplicates:
+        raise RuntimeError(
+            f"Найдено {len(duplicates)} повторных регистраций (event_id, user_telegram_id), "
+            f"например {tuple(duplicates[0][:2])}. Удалите дубли и повторите миграцию."
+        )
+
+    op.create_index('ix_events_status_date_time', 'events', ['status', 'date_time'])
+    op.create_index('uq_registrations_event_user', 'registrations', ['event_id', 'user_telegram_id'], unique=True)
+    op.create_index('ix_registrations_user_created', 'registrations', ['user_telegram_id', 'created_at'])
+    op.create_index('ix_event_notifications_event_enabled', 'event_notifications', ['event_id', 'enabled'])
+    op.create_index(
+        'ix_scheduled_notifications_pending',
+        'scheduled_notifications',
+        ['scheduled_time'],
+        sqlite_where=sa.text('sent = 0'),
+        postgresql_where=sa.text('sent = false'),
+    )
+    op.create_index('ix_scheduled_notifications_event_time', 'scheduled_notifications', ['event_id', 'scheduled_time'])
+    op.create_index('ix_scheduled_notifications_registration', 'scheduled_notifications', ['registration_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_scheduled_notifications_registration', table_name='scheduled_notifications')
+    op.drop_index('ix_scheduled_notifications_event_time', table_name='scheduled_notifications')
+    op.drop_index('ix_scheduled_notifications_pending', table_name='scheduled_notifications')
+    op.drop_index('ix_event_notifications_event_enabled', table_name='event_notifications')
+    op.drop_index('ix_registrations_user_created', table_name='registrations')
+    op.drop_index('uq_registrations_event_user', table_name='registrations')
+    op.drop_index('ix_events_status_date_time', table_name='events')
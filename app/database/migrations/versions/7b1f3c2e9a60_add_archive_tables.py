@@ -0,0 +1,56 @@
+"""Add archive tables for retention
+
+Revision ID: 7b1f3c2e9a60
+Revises: 5e2c7a9d14b3
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b1f3c2e9a60'
+down_revision = '5e2c7a9d14b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'events',
+        sa.Column('archived_registrations_count', sa.Integer(), nullable=False, server_default='0')
+    )
+    op.create_table('archived_registrations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('user_telegram_id', sa.Integer(), nullable=False),
+    sa.Column('data_json', sa.JSON(), nullable=False),
+    sa.Column('confirmed', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_archived_registrations_event_id'), 'archived_registrations', ['event_id'], unique=False)
+    op.create_table('archived_scheduled_notifications',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('registration_id', sa.Integer(), nullable=False),
+    sa.Column('notification_type', sa.String(length=50), nullable=False),
+    sa.Column('scheduled_time', sa.DateTime(), nullable=False),
+    sa.Column('sent', sa.Boolean(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_archived_scheduled_notifications_event_id'), 'archived_scheduled_notifications', ['event_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_archived_scheduled_notifications_event_id'), table_name='archived_scheduled_notifications')
+    op.drop_table('archived_scheduled_notifications')
+    op.drop_index(op.f('ix_archived_registrations_event_id'), table_name='archived_registrations')
+    op.drop_table('archived_registrations')
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.drop_column('archived_registrations_count')
@@ -0,0 +1,24 @@
+"""Add dropped_reason to reminder_jobs
+
+Revision ID: a6c4e2f8b017
+Revises: f2b8d5e1a934
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c4e2f8b017'
+down_revision = 'f2b8d5e1a934'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('reminder_jobs', sa.Column('dropped_reason', sa.String(length=20), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('reminder_jobs', 'dropped_reason')
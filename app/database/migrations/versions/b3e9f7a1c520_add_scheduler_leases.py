@@ -0,0 +1,32 @@
+"""Add scheduler_leases
+
+Revision ID: b3e9f7a1c520
+Revises: a6c4e2f8b017
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e9f7a1c520'
+down_revision = 'a6c4e2f8b017'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'scheduler_leases',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('holder', sa.String(length=255), nullable=False),
+        sa.Column('acquired_at', sa.DateTime(), nullable=False),
+        sa.Column('renewed_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('scheduler_leases')
@@ -0,0 +1,28 @@
+"""Add template versioning and template link to scheduled notifications
+
+Revision ID: c3d8e1f5a207
+Revises: 7b1f3c2e9a60
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d8e1f5a207'
+down_revision = '7b1f3c2e9a60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Версия шаблона для кэша скомпилированных шаблонов; у старых строк берётся created_at
+    op.add_column('notification_templates', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    # Без внешнего ключа: шаблон можно удалить, тогда уходит текст по умолчанию
+    op.add_column('scheduled_notifications', sa.Column('template_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('scheduled_notifications', 'template_id')
+    op.drop_column('notification_templates', 'updated_at')
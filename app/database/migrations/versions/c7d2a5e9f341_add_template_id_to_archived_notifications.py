@@ -0,0 +1,25 @@
+"""Add template_id to archived_scheduled_notifications
+
+Revision ID: c7d2a5e9f341
+Revises: b3e9f7a1c520
+Create Date: 2026-10-20 10:00:00.000000
+
+Строки, перенесённые в архив раньше, остаются без шаблона: исходные уже удалены.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2a5e9f341'
+down_revision = 'b3e9f7a1c520'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('archived_scheduled_notifications', sa.Column('template_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('archived_scheduled_notifications', 'template_id')
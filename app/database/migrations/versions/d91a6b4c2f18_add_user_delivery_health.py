@@ -0,0 +1,37 @@
+"""Add delivery health to users
+
+Revision ID: d91a6b4c2f18
+Revises: c3d8e1f5a207
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91a6b4c2f18'
+down_revision = 'c3d8e1f5a207'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('delivery_status', sa.String(length=20), nullable=True))
+    op.add_column('users', sa.Column('delivery_failed_at', sa.DateTime(), nullable=True))
+    op.add_column('users', sa.Column('delivery_checked_at', sa.DateTime(), nullable=True))
+    # Недоступных единицы процентов - частичный индекс остаётся маленьким
+    op.create_index(
+        'ix_users_undeliverable',
+        'users',
+        ['delivery_status', 'delivery_checked_at'],
+        sqlite_where=sa.text('delivery_status IS NOT NULL'),
+        postgresql_where=sa.text('delivery_status IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_undeliverable', table_name='users')
+    op.drop_column('users', 'delivery_checked_at')
+    op.drop_column('users', 'delivery_failed_at')
+    op.drop_column('users', 'delivery_status')
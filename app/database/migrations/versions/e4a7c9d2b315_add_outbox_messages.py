@@ -0,0 +1,56 @@
+"""Add outbox_messages
+
+Revision ID: e4a7c9d2b315
+Revises: d91a6b4c2f18
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a7c9d2b315'
+down_revision = 'd91a6b4c2f18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'outbox_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('idempotency_key', sa.String(length=100), nullable=False),
+        sa.Column('source', sa.String(length=20), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False),
+        sa.Column('chat_id', sa.Integer(), nullable=False),
+        sa.Column('message_text', sa.Text(), nullable=False),
+        sa.Column('reply_markup', sa.JSON(), nullable=True),
+        sa.Column('status', sa.String(length=10), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('claim_token', sa.String(length=32), nullable=True),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('idempotency_key'),
+    )
+    # Незавершённых строк - единицы процентов таблицы, частичный индекс остаётся маленьким
+    op.create_index(
+        'ix_outbox_messages_pending',
+        'outbox_messages',
+        ['priority', 'next_attempt_at'],
+        sqlite_where=sa.text("status IN ('pending', 'sending')"),
+        postgresql_where=sa.text("status IN ('pending', 'sending')"),
+    )
+    op.create_index('ix_outbox_messages_claim_token', 'outbox_messages', ['claim_token'])
+    op.create_index('ix_outbox_messages_finished', 'outbox_messages', ['status', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_messages_finished', table_name='outbox_messages')
+    op.drop_index('ix_outbox_messages_claim_token', table_name='outbox_messages')
+    op.drop_index('ix_outbox_messages_pending', table_name='outbox_messages')
+    op.drop_table('outbox_messages')
@@ -0,0 +1,81 @@
+"""Add reminder_jobs
+
+Revision ID: f2b8d5e1a934
+Revises: e4a7c9d2b315
+Create Date: 2026-10-19 21:00:00.000000
+
+Неотправленные scheduled_notifications сворачиваются в reminder_jobs - одна строка на
+(событие, время) - и удаляются; отправленные остаются историей. Downgrade удаляет
+reminder_jobs без обратного разворачивания: неразосланные напоминания нужно
+пересоздать, заново сохранив настройки уведомлений событий.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8d5e1a934'
+down_revision = 'e4a7c9d2b315'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'reminder_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('notification_type', sa.String(length=50), nullable=False),
+        sa.Column('template_id', sa.Integer(), nullable=True),
+        sa.Column('scheduled_time', sa.DateTime(), nullable=False),
+        sa.Column('sent', sa.Boolean(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('recipients_count', sa.Integer(), nullable=True),
+        sa.Column('skipped_count', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['event_id'], ['events.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_reminder_jobs_pending',
+        'reminder_jobs',
+        ['scheduled_time'],
+        sqlite_where=sa.text('sent = 0'),
+        postgresql_where=sa.text('sent = false'),
+    )
+    op.create_index('uq_reminder_jobs_event_time', 'reminder_jobs', ['event_id', 'scheduled_time'], unique=True)
+
+    scheduled = sa.table(
+        'scheduled_notifications',
+        sa.column('event_id', sa.Integer), sa.column('notification_type', sa.String),
+        sa.column('template_id', sa.Integer), sa.column('scheduled_time', sa.DateTime),
+        sa.column('sent', sa.Boolean), sa.column('created_at', sa.DateTime),
+    )
+    jobs = sa.table(
+        'reminder_jobs',
+        sa.column('event_id', sa.Integer), sa.column('notification_type', sa.String),
+        sa.column('template_id', sa.Integer), sa.column('scheduled_time', sa.DateTime),
+        sa.column('sent', sa.Boolean), sa.column('created_at', sa.DateTime),
+    )
+    op.execute(
+        jobs.insert().from_select(
+            ['event_id', 'notification_type', 'template_id', 'scheduled_time', 'sent', 'created_at'],
+            sa.select(
+                scheduled.c.event_id,
+                sa.func.min(scheduled.c.notification_type),
+                sa.func.max(scheduled.c.template_id),
+                scheduled.c.scheduled_time,
+                sa.false(),
+                sa.func.min(scheduled.c.created_at),
+            )
+            .where(scheduled.c.sent == sa.false())
+            .group_by(scheduled.c.event_id, scheduled.c.scheduled_time)
+        )
+    )
+    op.execute(scheduled.delete().where(scheduled.c.sent == sa.false()))
+
+
+def downgrade() -> None:
+    op.drop_index('uq_reminder_jobs_event_time', table_name='reminder_jobs')
+    op.drop_index('ix_reminder_jobs_pending', table_name='reminder_jobs')
+    op.drop_table('reminder_jobs')
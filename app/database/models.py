@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, JSON, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, JSON, Enum as SQLEnum, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -38,12 +38,28 @@ class User(Base):
     full_name = Column(String(255), nullable=True)
     role = Column(SQLEnum(UserRole), default=UserRole.USER, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Доставка сообщений (services/delivery_health.py): None - доступен,
+    # 'blocked' / 'chat_not_found' / 'deactivated' - последняя отправка не прошла
+    delivery_status = Column(String(20), nullable=True)
+    delivery_failed_at = Column(DateTime, nullable=True)  # с какого момента недоступен
+    delivery_checked_at = Column(DateTime, nullable=True)  # последняя неудачная попытка
     
     # Relationships
     created_events = relationship("Event", foreign_keys="Event.created_by", back_populates="creator")
     approved_events = relationship("Event", foreign_keys="Event.approved_by", back_populates="approver")
     registrations = relationship("Registration", back_populates="user")
     event_permissions = relationship("UserEventPermission", back_populates="user")
+    
+    __table_args__ = (
+        # Недоступные пользователи: рассылки и планировщик исключают их подзапросом
+        Index(
+            "ix_users_undeliverable",
+            "delivery_status",
+            "delivery_checked_at",
+            sqlite_where=text("delivery_status IS NOT NULL"),
+            postgresql_where=text("delivery_status IS NOT NULL"),
+        ),
+    )
 
 
 class Event(Base):
@@ -59,6 +75,7 @@ class Event(Base):
     photo_file_id = Column(String(255), nullable=True)  # file_id фотографии в Telegram
     photo_file_ids = Column(JSON, nullable=True)  # Список file_id для нескольких фото
     max_participants = Column(Integer, nullable=True)  # Максимальное количество участников (None = без ограничений)
+    archived_registrations_count = Column(Integer, default=0, server_default="0", nullable=False)  # Регистрации, перенесённые в архив
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
@@ -69,6 +86,12 @@ class Event(Base):
     registrations = relationship("Registration", back_populates="event", cascade="all, delete-orphan")
     notifications = relationship("EventNotification", back_populates="event", cascade="all, delete-orphan")
     user_permissions = relationship("UserEventPermission", back_populates="event", cascade="all, delete-orphan")
+    reminder_jobs = relationship("ReminderJob", back_populates="event", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Списки активных событий: фильтр по статусу + сортировка по дате
+        Index("ix_events_status_date_time", "status", "date_time"),
+    )
 
 
 class EventField(Base):
@@ -100,6 +123,13 @@ class Registration(Base):
     event = relationship("Event", back_populates="registrations")
     user = relationship("User", back_populates="registrations")
     scheduled_notifications = relationship("ScheduledNotification", back_populates="registration", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Один пользователь - одна регистрация на событие
+        Index("uq_registrations_event_user", "event_id", "user_telegram_id", unique=True),
+        # "Мои регистрации": фильтр по пользователю + сортировка по дате
+        Index("ix_registrations_user_created", "user_telegram_id", "created_at"),
+    )
 
 
 class NotificationTemplate(Base):
@@ -111,6 +141,7 @@ class NotificationTemplate(Base):
     absolute_datetime = Column(DateTime, nullable=True)  # Конкретная дата и время уведомления
     message_template = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, nullable=True, onupdate=datetime.utcnow)  # Версия для кэша скомпилированных шаблонов
     
     # Relationships
     event_notifications = relationship("EventNotification", back_populates="template")
@@ -130,6 +161,10 @@ class EventNotification(Base):
     # Relationships
     event = relationship("Event", back_populates="notifications")
     template = relationship("NotificationTemplate", back_populates="event_notifications")
+    
+    __table_args__ = (
+        Index("ix_event_notifications_event_enabled", "event_id", "enabled"),
+    )
 
 
 class UserEventPermission(Base):
@@ -148,13 +183,51 @@ class UserEventPermission(Base):
     event = relationship("Event", back_populates="user_permissions")
 
 
+class ReminderJob(Base):
+    """Напоминание события: одна строка на (событие, время отправки).
+
+    Получатели не материализуются заранее - это регистрации события на момент отправки
+    (services/scheduler.py разворачивает их в outbox).
+    """
+    __tablename__ = "reminder_jobs"
+    
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
+    notification_type = Column(String(50), nullable=False)  # 'template' или 'custom'
+    template_id = Column(Integer, nullable=True)  # NotificationTemplate.id; без FK - шаблон можно удалить
+    scheduled_time = Column(DateTime, nullable=False)
+    sent = Column(Boolean, default=False, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+    recipients_count = Column(Integer, nullable=True)  # сообщений поставлено в outbox
+    skipped_count = Column(Integer, nullable=True)  # пропущено недоступных получателей
+    dropped_reason = Column(String(20), nullable=True)  # закрыто без отправки (notification_service.drop_reason)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    event = relationship("Event", back_populates="reminder_jobs")
+    
+    __table_args__ = (
+        # Очередь планировщика: только неразосланные, по времени отправки
+        Index(
+            "ix_reminder_jobs_pending",
+            "scheduled_time",
+            sqlite_where=text("sent = 0"),
+            postgresql_where=text("sent = false"),
+        ),
+        # Одно напоминание на время; заодно - расписание события по времени
+        Index("uq_reminder_jobs_event_time", "event_id", "scheduled_time", unique=True),
+    )
+
+
 class ScheduledNotification(Base):
+    """История напоминаний по регистрациям до перехода на reminder_jobs; новые строки не пишутся"""
     __tablename__ = "scheduled_notifications"
     
     id = Column(Integer, primary_key=True, index=True)
     event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
     registration_id = Column(Integer, ForeignKey("registrations.id"), nullable=False)
     notification_type = Column(String(50), nullable=False)  # 'template' или 'custom'
+    template_id = Column(Integer, nullable=True)  # NotificationTemplate.id; без FK - шаблон можно удалить
     scheduled_time = Column(DateTime, nullable=False)
     sent = Column(Boolean, default=False, nullable=False)
     sent_at = Column(DateTime, nullable=True)
@@ -162,4 +235,90 @@ class ScheduledNotification(Base):
     
     # Relationships
     registration = relationship("Registration", back_populates="scheduled_notifications")
+    
+    __table_args__ = (
+        # Очередь планировщика: только неотправленные, по времени отправки
+        Index(
+            "ix_scheduled_notifications_pending",
+            "scheduled_time",
+            sqlite_where=text("sent = 0"),
+            postgresql_where=text("sent = false"),
+        ),
+        Index("ix_scheduled_notifications_event_time", "event_id", "scheduled_time"),
+        Index("ix_scheduled_notifications_registration", "registration_id"),
+    )
 
+
+
+class OutboxMessage(Base):
+    """Исходящее сообщение, записанное в одной транзакции с бизнес-изменением (services/outbox.py)"""
+    __tablename__ = "outbox_messages"
+    
+    id = Column(Integer, primary_key=True)
+    idempotency_key = Column(String(100), unique=True, nullable=False)  # 'reminder:<id>', 'manual:<рассылка>:<регистрация>'
+    source = Column(String(20), nullable=False)  # метка для метрик: scheduler, manual
+    priority = Column(Integer, nullable=False, default=0)  # bot.utils.outbound.Priority
+    chat_id = Column(Integer, nullable=False)
+    message_text = Column(Text, nullable=False)
+    reply_markup = Column(JSON, nullable=True)
+    status = Column(String(10), nullable=False, default="pending")  # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = Column(String(32), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        # Очередь воркера: только незавершённые строки
+        Index(
+            "ix_outbox_messages_pending",
+            "priority",
+            "next_attempt_at",
+            sqlite_where=text("status IN ('pending', 'sending')"),
+            postgresql_where=text("status IN ('pending', 'sending')"),
+        ),
+        Index("ix_outbox_messages_claim_token", "claim_token"),
+        Index("ix_outbox_messages_finished", "status", "created_at"),
+    )
+
+
+class SchedulerLease(Base):
+    """Аренда фоновых задач: какая реплика бота сейчас лидер (services/leader.py)"""
+    __tablename__ = "scheduler_leases"
+    
+    name = Column(String(50), primary_key=True)
+    holder = Column(String(255), nullable=False)  # хост:pid реплики
+    acquired_at = Column(DateTime, nullable=False)
+    renewed_at = Column(DateTime, nullable=False)  # последний heartbeat
+    expires_at = Column(DateTime, nullable=False)
+
+
+class ArchivedRegistration(Base):
+    """Регистрации архивных событий, вынесенные из горячей таблицы registrations"""
+    __tablename__ = "archived_registrations"
+    
+    id = Column(Integer, primary_key=True)  # id исходной регистрации
+    event_id = Column(Integer, nullable=False, index=True)
+    user_telegram_id = Column(Integer, nullable=False)
+    data_json = Column(JSON, nullable=False)
+    confirmed = Column(Boolean, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ArchivedScheduledNotification(Base):
+    """Отправленные уведомления, вынесенные из горячей таблицы scheduled_notifications"""
+    __tablename__ = "archived_scheduled_notifications"
+    
+    id = Column(Integer, primary_key=True)  # id исходного уведомления
+    event_id = Column(Integer, nullable=False, index=True)
+    registration_id = Column(Integer, nullable=False)
+    notification_type = Column(String(50), nullable=False)
+    template_id = Column(Integer, nullable=True)
+    scheduled_time = Column(DateTime, nullable=False)
+    sent = Column(Boolean, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,69 @@
+"""Пул соединений с учётом времени ожидания свободного соединения"""
+import logging
+import threading
+import time
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """Счётчики ожидания соединений одного пула"""
+
+    def __init__(self, name: str, slow_checkout_ms: int = 0):
+        self.name = name
+        self.slow_checkout_ms = slow_checkout_ms
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += waited
+            if waited > self.wait_max:
+                self.wait_max = waited
+        if self.slow_checkout_ms and waited * 1000 >= self.slow_checkout_ms:
+            logger.warning(
+                f"Пул '{self.name}': ожидание соединения {waited * 1000:.0f} мс"
+                f"{' (таймаут)' if timed_out else ''}"
+            )
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_total,
+                "wait_seconds_max": self.wait_max,
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, который замеряет время получения соединения из пула"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Заменяется общим PoolStats после создания engine
+        self.stats = PoolStats("default")
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return conn
@@ -7,6 +7,9 @@ if [ -d "venv" ]; then
     source venv/bin/activate
 fi
 
+# Миграции схемы БД - до старта процессов (API сам их не применяет)
+python -m tools.migrate || exit 1
+
 # Запуск бота в фоне
 python -m bot.main &
 BOT_PID=$!
@@ -0,0 +1,110 @@
+"""
+Доступность пользователей для сообщений бота.
+
+Если Telegram отвечает, что бот заблокирован, чат не найден или аккаунт удалён, статус
+записывается в User.delivery_status, и следующие напоминания и рассылки этому пользователю
+отбрасываются ещё в SQL - без обречённых запросов к Bot API, которые тратят лимит.
+
+Перепроверка бесплатна: раз в DELIVERY_REPROBE_HOURS пользователь снова попадает в выборку,
+и очередное настоящее сообщение служит пробой. Удачная отправка или любой апдейт от
+пользователя (AuthMiddleware) снимает статус. Удалённые аккаунты не перепроверяются.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+from sqlalchemy import and_, case, func, or_, update
+from sqlalchemy.orm import Session
+from config import settings
+from database.models import User
+from utils.timezone import get_utc_now
+
+logger = logging.getLogger(__name__)
+
+BLOCKED = "blocked"
+CHAT_NOT_FOUND = "chat_not_found"
+DEACTIVATED = "deactivated"
+
+STATUS_TITLES = {
+    BLOCKED: "заблокировали бота",
+    CHAT_NOT_FOUND: "чат не найден",
+    DEACTIVATED: "аккаунт удалён",
+}
+
+# Параметров в одном IN - с запасом под лимит SQLite
+_CHUNK = 500
+
+
+def classify_error(error: Exception) -> Optional[str]:
+    """Статус недоступности по ошибке Bot API; None - ошибка не про получателя"""
+    # aiogram не нужен API-процессу при старте (tools/check_startup.py)
+    from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+    message = str(error).lower()
+    if isinstance(error, TelegramForbiddenError):
+        return DEACTIVATED if "deactivated" in message else BLOCKED
+    if isinstance(error, TelegramBadRequest) and "chat not found" in message:
+        return CHAT_NOT_FOUND
+    return None
+
+
+def undeliverable(now: Optional[datetime] = None):
+    """SQL-условие по User: отправлять не нужно (недоступен и время перепроверки не пришло)"""
+    cutoff = (now or get_utc_now()) - timedelta(hours=settings.DELIVERY_REPROBE_HOURS)
+    return and_(
+        User.delivery_status.isnot(None),
+        or_(User.delivery_status == DEACTIVATED, User.delivery_checked_at > cutoff),
+    )
+
+
+def record_failure(db: Session, telegram_id: int, error: Exception) -> Optional[str]:
+    """Отметить пользователя недоступным, если ошибка это подтверждает (с commit)"""
+    status = classify_error(error)
+    if status is None:
+        return None
+    now = get_utc_now()
+    db.execute(
+        update(User)
+        .where(User.telegram_id == telegram_id)
+        .values(
+            delivery_status=status,
+            delivery_failed_at=case((User.delivery_status.is_(None), now), else_=User.delivery_failed_at),
+            delivery_checked_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    logger.info(f"User {telegram_id} marked undeliverable: {status}")
+    return status
+
+
+def record_success(db: Session, telegram_ids: Iterable[int]):
+    """Снять статус с пользователей, которым сообщение дошло (один UPDATE на пачку, с commit)"""
+    telegram_ids = list(dict.fromkeys(telegram_ids))
+    if not telegram_ids:
+        return
+    for start in range(0, len(telegram_ids), _CHUNK):
+        db.execute(
+            update(User)
+            .where(User.telegram_id.in_(telegram_ids[start:start + _CHUNK]), User.delivery_status.isnot(None))
+            .values(delivery_status=None, delivery_failed_at=None, delivery_checked_at=None)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+
+
+def clear_status(user: User):
+    """Пользователь сам написал боту - значит, доступен (commit - на стороне вызывающего)"""
+    if user.delivery_status is not None:
+        user.delivery_status = None
+        user.delivery_failed_at = None
+        user.delivery_checked_at = None
+
+
+def status_counts(db: Session) -> Dict[str, int]:
+    """Число недоступных пользователей по статусам (по частичному индексу)"""
+    return dict(
+        db.query(User.delivery_status, func.count(User.id))
+        .filter(User.delivery_status.isnot(None))
+        .group_by(User.delivery_status)
+        .all()
+    )
@@ -0,0 +1,85 @@
+"""
+Жизненный цикл событий: автоматический перевод прошедших событий в ARCHIVED.
+
+Прошедшие события архивируются одним UPDATE, их неотправленные уведомления
+отменяются (удаляются), а подписчики `on_events_archived` получают список id,
+чтобы сбросить закэшированные данные по этим событиям.
+"""
+import logging
+from datetime import timedelta
+from typing import Callable, List
+from sqlalchemy import select, update, delete
+from sqlalchemy.orm import Session
+from database.database import BackgroundSessionLocal
+from database.models import Event, EventStatus, ReminderJob
+from config import settings
+from utils.timezone import get_utc_now
+
+logger = logging.getLogger(__name__)
+
+LIVE_STATUSES = (EventStatus.APPROVED, EventStatus.ACTIVE)
+
+_archive_listeners: List[Callable[[List[int]], None]] = []
+
+
+def on_events_archived(listener: Callable[[List[int]], None]):
+    """Подписаться на архивирование событий (можно использовать как декоратор)"""
+    _archive_listeners.append(listener)
+    return listener
+
+
+def notify_events_archived(event_ids: List[int]):
+    """Сообщить подписчикам, что события ушли в архив"""
+    for listener in _archive_listeners:
+        try:
+            listener(event_ids)
+        except Exception as e:
+            logger.error(f"Archive listener {listener!r} failed: {e}", exc_info=True)
+
+
+def cancel_pending_notifications(db: Session, event_ids: List[int]) -> int:
+    """Отменить неразосланные напоминания событий (commit - на стороне вызывающего)"""
+    if not event_ids:
+        return 0
+    return db.execute(
+        delete(ReminderJob)
+        .where(ReminderJob.event_id.in_(event_ids), ReminderJob.sent == False)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def archive_past_events(db: Session, grace_hours: int) -> List[int]:
+    """Перевести в ARCHIVED все события, прошедшие более grace_hours часов назад"""
+    cutoff = get_utc_now() - timedelta(hours=grace_hours)
+    past = (Event.status.in_(LIVE_STATUSES), Event.date_time < cutoff)
+
+    # Выборка идёт по индексу (status, date_time) и затрагивает только прошедшие события
+    event_ids = db.execute(select(Event.id).where(*past)).scalars().all()
+    if not event_ids:
+        return []
+
+    db.execute(
+        update(Event)
+        .where(Event.id.in_(event_ids), *past)
+        .values(status=EventStatus.ARCHIVED, updated_at=get_utc_now())
+        .execution_options(synchronize_session=False)
+    )
+    cancelled = cancel_pending_notifications(db, event_ids)
+    db.commit()
+
+    logger.info(f"Archived {len(event_ids)} past events, cancelled {cancelled} pending notifications")
+    notify_events_archived(event_ids)
+    return event_ids
+
+
+def run_event_lifecycle() -> List[int]:
+    """Один проход архивирования прошедших событий (вызывается планировщиком)"""
+    db = BackgroundSessionLocal()
+    try:
+        return archive_past_events(db, settings.EVENT_AUTO_ARCHIVE_AFTER_HOURS)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error archiving past events: {e}", exc_info=True)
+        return []
+    finally:
+        db.close()
@@ -0,0 +1,194 @@
+"""
+Выбор лидера среди реплик бота.
+
+Фоновые задачи планировщика (разворачивание напоминаний, воркер outbox, архивирование,
+retention) выполняет одна реплика - лидер. Остальные раз в SCHEDULER_LEASE_RENEW_SECONDS
+проверяют, не освободилось ли место.
+
+- Аренда - строка scheduler_leases: держатель, heartbeat (renewed_at) и срок (expires_at).
+  Лидер продлевает её на SCHEDULER_LEASE_SECONDS при каждой проверке; чужую аренду можно
+  забрать только после срока. Условие «моя или истекла» проверяется в самом UPDATE,
+  поэтому две реплики не получат одну аренду.
+- Лидер считает себя лидером не дольше срока с момента последнего удачного продления:
+  если БД недоступна или аренду забрали, задачи останавливаются не позже, чем истекает
+  аренда, а другая реплика может занять её только после этого (часы реплик должны быть
+  синхронизированы).
+- В PostgreSQL лидер дополнительно держит session-level advisory lock на отдельном
+  соединении: без него аренду не продлить. Лидер, потерявший соединение, не продлит
+  аренду, а новый держатель блокировки всё равно ждёт её срока. После падения лидера
+  резерв занимает место через SCHEDULER_LEASE_SECONDS; при штатной остановке аренда
+  отдаётся сразу (`release`).
+
+Сводки организаторам не участвуют: их буфер живёт в памяти каждой реплики.
+"""
+import hashlib
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+from typing import Optional
+from sqlalchemy import case, create_engine, or_, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.pool import NullPool
+from config import settings
+from database.database import BackgroundSessionLocal
+from database.models import SchedulerLease
+from utils import metrics
+from utils.timezone import get_utc_now
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_LEASE = "scheduler"
+
+
+def _advisory_key(name: str) -> int:
+    """Ключ pg_try_advisory_lock (bigint) по имени аренды"""
+    return int.from_bytes(hashlib.sha1(f"mclassbot:{name}".encode()).digest()[:8], "big", signed=True)
+
+
+class LeaderElection:
+    def __init__(self, name: str, instance_id: Optional[str] = None):
+        self.name = name
+        self.instance_id = instance_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._started = False
+        self._leader = False
+        self._valid_until = 0.0
+        self._lock_engine = None
+        self._lock_conn: Optional[Connection] = None
+
+    def is_leader(self) -> bool:
+        """Выполнять ли фоновые задачи. Без запущенных выборов (один процесс, бенчмарки) - да"""
+        if not self._started:
+            return True
+        return self._leader and time.monotonic() < self._valid_until
+
+    def start(self) -> bool:
+        """Включить выборы и сразу попробовать стать лидером"""
+        self._started = True
+        return self.renew()
+
+    def renew(self) -> bool:
+        """Продлить аренду или попробовать её занять; синхронно (пул потоков планировщика)"""
+        started = time.monotonic()
+        try:
+            leader = self._hold_advisory_lock() and self._hold_lease()
+        except Exception as e:
+            logger.warning(f"Leader lease '{self.name}' check failed: {e}")
+            leader = False
+        if leader:
+            self._valid_until = started + settings.SCHEDULER_LEASE_SECONDS
+        else:
+            # Блокировка без аренды (ждём срока старой) не держим: её может взять другая реплика
+            self._release_advisory_lock()
+        if leader != self._leader:
+            logger.info(f"{self.instance_id} {'became' if leader else 'is no longer'} leader of '{self.name}'")
+        self._leader = leader
+        metrics.SCHEDULER_LEADER.set(1 if leader else 0)
+        return leader
+
+    def release(self):
+        """Отдать аренду при остановке, чтобы резерв не ждал её срока"""
+        if not self._started:
+            return
+        was_leader, self._leader, self._started = self._leader, False, False
+        metrics.SCHEDULER_LEADER.set(0)
+        if was_leader:
+            db = BackgroundSessionLocal()
+            try:
+                now = get_utc_now()
+                db.execute(
+                    update(SchedulerLease)
+                    .where(SchedulerLease.name == self.name, SchedulerLease.holder == self.instance_id)
+                    .values(expires_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+            except Exception as e:
+                logger.warning(f"Cannot release leader lease '{self.name}': {e}")
+            finally:
+                db.close()
+        self._release_advisory_lock()
+
+    def _hold_lease(self) -> bool:
+        """Продлить свою или занять истёкшую аренду (с commit)"""
+        now = get_utc_now()
+        values = {
+            "holder": self.instance_id,
+            "renewed_at": now,
+            "expires_at": now + timedelta(seconds=settings.SCHEDULER_LEASE_SECONDS),
+        }
+        db = BackgroundSessionLocal()
+        try:
+            updated = db.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.name,
+                    or_(SchedulerLease.holder == self.instance_id, SchedulerLease.expires_at < now),
+                )
+                .values(
+                    acquired_at=case(
+                        (SchedulerLease.holder == self.instance_id, SchedulerLease.acquired_at), else_=now
+                    ),
+                    **values
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not updated:
+                # Первая реплика: строки ещё нет. Одновременная вставка второй отбрасывается
+                if db.get_bind().dialect.name == "postgresql":
+                    from sqlalchemy.dialects.postgresql import insert
+                else:
+                    from sqlalchemy.dialects.sqlite import insert
+                updated = db.execute(
+                    insert(SchedulerLease.__table__)
+                    .values(name=self.name, acquired_at=now, **values)
+                    .on_conflict_do_nothing(index_elements=["name"])
+                ).rowcount
+            db.commit()
+            return bool(updated)
+        finally:
+            db.close()
+
+    def _hold_advisory_lock(self) -> bool:
+        """Держать advisory lock на отдельном соединении (только PostgreSQL)"""
+        if not settings.DATABASE_URL.startswith("postgresql"):
+            return True
+        if self._lock_conn is not None:
+            try:
+                # Блокировка живёт, пока живо соединение
+                self._lock_conn.execute(text("SELECT 1"))
+                self._lock_conn.commit()
+                return True
+            except Exception:
+                self._release_advisory_lock()
+        if self._lock_engine is None:
+            # Отдельное соединение вне пулов: оно занято всё время жизни процесса
+            self._lock_engine = create_engine(settings.DATABASE_URL, poolclass=NullPool)
+        conn = self._lock_engine.connect()
+        try:
+            locked = conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": _advisory_key(self.name)}
+            ).scalar()
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        if not locked:
+            conn.close()
+            return False
+        self._lock_conn = conn
+        return True
+
+    def _release_advisory_lock(self):
+        if self._lock_conn is None:
+            return
+        conn, self._lock_conn = self._lock_conn, None
+        try:
+            # Закрытие сессии снимает её advisory lock'и
+            conn.close()
+        except Exception as e:
+            logger.debug(f"Closing advisory lock connection failed: {e}")
+
+
+leader_election = LeaderElection(SCHEDULER_LEASE)
@@ -0,0 +1,94 @@
+"""
+Шаблоны текстов уведомлений (NotificationTemplate.message_template).
+
+Текст разбирается один раз в последовательность кусков и кэшируется по (id, updated_at).
+Подстановки:
+    {event_title}, {event_date}, {event_description} - поля события;
+    {<поле анкеты>}, например {Имя} - значение из Registration.data_json.
+Фигурные скобки в тексте экранируются удвоением: {{ и }}.
+
+Рассылка идёт в два шага: bind(event) один раз склеивает литералы с полями события,
+а render(data) для каждого получателя подставляет только значения анкеты.
+"""
+import logging
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+from utils.timezone import format_event_datetime
+
+logger = logging.getLogger(__name__)
+
+EVENT_PLACEHOLDERS = {
+    "event_title": lambda event: event.title or "",
+    "event_date": lambda event: format_event_datetime(event.date_time) if event.date_time else "",
+    "event_description": lambda event: event.description or "",
+}
+
+# Шаблонов единицы - кэш без вытеснения, старая версия заменяется новой по id
+_cache: Dict[int, Tuple[object, "CompiledTemplate"]] = {}
+
+
+class BoundTemplate:
+    """Шаблон с подставленными полями события: чётные куски - готовый текст, нечётные - поля анкеты"""
+    __slots__ = ("parts", "static")
+
+    def __init__(self, parts: List[str]):
+        self.parts = parts
+        self.static = parts[0] if len(parts) == 1 else None
+
+    def render(self, data: Optional[dict] = None) -> str:
+        if self.static is not None:
+            return self.static
+        data = data or {}
+        parts = self.parts
+        out = [parts[0]]
+        for i in range(1, len(parts), 2):
+            value = data.get(parts[i])
+            out.append("" if value is None else str(value))
+            out.append(parts[i + 1])
+        return "".join(out)
+
+
+class CompiledTemplate:
+    """Разобранный текст: список (литерал, имя поля или None)"""
+    __slots__ = ("pieces",)
+
+    def __init__(self, text: str):
+        try:
+            self.pieces = [(literal, field) for literal, field, _, _ in Formatter().parse(text)]
+        except ValueError as e:
+            # Непарная скобка - шлём текст как есть, а не падаем на каждой отправке
+            logger.warning(f"Шаблон не разобран ({e}), будет отправлен без подстановок")
+            self.pieces = [(text, None)]
+
+    def bind(self, event) -> BoundTemplate:
+        """Подставить поля события; поля анкеты остаются для render()"""
+        parts, current = [], []
+        for literal, field in self.pieces:
+            current.append(literal)
+            if field is None:
+                continue
+            resolver = EVENT_PLACEHOLDERS.get(field)
+            if resolver is not None:
+                current.append(resolver(event))
+            else:
+                parts.append("".join(current))
+                parts.append(field)
+                current = []
+        parts.append("".join(current))
+        return BoundTemplate(parts)
+
+
+def compile_template(template) -> CompiledTemplate:
+    """Скомпилированный NotificationTemplate из кэша; перекомпилируется после изменения шаблона"""
+    version = template.updated_at or template.created_at
+    cached = _cache.get(template.id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    compiled = CompiledTemplate(template.message_template)
+    _cache[template.id] = (version, compiled)
+    return compiled
+
+
+def compile_text(text: str) -> CompiledTemplate:
+    """Разовый текст (ручная рассылка) - без кэша"""
+    return CompiledTemplate(text)
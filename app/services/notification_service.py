@@ -1,193 +1,218 @@
-from sqlalchemy.orm import Session
-from database.models import (
-    Event, Registration, ScheduledNotification, NotificationTemplate,
-    EventNotification, User
-)
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+from config import settings
+from database.database import BackgroundSessionLocal
+from database.models import Event, ReminderJob, NotificationTemplate, EventNotification
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
 from utils.timezone import get_local_now, get_utc_now, local_to_utc, utc_to_local
+from utils import metrics
 import zoneinfo
 
 logger = logging.getLogger(__name__)
 
 
-def create_scheduled_notifications_for_event(db: Session, event: Event):
-    """Создать запланированные уведомления для всех регистраций на событие"""
-    # Если у события нет даты/времени, уведомления создавать нельзя
-    if not event.date_time:
-        logger.warning(f"Event {event.id} has no date_time, skipping notification scheduling")
-        return
-
-    # Приводим время события к UTC-aware, затем к локальному времени
+def reminder_times(db: Session, event: Event) -> Dict[datetime, Tuple[str, Optional[int]]]:
+    """Время отправки (UTC) -> (тип, шаблон) по включённым настройкам уведомлений события"""
+    # В БД храним UTC без tzinfo; приводим время события к локальному
     event_dt = event.date_time
     if event_dt.tzinfo is None:
-        # В БД храним UTC без tzinfo
         event_dt_utc = event_dt.replace(tzinfo=zoneinfo.ZoneInfo("UTC"))
     else:
         event_dt_utc = event_dt.astimezone(zoneinfo.ZoneInfo("UTC"))
-
     event_dt_local = utc_to_local(event_dt_utc)
 
-    # Получаем настройки уведомлений для события
     event_notifications = db.query(EventNotification).filter(
         EventNotification.event_id == event.id,
         EventNotification.enabled == True
     ).all()
-    
-    if not event_notifications:
-        logger.info(f"No enabled notifications found for event {event.id}")
-        return
-    
-    # Получаем все регистрации на событие
-    registrations = db.query(Registration).filter(Registration.event_id == event.id).all()
-    
-    logger.info(
-        f"[create_scheduled_notifications_for_event] event_id={event.id}, "
-        f"event_dt_local={event_dt_local}, "
-        f"notifications={len(event_notifications)}, registrations={len(registrations)}"
-    )
-    
-    for registration in registrations:
-        for event_notif in event_notifications:
-            notification_time_local = None
-
-            # Определяем локальное время уведомления
-            if event_notif.custom_time is not None:
-                # Кастомное время в минутах относительно времени события (локального)
-                notification_time_local = event_dt_local - timedelta(minutes=event_notif.custom_time)
-            elif event_notif.template_id:
-                template = db.query(NotificationTemplate).filter(
-                    NotificationTemplate.id == event_notif.template_id
-                ).first()
-                if template:
-                    if template.absolute_datetime:
-                        # absolute_datetime хранится в UTC (naive), приводим к локальному времени
-                        abs_dt = template.absolute_datetime
-                        if abs_dt.tzinfo is None:
-                            abs_dt_utc = abs_dt.replace(tzinfo=zoneinfo.ZoneInfo("UTC"))
-                        else:
-                            abs_dt_utc = abs_dt.astimezone(zoneinfo.ZoneInfo("UTC"))
-                        notification_time_local = utc_to_local(abs_dt_utc)
-                    elif template.time_before_event:
-                        # Время до события в минутах (от локального времени события)
-                        notification_time_local = event_dt_local - timedelta(minutes=template.time_before_event)
-                else:
-                    logger.warning(
-                        f"[create_scheduled_notifications_for_event] template id {event_notif.template_id} "
-                        f"not found for event {event.id}"
-                    )
-                    continue
-            else:
-                continue
-
-            if not notification_time_local:
+    template_ids = {n.template_id for n in event_notifications if n.custom_time is None and n.template_id}
+    templates = {
+        t.id: t for t in db.query(NotificationTemplate).filter(NotificationTemplate.id.in_(template_ids))
+    } if template_ids else {}
+
+    times = {}
+    for event_notif in event_notifications:
+        notification_time_local = None
+
+        # Определяем локальное время уведомления
+        if event_notif.custom_time is not None:
+            # Кастомное время в минутах относительно времени события (локального)
+            notification_time_local = event_dt_local - timedelta(minutes=event_notif.custom_time)
+        elif event_notif.template_id:
+            template = templates.get(event_notif.template_id)
+            if template is None:
                 logger.warning(
-                    f"[create_scheduled_notifications_for_event] got empty notification_time_local "
-                    f"for event_id={event.id}, registration_id={registration.id}, notif_id={event_notif.id}"
+                    f"[reminder_times] template id {event_notif.template_id} not found for event {event.id}"
                 )
                 continue
+            if template.absolute_datetime:
+                # absolute_datetime хранится в UTC (naive), приводим к локальному времени
+                abs_dt = template.absolute_datetime
+                if abs_dt.tzinfo is None:
+                    abs_dt_utc = abs_dt.replace(tzinfo=zoneinfo.ZoneInfo("UTC"))
+                else:
+                    abs_dt_utc = abs_dt.astimezone(zoneinfo.ZoneInfo("UTC"))
+                notification_time_local = utc_to_local(abs_dt_utc)
+            elif template.time_before_event:
+                # Время до события в минутах (от локального времени события)
+                notification_time_local = event_dt_local - timedelta(minutes=template.time_before_event)
+
+        if not notification_time_local:
+            logger.warning(
+                f"[reminder_times] got empty notification_time_local "
+                f"for event_id={event.id}, notif_id={event_notif.id}"
+            )
+            continue
 
-            # Переводим локальное время уведомления в UTC для хранения
-            notification_time_utc = local_to_utc(notification_time_local)
-
-            # Проверяем, не создано ли уже такое уведомление
-            existing = db.query(ScheduledNotification).filter(
-                ScheduledNotification.event_id == event.id,
-                ScheduledNotification.registration_id == registration.id,
-                ScheduledNotification.scheduled_time == notification_time_utc
-            ).first()
-            
-            if existing:
-                logger.info(
-                    f"[create_scheduled_notifications_for_event] notification already exists "
-                    f"for event_id={event.id}, registration_id={registration.id}, "
-                    f"time_utc={notification_time_utc}"
-                )
-                continue
+        # Переводим локальное время уведомления в UTC для хранения; на одно время - одно напоминание
+        times.setdefault(
+            local_to_utc(notification_time_local),
+            ('template' if event_notif.template_id else 'custom', event_notif.template_id)
+        )
+    return times
 
-            if not existing:
-                # Создаем уведомление, если время еще не прошло (или прошло не более чем на 1 час - для тестирования)
-                local_now = get_local_now()
-                time_diff = (notification_time_local - local_now).total_seconds() / 60  # в минутах
-                if time_diff > -60:  # Если уведомление не более чем на час в прошлом
-                    scheduled = ScheduledNotification(
-                        event_id=event.id,
-                        registration_id=registration.id,
-                        notification_type='template' if event_notif.template_id else 'custom',
-                        scheduled_time=notification_time_utc
-                    )
-                    db.add(scheduled)
-                    logger.info(
-                        f"Created scheduled notification for registration {registration.id}, "
-                        f"event {event.id}, local_time: {notification_time_local}, "
-                        f"time_diff: {time_diff:.1f} min"
-                    )
-                else:
-                    logger.warning(
-                        f"[create_scheduled_notifications_for_event] Skipping notification for "
-                        f"registration {registration.id} - time {notification_time_local} "
-                        f"is too far in the past ({time_diff:.1f} min)"
-                    )
-    
-    db.commit()
 
+def sync_event_reminders(db: Session, event: Event) -> int:
+    """Привести напоминания события (ReminderJob) к его настройкам уведомлений.
 
-def send_notification(db: Session, scheduled_notification: ScheduledNotification, bot) -> bool:
-    """Отправить уведомление пользователю"""
-    try:
-        registration = db.query(Registration).filter(
-            Registration.id == scheduled_notification.registration_id
-        ).first()
-        
-        if not registration:
-            return False
-        
-        event = db.query(Event).filter(Event.id == scheduled_notification.event_id).first()
-        if not event:
-            return False
-        
-        # Формируем сообщение
-        from utils.timezone import format_event_datetime
-        
-        message_text = f"🔔 Напоминание о событии!\n\n"
-        message_text += f"📅 {event.title}\n"
-        message_text += f"📆 Дата: {format_event_datetime(event.date_time)}\n"
-        
-        if event.description:
-            message_text += f"\n{event.description}\n"
-        
-        # Отправляем сообщение
-        import asyncio
-        asyncio.create_task(
-            bot.send_message(
-                chat_id=registration.user_telegram_id,
-                text=message_text
+    Получатели не хранятся - напоминание разворачивается по регистрациям в момент отправки,
+    поэтому регистрация и отмена регистрации ничего не пишут. Неразосланные напоминания,
+    которых больше нет в настройках (сменилось время события или уведомления), удаляются.
+    Возвращает число изменённых строк; commit - только если они есть.
+    """
+    # Если у события нет даты/времени, уведомления создавать нельзя
+    if not event.date_time:
+        logger.warning(f"Event {event.id} has no date_time, skipping notification scheduling")
+        return 0
+
+    times = reminder_times(db, event)
+    jobs = {job.scheduled_time: job for job in db.query(ReminderJob).filter(ReminderJob.event_id == event.id)}
+
+    changed = 0
+    for scheduled_time, job in jobs.items():
+        if job.sent:
+            continue
+        if scheduled_time not in times:
+            db.delete(job)
+            changed += 1
+        elif (job.notification_type, job.template_id) != times[scheduled_time]:
+            job.notification_type, job.template_id = times[scheduled_time]
+            changed += 1
+
+    now_utc = get_utc_now()
+    for scheduled_time, (notification_type, template_id) in times.items():
+        if scheduled_time in jobs:
+            continue
+        # Создаём, если время ещё не прошло или прошло не более чем на час
+        if scheduled_time < now_utc - timedelta(hours=1):
+            logger.debug(
+                "[sync_event_reminders] skipping reminder for event %s at %s: too far in the past",
+                event.id, scheduled_time
             )
-        )
-        
-        # Отмечаем как отправленное
-        scheduled_notification.sent = True
-        scheduled_notification.sent_at = get_utc_now()
+            continue
+        db.add(ReminderJob(
+            event_id=event.id,
+            notification_type=notification_type,
+            template_id=template_id,
+            scheduled_time=scheduled_time,
+        ))
+        changed += 1
+
+    if changed:
         db.commit()
-        
-        return True
-    except Exception as e:
-        logger.error(f"Ошибка отправки уведомления: {e}")
-        return False
+        logger.info(f"[sync_event_reminders] event_id={event.id}: {changed} reminders changed")
+    return changed
 
 
-def get_pending_notifications(db: Session) -> List[ScheduledNotification]:
-    """Получить список уведомлений, которые нужно отправить"""
+# Почему напоминание не отправлено (ReminderJob.dropped_reason)
+EVENT_STARTED = "event_started"
+STALE = "stale"
+SUPERSEDED = "superseded"
+
+DROP_REASON_TITLES = {
+    EVENT_STARTED: "событие уже началось",
+    STALE: "опоздало",
+    SUPERSEDED: "заменено более поздним",
+}
+
+
+def get_due_reminders(db: Session, limit: Optional[int] = None) -> List[ReminderJob]:
+    """Наступившие напоминания по порядку scheduled_time, не больше `limit` за раз (с событием)"""
     now_utc = get_utc_now()
-    notifications = db.query(ScheduledNotification).filter(
-        ScheduledNotification.sent == False,
-        ScheduledNotification.scheduled_time <= now_utc
-    ).all()
+    query = db.query(ReminderJob).options(joinedload(ReminderJob.event)).filter(
+        ReminderJob.sent == False,
+        ReminderJob.scheduled_time <= now_utc
+    ).order_by(ReminderJob.scheduled_time, ReminderJob.id)
+    if limit:
+        query = query.limit(limit)
+    jobs = query.all()
     
-    local_now = get_local_now()
-    logger.info(f"Found {len(notifications)} pending notifications at {local_now} (local) / {now_utc} (UTC)")
-    return notifications
+    # Каждые 30 секунд: пустой проход пишем только на DEBUG
+    if jobs:
+        logger.info(f"Found {len(jobs)} due reminders at {get_local_now()} (local) / {now_utc} (UTC)")
+    else:
+        logger.debug("No due reminders at %s (UTC)", now_utc)
+    return jobs
+
+
+def latest_due_times(db: Session, event_ids, now: datetime) -> Dict[int, datetime]:
+    """Событие -> самое позднее наступившее неразосланное напоминание"""
+    if not event_ids:
+        return {}
+    return dict(
+        db.query(ReminderJob.event_id, func.max(ReminderJob.scheduled_time)).filter(
+            ReminderJob.sent == False,
+            ReminderJob.scheduled_time <= now,
+            ReminderJob.event_id.in_(set(event_ids))
+        ).group_by(ReminderJob.event_id).all()
+    )
+
+
+def drop_reason(job: ReminderJob, latest_due: Optional[datetime], now: datetime) -> Optional[str]:
+    """Почему наступившее напоминание отправлять уже не нужно; None - отправлять.
+
+    После простоя за событие может накопиться несколько напоминаний - уходит только
+    последнее из наступивших. Напоминание о начавшемся событии и опоздавшее больше чем
+    на REMINDER_STALE_AFTER_MINUTES не отправляются.
+    """
+    event = job.event
+    if event is not None and event.date_time and event.date_time <= now:
+        return EVENT_STARTED
+    if latest_due is not None and job.scheduled_time < latest_due:
+        return SUPERSEDED
+    stale_after = settings.REMINDER_STALE_AFTER_MINUTES
+    if stale_after > 0 and job.scheduled_time < now - timedelta(minutes=stale_after):
+        return STALE
+    return None
+
+
+def drop_reminder(job: ReminderJob, reason: str, now: datetime):
+    """Закрыть напоминание без отправки (commit - на стороне вызывающего)"""
+    job.sent = True
+    job.sent_at = now
+    job.recipients_count = 0
+    job.skipped_count = 0
+    job.dropped_reason = reason
+
+
+def refresh_queue_metrics():
+    """Глубина очереди и отставание планировщика для /metrics"""
+    now_utc = get_utc_now()
+    db = BackgroundSessionLocal()
+    try:
+        # Оба агрегата покрываются частичным индексом по неразосланным напоминаниям
+        pending, oldest = db.query(
+            func.count(ReminderJob.id), func.min(ReminderJob.scheduled_time)
+        ).filter(
+            ReminderJob.sent == False,
+            ReminderJob.scheduled_time <= now_utc
+        ).one()
+    finally:
+        db.close()
+    metrics.NOTIFICATIONS_PENDING.set(pending)
+    metrics.SCHEDULER_LAG.set((now_utc - oldest).total_seconds() if oldest else 0)
 
 
 def create_notification_template(
@@ -0,0 +1,131 @@
+"""
+Сводки организаторам об ответах участников (подтвердил / отказался / просит связаться).
+
+Ответы не уходят по одному: они копятся в буфере по (событие, организатор) и отправляются
+одним сообщением раз в ORGANIZER_DIGEST_INTERVAL_SECONDS (задача планировщика) или сразу,
+как только по ключу набралось ORGANIZER_DIGEST_MAX_EVENTS ответов. Срочный ответ
+(«Свяжитесь со мной») отправляет буфер своего ключа немедленно, вместе с накопленным.
+
+Буфер живёт в памяти процесса бота: при штатной остановке он отправляется (bot/main.py),
+при падении неотправленные сводки теряются - сами ответы уже сохранены в БД
+(Registration.confirmed). Сводка, не ушедшая из-за временной ошибки, остаётся в буфере.
+"""
+import logging
+from typing import Dict, Iterable, List, Tuple
+from config import settings
+from database.database import BackgroundSessionLocal
+from bot.utils.outbound import Priority, outbound_priority
+from services import delivery_health
+from services.outbox import is_permanent_error
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Лимит Telegram - 4096 символов, оставляем запас под строку «и ещё N»
+MAX_DIGEST_LENGTH = 4000
+
+
+class _Pending:
+    """Накопленные ответы для одного организатора по одному событию"""
+    __slots__ = ("event_title", "items")
+
+    def __init__(self, event_title: str):
+        self.event_title = event_title
+        self.items: List[Tuple[str, str]] = []  # (строка сводки, полный текст одиночного сообщения)
+
+
+def render_digest(pending: _Pending) -> str:
+    """Одиночный ответ уходит своим обычным текстом, несколько - списком"""
+    if len(pending.items) == 1:
+        return pending.items[0][1]
+    text = f"📢 Ответы участников: {len(pending.items)}\n\nСобытие: {pending.event_title}\n"
+    for shown, (line, _) in enumerate(pending.items):
+        if len(text) + len(line) + 1 > MAX_DIGEST_LENGTH:
+            text += f"\n… и ещё {len(pending.items) - shown}"
+            break
+        text += f"\n{line}"
+    return text
+
+
+class OrganizerDigest:
+    def __init__(self):
+        self._buffer: Dict[Tuple[int, int], _Pending] = {}
+        self._pending_count = 0
+
+    async def submit(self, bot, event, chat_ids: Iterable[int], line: str, text: str,
+                     kind: str, urgent: bool = False) -> int:
+        """Добавить ответ в сводки организаторов `chat_ids`.
+
+        Возвращает число сообщений, отправленных сразу (срочный ответ, заполненный буфер
+        или буферизация выключена).
+        """
+        immediate = urgent or settings.ORGANIZER_DIGEST_INTERVAL_SECONDS <= 0
+        ready = []
+        for chat_id in chat_ids:
+            key = (event.id, chat_id)
+            pending = self._buffer.get(key)
+            if pending is None:
+                pending = self._buffer[key] = _Pending(event.title)
+            pending.items.append((line, text))
+            self._pending_count += 1
+            metrics.ORGANIZER_DIGEST_EVENTS.labels(kind).inc()
+            if immediate or len(pending.items) >= settings.ORGANIZER_DIGEST_MAX_EVENTS:
+                ready.append(key)
+        metrics.ORGANIZER_DIGEST_PENDING.set(self._pending_count)
+
+        # Срочный запрос - ответ на действие пользователя, сводка - самый низкий класс очереди
+        priority = Priority.INTERACTIVE if urgent else Priority.DIGEST
+        sent = 0
+        for key in ready:
+            sent += await self._send(bot, key, priority)
+        return sent
+
+    async def flush(self, bot) -> int:
+        """Отправить все накопленные сводки"""
+        sent = 0
+        for key in list(self._buffer):
+            sent += await self._send(bot, key, Priority.DIGEST)
+        if sent:
+            logger.info(f"Organizer digests sent: {sent}")
+        return sent
+
+    def _requeue(self, key: Tuple[int, int], pending: _Pending):
+        """Вернуть неотправленную сводку в буфер перед ответами, пришедшими во время отправки"""
+        newer = self._buffer.pop(key, None)
+        if newer is not None:
+            pending.items.extend(newer.items)
+        self._buffer[key] = pending
+        self._pending_count += len(pending.items) - (len(newer.items) if newer else 0)
+        metrics.ORGANIZER_DIGEST_PENDING.set(self._pending_count)
+
+    async def _send(self, bot, key: Tuple[int, int], priority: Priority) -> int:
+        # Ключ забирается из буфера до await: ответы, пришедшие во время отправки, попадут в следующую сводку
+        pending = self._buffer.pop(key, None)
+        if pending is None:
+            return 0
+        self._pending_count -= len(pending.items)
+        metrics.ORGANIZER_DIGEST_PENDING.set(self._pending_count)
+        event_id, chat_id = key
+        try:
+            with outbound_priority(priority):
+                await bot.send_message(chat_id=chat_id, text=render_digest(pending))
+        except Exception as e:
+            if not is_permanent_error(e):
+                # Сеть, 5xx, 429: сводка возвращается в буфер и уйдёт со следующей отправкой ключа
+                self._requeue(key, pending)
+                metrics.OUTBOUND_MESSAGES.labels("organizer", "retried").inc()
+                logger.warning(f"Organizer digest for event {event_id} to {chat_id} postponed: {e}")
+                return 0
+            metrics.OUTBOUND_MESSAGES.labels("organizer", "failed").inc()
+            logger.warning(f"Cannot send organizer digest for event {event_id} to {chat_id}: {e}")
+            db = BackgroundSessionLocal()
+            try:
+                delivery_health.record_failure(db, chat_id, e)
+            finally:
+                db.close()
+            return 0
+        metrics.OUTBOUND_MESSAGES.labels("organizer", "sent").inc()
+        return 1
+
+
+organizer_digest = OrganizerDigest()
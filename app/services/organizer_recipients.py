@@ -0,0 +1,121 @@
+"""
+Кому по событию уходят сообщения организаторам (ответы участников, запросы на связь).
+
+Получатели - EventNotification.notification_recipients первой включённой настройки
+уведомлений события, а если список пуст - автор события и помощники с правом
+can_send_notifications. Результат - Telegram chat id - кэшируется по событию, так что
+клики «подтверждаю / не смогу / свяжитесь со мной» не делают запросов за получателями.
+
+Кэш сбрасывается:
+- после commit сессии, в которой менялись EventNotification, UserEventPermission,
+  автор события или роль / Telegram ID пользователя (слушатель сессий SQLAlchemy),
+- при архивировании событий (on_events_archived),
+- по истечении ORGANIZER_RECIPIENTS_CACHE_SECONDS - на случай изменений из другого
+  процесса (API, ручные правки БД).
+"""
+import logging
+import time
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event as sa_event, inspect
+from sqlalchemy.orm import Session
+from config import settings
+from database.models import Event, EventNotification, User, UserEventPermission
+from services.event_lifecycle import on_events_archived
+from utils import metrics
+from utils.user_loader import get_user_loader
+
+logger = logging.getLogger(__name__)
+
+# event_id -> (момент устаревания, chat id получателей)
+_cache: Dict[int, Tuple[float, Tuple[int, ...]]] = {}
+
+# Ключ в Session.info: события, чьих получателей затронул незакоммиченный flush (None - все)
+_CHANGED_KEY = "organizer_recipients_changed"
+
+
+def notifying_assistant_ids(db: Session, event_id: int) -> List[int]:
+    """User.id помощников события с правом рассылать уведомления"""
+    return [
+        user_id for (user_id,) in db.query(UserEventPermission.user_id).filter(
+            UserEventPermission.event_id == event_id,
+            UserEventPermission.can_send_notifications == True
+        )
+    ]
+
+
+def resolve_recipient_ids(db: Session, event: Event) -> List[int]:
+    """User.id получателей без кэша: настроенный список или автор и помощники"""
+    event_notif = db.query(EventNotification).filter(
+        EventNotification.event_id == event.id,
+        EventNotification.enabled == True
+    ).first()
+
+    if event_notif and event_notif.notification_recipients:
+        recipient_ids = list(event_notif.notification_recipients)
+    else:
+        # По умолчанию - автор и помощники
+        recipient_ids = [event.created_by] if event.created_by else []
+        recipient_ids.extend(notifying_assistant_ids(db, event.id))
+    return list(dict.fromkeys(recipient_ids))
+
+
+def get_recipient_chat_ids(db: Session, event: Event) -> Tuple[int, ...]:
+    """Telegram chat id получателей из кэша (при промахе - резолв и загрузка пользователей)"""
+    now = time.monotonic()
+    cached = _cache.get(event.id)
+    if cached is not None and cached[0] > now:
+        metrics.ORGANIZER_RECIPIENTS_CACHE.labels("hit").inc()
+        return cached[1]
+    metrics.ORGANIZER_RECIPIENTS_CACHE.labels("miss").inc()
+    users = get_user_loader().load_many(db, resolve_recipient_ids(db, event))
+    chat_ids = tuple(dict.fromkeys(u.telegram_id for u in users))
+    _cache[event.id] = (now + settings.ORGANIZER_RECIPIENTS_CACHE_SECONDS, chat_ids)
+    return chat_ids
+
+
+@on_events_archived
+def invalidate(event_ids: Optional[Iterable[int]] = None):
+    """Сбросить кэш по событиям (None - целиком)"""
+    if event_ids is None:
+        _cache.clear()
+        return
+    for event_id in event_ids:
+        _cache.pop(event_id, None)
+
+
+def _changed_event_ids(session: Session):
+    """События, чьих получателей меняет текущий flush; None - затронуты все"""
+    changed = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (EventNotification, UserEventPermission)):
+            changed.add(obj.event_id)
+        elif isinstance(obj, Event):
+            if obj in session.deleted or inspect(obj).attrs.created_by.history.has_changes():
+                changed.add(obj.id)
+        elif isinstance(obj, User) and obj not in session.new:
+            state = inspect(obj)
+            if (obj in session.deleted or state.attrs.role.history.has_changes()
+                    or state.attrs.telegram_id.history.has_changes()):
+                return None
+    return changed
+
+
+@sa_event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context):
+    changed = _changed_event_ids(session)
+    if changed is None:
+        session.info[_CHANGED_KEY] = None
+    elif changed and session.info.get(_CHANGED_KEY, ()) is not None:
+        session.info.setdefault(_CHANGED_KEY, set()).update(changed)
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _apply_changes(session: Session):
+    if _CHANGED_KEY in session.info:
+        invalidate(session.info.pop(_CHANGED_KEY))
+
+
+@sa_event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session):
+    session.info.pop(_CHANGED_KEY, None)
@@ -0,0 +1,314 @@
+"""
+Transactional outbox для напоминаний и рассылок.
+
+Сообщение сначала записывается в outbox_messages - в той же транзакции, что и бизнес-
+изменение (ReminderJob.sent, ручная рассылка), - и только потом уходит в Telegram.
+Падение процесса между commit и отправкой ничего не теряет: строки остаются в таблице,
+и воркер после рестарта продолжает с того места, где остановился.
+
+Воркер (`drain`) забирает строки пачками по OUTBOX_BATCH_SIZE, помечая их своим
+claim_token, и отправляет до OUTBOX_CONCURRENCY сообщений одновременно через общую
+очередь отправки (темп и приоритеты - bot/utils/outbound.py). Итог каждого сообщения
+фиксируется отдельным commit сразу после ответа Bot API:
+
+- доставлено - sent;
+- ошибка про получателя (заблокировал бота, чат не найден, неверный запрос) - failed,
+  статус пользователя уходит в services/delivery_health.py;
+- временная ошибка (сеть, 5xx, 429) - повтор через OUTBOX_RETRY_BASE_SECONDS * 2^(попытка - 1),
+  не дольше OUTBOX_RETRY_MAX_SECONDS; после OUTBOX_MAX_ATTEMPTS попыток - failed.
+
+Уникальный idempotency_key не даёт записать одно сообщение дважды (повторный тик,
+второй процесс). Повтор доставки возможен только для сообщения, ответ на которое пришёл,
+а commit - нет (процесс упал в эту долю секунды): такая строка остаётся «в отправке» и
+через OUTBOX_CLAIM_TIMEOUT_SECONDS берётся заново. Telegram не умеет отбрасывать
+повторы сам, поэтому строго однократной доставки не бывает - окно сведено к одному
+сообщению на слот параллельности.
+"""
+import asyncio
+import logging
+import random
+from datetime import timedelta
+from typing import Iterable, List, Optional
+from uuid import uuid4
+from sqlalchemy import and_, delete, func, or_, select, text, update
+from sqlalchemy.orm import Session
+from config import settings
+from database.database import BackgroundSessionLocal
+from database.models import OutboxMessage
+from services import delivery_health
+from services.leader import leader_election
+from utils import metrics
+from utils.timezone import get_utc_now
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+# Дословно условие частичного индекса ix_outbox_messages_pending: SQLite применяет
+# частичный индекс, только если условие есть в запросе без параметров
+_UNFINISHED = text("status IN ('pending', 'sending')")
+
+_draining = False
+_drain_again = False
+_tasks = set()
+
+
+def build_message(idempotency_key: str, chat_id: int, text: str, *, source: str, priority: int,
+                  reply_markup=None) -> dict:
+    """Строка для `enqueue`; `reply_markup` - InlineKeyboardMarkup или None"""
+    if reply_markup is not None:
+        reply_markup = reply_markup.model_dump(mode="json", exclude_none=True)
+    return {
+        "idempotency_key": idempotency_key,
+        "source": source,
+        "priority": int(priority),
+        "chat_id": chat_id,
+        "message_text": text,
+        "reply_markup": reply_markup,
+    }
+
+
+def enqueue(db: Session, messages: Iterable[dict]) -> int:
+    """Записать сообщения в outbox (commit - на стороне вызывающего, вместе с бизнес-изменением).
+
+    Сообщения с уже записанным idempotency_key пропускаются.
+    """
+    now = get_utc_now()
+    rows = [
+        dict(message, status=PENDING, attempts=0, next_attempt_at=now, created_at=now)
+        for message in messages
+    ]
+    if not rows:
+        return 0
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    db.execute(
+        insert(OutboxMessage.__table__).on_conflict_do_nothing(index_elements=["idempotency_key"]),
+        rows
+    )
+    return len(rows)
+
+
+def _due(now):
+    """Строки, которые пора отправлять: ожидающие и брошенные упавшим процессом"""
+    stale = now - timedelta(seconds=settings.OUTBOX_CLAIM_TIMEOUT_SECONDS)
+    return and_(
+        _UNFINISHED,
+        or_(
+            and_(OutboxMessage.status == PENDING, OutboxMessage.next_attempt_at <= now),
+            and_(OutboxMessage.status == SENDING, OutboxMessage.claimed_at < stale),
+        ),
+    )
+
+
+def claim_batch(db: Session, limit: int) -> list:
+    """Забрать пачку строк для отправки (с commit); порядок - приоритет, затем очередь записи"""
+    now = get_utc_now()
+    token = uuid4().hex
+    due_ids = (
+        select(OutboxMessage.id)
+        .where(_due(now))
+        .order_by(OutboxMessage.priority, OutboxMessage.id)
+        .limit(limit)
+    )
+    # Условие повторяется во внешнем UPDATE: строку, которую успел забрать другой процесс,
+    # PostgreSQL перепроверит после снятия блокировки и пропустит
+    db.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(due_ids.scalar_subquery()), _due(now))
+        .values(status=SENDING, claim_token=token, claimed_at=now, attempts=OutboxMessage.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    rows = db.execute(
+        select(
+            OutboxMessage.id, OutboxMessage.source, OutboxMessage.priority, OutboxMessage.chat_id,
+            OutboxMessage.message_text, OutboxMessage.reply_markup, OutboxMessage.attempts,
+        )
+        .where(OutboxMessage.claim_token == token)
+        .order_by(OutboxMessage.priority, OutboxMessage.id)
+    ).all()
+    db.commit()
+    return rows
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """Ошибка, которую повтор не исправит"""
+    from aiogram.exceptions import (
+        TelegramBadRequest, TelegramEntityTooLarge, TelegramForbiddenError, TelegramNotFound
+    )
+    return isinstance(error, (TelegramBadRequest, TelegramEntityTooLarge, TelegramForbiddenError, TelegramNotFound))
+
+
+def retry_delay(attempts: int, error: Optional[Exception] = None) -> float:
+    """Пауза перед следующей попыткой: экспонента с разбросом, не меньше retry_after от Telegram"""
+    delay = min(settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), settings.OUTBOX_RETRY_MAX_SECONDS)
+    delay *= random.uniform(0.8, 1.2)
+    return max(delay, getattr(error, "retry_after", 0) or 0)
+
+
+def _finish(db: Session, row, error: Optional[Exception]):
+    """Зафиксировать итог отправки строки (с commit)"""
+    now = get_utc_now()
+    values = {"claim_token": None}
+    if error is None:
+        values.update(status=SENT, sent_at=now, last_error=None)
+        result = "sent"
+    elif is_permanent_error(error) or row.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        values.update(status=FAILED, last_error=str(error)[:1000])
+        result = "failed"
+    else:
+        values.update(
+            status=PENDING,
+            next_attempt_at=now + timedelta(seconds=retry_delay(row.attempts, error)),
+            last_error=str(error)[:1000],
+        )
+        result = "retried"
+    db.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id == row.id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    metrics.OUTBOUND_MESSAGES.labels(row.source, result).inc()
+    if error is not None:
+        logger.warning(f"Outbox message {row.id} to {row.chat_id} {result} (attempt {row.attempts}): {error}")
+        if result == "failed":
+            delivery_health.record_failure(db, row.chat_id, error)
+
+
+async def _send(bot, row):
+    from aiogram.types import InlineKeyboardMarkup
+    from bot.utils.outbound import Priority, outbound_priority
+
+    reply_markup = InlineKeyboardMarkup.model_validate(row.reply_markup) if row.reply_markup else None
+    with outbound_priority(Priority(row.priority)):
+        await bot.send_message(chat_id=row.chat_id, text=row.message_text, reply_markup=reply_markup)
+
+
+def _finish_in_session(row, error: Optional[Exception]):
+    # Своя короткая сессия на строку: соединение фонового пула не держится через await
+    db = BackgroundSessionLocal()
+    try:
+        _finish(db, row, error)
+    finally:
+        db.close()
+
+
+async def _deliver_batch(bot, rows) -> int:
+    semaphore = asyncio.Semaphore(max(1, settings.OUTBOX_CONCURRENCY))
+    delivered: List[int] = []
+
+    async def deliver(row):
+        error = None
+        async with semaphore:
+            try:
+                await _send(bot, row)
+            except Exception as e:
+                error = e
+        # Операции сессии синхронные и не перемежаются между корутинами
+        _finish_in_session(row, error)
+        if error is None:
+            delivered.append(row.chat_id)
+
+    await asyncio.gather(*(deliver(row) for row in rows))
+    # Перепроверка недоступных прошла - статус снимается одним UPDATE на пачку
+    db = BackgroundSessionLocal()
+    try:
+        delivery_health.record_success(db, delivered)
+    finally:
+        db.close()
+    return len(delivered)
+
+
+async def drain(bot) -> int:
+    """Отправить всё, что пора отправлять; возвращает число доставленных сообщений.
+
+    В процессе работает один проход: вызов во время прохода только просит его
+    ещё раз заглянуть в таблицу перед завершением. Соединение с БД берётся на каждый
+    шаг (забрать пачку, записать итог) и не держится, пока идёт отправка: фоновый пул
+    маленький и общий с retention, арендой лидера и /metrics.
+    """
+    global _draining, _drain_again
+    if _draining:
+        _drain_again = True
+        return 0
+    _draining = True
+    sent = 0
+    try:
+        while True:
+            _drain_again = False
+            db = BackgroundSessionLocal()
+            try:
+                rows = claim_batch(db, settings.OUTBOX_BATCH_SIZE)
+            finally:
+                db.close()
+            if not rows:
+                if _drain_again:
+                    continue
+                break
+            sent += await _deliver_batch(bot, rows)
+    finally:
+        _draining = False
+    if sent:
+        logger.info(f"Outbox: {sent} messages delivered")
+    return sent
+
+
+async def _drain_logged(bot):
+    try:
+        await drain(bot)
+    except Exception as e:
+        logger.error(f"Outbox drain failed: {e}", exc_info=True)
+
+
+def kick(bot):
+    """Запустить проход воркера в фоне, не дожидаясь опроса (после commit новых строк)"""
+    if not leader_election.is_leader():
+        # Темп отправки держит очередь одного процесса; строки заберёт лидер на ближайшем опросе
+        return
+    task = asyncio.get_running_loop().create_task(_drain_logged(bot))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def purge_finished(db: Session, older_than_days: int, batch_size: int) -> int:
+    """Удалить отправленные и окончательно не отправленные строки старше срока (пачками, с commit)"""
+    cutoff = get_utc_now() - timedelta(days=older_than_days)
+    purged = 0
+    while True:
+        ids = db.execute(
+            select(OutboxMessage.id)
+            .where(OutboxMessage.status.in_((SENT, FAILED)), OutboxMessage.created_at < cutoff)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return purged
+        purged += db.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(ids))).rowcount
+        db.commit()
+
+
+def backlog(db: Session) -> int:
+    """Незавершённые строки outbox (по частичному индексу)"""
+    return db.query(func.count(OutboxMessage.id)).filter(_UNFINISHED).scalar()
+
+
+def refresh_outbox_metrics():
+    """Незавершённые строки outbox для /metrics"""
+    db = BackgroundSessionLocal()
+    try:
+        counts = dict(
+            db.query(OutboxMessage.status, func.count(OutboxMessage.id))
+            .filter(_UNFINISHED)
+            .group_by(OutboxMessage.status)
+            .all()
+        )
+    finally:
+        db.close()
+    for status in (PENDING, SENDING):
+        metrics.OUTBOX_MESSAGES.labels(status).set(counts.get(status, 0))
@@ -0,0 +1,178 @@
+"""
+Хранение истории: перенос старых строк из горячих таблиц в архивные.
+
+- отправленные уведомления старше RETENTION_SENT_NOTIFICATIONS_DAYS переносятся
+  в archived_scheduled_notifications;
+- регистрации (и все их уведомления) архивных событий, прошедших более
+  RETENTION_ARCHIVED_EVENTS_DAYS назад, переносятся в archived_registrations,
+  а их количество накапливается в events.archived_registrations_count;
+- завершённые строки outbox_messages старше RETENTION_SENT_NOTIFICATIONS_DAYS удаляются.
+
+Перенос идёт пачками по RETENTION_BATCH_SIZE строк, каждая пачка - отдельная
+транзакция (INSERT ... SELECT + DELETE), чтобы не держать долгую блокировку записи.
+"""
+import logging
+from datetime import timedelta
+from sqlalchemy import select, insert, delete, update, literal, exists
+from sqlalchemy.orm import Session
+from database.database import BackgroundSessionLocal, background_engine, is_sqlite
+from database.models import (
+    Event, EventStatus, Registration, ScheduledNotification,
+    ArchivedRegistration, ArchivedScheduledNotification
+)
+from services import outbox
+from config import settings
+from utils.timezone import get_utc_now
+
+logger = logging.getLogger(__name__)
+
+_NOTIFICATION_COLUMNS = (
+    "id", "event_id", "registration_id", "notification_type", "template_id",
+    "scheduled_time", "sent", "sent_at", "created_at",
+)
+_REGISTRATION_COLUMNS = ("id", "event_id", "user_telegram_id", "data_json", "confirmed", "created_at")
+
+
+def _move_rows(db: Session, source, target, columns, ids, archived_at) -> int:
+    """Скопировать строки с указанными id в архивную таблицу и удалить из исходной"""
+    source_table = source.__table__
+    db.execute(
+        insert(target.__table__).from_select(
+            list(columns) + ["archived_at"],
+            select(*[source_table.c[name] for name in columns], literal(archived_at))
+            .where(source_table.c.id.in_(ids))
+        )
+    )
+    return db.execute(delete(source_table).where(source_table.c.id.in_(ids))).rowcount
+
+
+def archive_sent_notifications(db: Session, older_than_days: int, batch_size: int) -> int:
+    """Перенести отправленные уведомления старше указанного срока"""
+    cutoff = get_utc_now() - timedelta(days=older_than_days)
+    moved = 0
+    while True:
+        ids = db.execute(
+            select(ScheduledNotification.id)
+            .where(ScheduledNotification.sent == True, ScheduledNotification.sent_at < cutoff)
+            .order_by(ScheduledNotification.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return moved
+        moved += _move_rows(db, ScheduledNotification, ArchivedScheduledNotification, _NOTIFICATION_COLUMNS, ids, get_utc_now())
+        db.commit()
+
+
+def archive_event_registrations(db: Session, older_than_days: int, batch_size: int) -> int:
+    """Перенести регистрации архивных событий, прошедших более указанного срока назад"""
+    cutoff = get_utc_now() - timedelta(days=older_than_days)
+    event_ids = db.execute(
+        select(Event.id).where(
+            Event.status == EventStatus.ARCHIVED,
+            Event.date_time < cutoff,
+            exists().where(Registration.event_id == Event.id)
+        )
+    ).scalars().all()
+
+    moved = 0
+    for event_id in event_ids:
+        while True:
+            ids = db.execute(
+                select(Registration.id)
+                .where(Registration.event_id == event_id)
+                .order_by(Registration.id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            now = get_utc_now()
+            # Сначала уведомления: они ссылаются на регистрации
+            notification_ids = db.execute(
+                select(ScheduledNotification.id).where(ScheduledNotification.registration_id.in_(ids))
+            ).scalars().all()
+            if notification_ids:
+                _move_rows(db, ScheduledNotification, ArchivedScheduledNotification, _NOTIFICATION_COLUMNS, notification_ids, now)
+            count = _move_rows(db, Registration, ArchivedRegistration, _REGISTRATION_COLUMNS, ids, now)
+            # Счётчик обновляется в той же транзакции, что и перенос - итоговое количество не «проседает»
+            db.execute(
+                update(Event)
+                .where(Event.id == event_id)
+                .values(archived_registrations_count=Event.archived_registrations_count + count)
+            )
+            db.commit()
+            moved += count
+    return moved
+
+
+def restore_event_registrations(db: Session, event_id: int) -> int:
+    """Вернуть регистрации события из архива при разархивировании (commit - на стороне вызывающего,
+    вместе со сменой статуса).
+
+    История отправленных уведомлений остаётся в archived_scheduled_notifications: она только
+    для чтения, а в рабочей таблице её снова перенёс бы следующий проход retention.
+    """
+    archived = db.execute(
+        select(*[ArchivedRegistration.__table__.c[name] for name in _REGISTRATION_COLUMNS])
+        .where(ArchivedRegistration.event_id == event_id)
+    ).mappings().all()
+    if not archived:
+        return 0
+    db.execute(insert(Registration.__table__), [dict(row) for row in archived])
+    db.execute(delete(ArchivedRegistration).where(ArchivedRegistration.event_id == event_id))
+    db.execute(update(Event).where(Event.id == event_id).values(archived_registrations_count=0))
+    return len(archived)
+
+
+def purge_event_archive(db: Session, event_id: int):
+    """Удалить архивные строки события (при удалении события; commit - на стороне вызывающего)"""
+    db.execute(delete(ArchivedScheduledNotification).where(ArchivedScheduledNotification.event_id == event_id))
+    db.execute(delete(ArchivedRegistration).where(ArchivedRegistration.event_id == event_id))
+
+
+def optimize_storage(vacuum: bool = False):
+    """Обновить статистику планировщика и, при необходимости, вернуть место на диске"""
+    tables = (
+        "scheduled_notifications", "registrations", "archived_scheduled_notifications", "archived_registrations",
+        "outbox_messages",
+    )
+    with background_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if is_sqlite():
+            if vacuum:
+                conn.exec_driver_sql("VACUUM")
+            # PRAGMA optimize сам решает, какие таблицы нужно проанализировать
+            conn.exec_driver_sql("PRAGMA optimize")
+        else:
+            for table in tables:
+                conn.exec_driver_sql(f"{'VACUUM ANALYZE' if vacuum else 'ANALYZE'} {table}")
+
+
+def run_retention() -> dict:
+    """Один проход переноса данных (вызывается планировщиком)"""
+    db = BackgroundSessionLocal()
+    try:
+        notifications = archive_sent_notifications(
+            db, settings.RETENTION_SENT_NOTIFICATIONS_DAYS, settings.RETENTION_BATCH_SIZE
+        )
+        registrations = archive_event_registrations(
+            db, settings.RETENTION_ARCHIVED_EVENTS_DAYS, settings.RETENTION_BATCH_SIZE
+        )
+        outbox_purged = outbox.purge_finished(
+            db, settings.RETENTION_SENT_NOTIFICATIONS_DAYS, settings.RETENTION_BATCH_SIZE
+        )
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error archiving old data: {e}", exc_info=True)
+        return {}
+    finally:
+        db.close()
+
+    if outbox_purged:
+        logger.info(f"Retention: purged {outbox_purged} finished outbox messages")
+    moved = notifications + registrations
+    if moved:
+        logger.info(f"Retention: archived {notifications} notifications, {registrations} registrations")
+        try:
+            optimize_storage(vacuum=moved >= settings.RETENTION_VACUUM_MIN_ROWS)
+        except Exception as e:
+            logger.warning(f"Retention: storage optimization failed: {e}")
+    return {"notifications": notifications, "registrations": registrations, "outbox": outbox_purged}
@@ -1,15 +1,31 @@
 import asyncio
+import functools
 import logging
+import time
+from typing import Optional, Tuple
+from sqlalchemy import select
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from database.database import SessionLocal
-from services.notification_service import get_pending_notifications, send_notification
+from database.database import BackgroundSessionLocal, checkpoint_wal, is_sqlite
+from database.models import NotificationTemplate
+from services.notification_service import drop_reason, drop_reminder, get_due_reminders, latest_due_times
+from services import delivery_health, outbox
+from services.leader import leader_election
+from services.retention import run_retention
+from services.event_lifecycle import run_event_lifecycle
+from services.message_templates import BoundTemplate, compile_template
+from services.organizer_digest import organizer_digest
 from aiogram import Bot
+from bot.utils.outbound import Priority
 from config import settings
 from utils.timezone import get_utc_now
+from utils import metrics, loop_watchdog
 
 logger = logging.getLogger(__name__)
 
+# Регистраций в одной пачке разворачивания напоминания
+FANOUT_CHUNK = 1000
+
 scheduler = AsyncIOScheduler()
 bot_instance: Bot = None
 
@@ -21,132 +37,243 @@ def set_bot_instance(bot: Bot):
 
 
 async def check_and_send_notifications():
-    """Проверить и отправить запланированные уведомления"""
+    """Развернуть наступившие напоминания в outbox и запустить отправку.
+
+    После простоя напоминания наверстываются по порядку scheduled_time, не больше
+    REMINDER_CATCHUP_BATCH за тик и пока в outbox меньше REMINDER_OUTBOX_BACKLOG строк -
+    остальные ждут следующих тиков. Опоздавшие и заменённые более поздними закрываются
+    без отправки (notification_service.drop_reason). Тик не ждёт доставки: outbox
+    отправляет в фоне в темпе очереди отправки, и тики не наползают друг на друга.
+    """
     if not bot_instance:
         logger.warning("Bot instance not set, skipping notification check")
         return
     
-    db = SessionLocal()
+    started = time.perf_counter()
+    db = BackgroundSessionLocal()
     try:
-        pending = get_pending_notifications(db)
-        
-        if not pending:
-            return
-        
-        logger.info(f"Found {len(pending)} pending notifications")
-        
-        for notification in pending:
-            try:
-                success = await send_notification_async(db, notification)
-                if success:
-                    logger.info(f"Notification {notification.id} sent successfully")
-                else:
-                    logger.warning(f"Failed to send notification {notification.id}")
-            except Exception as e:
-                logger.error(f"Error sending notification {notification.id}: {e}")
+        with loop_watchdog.track("scheduler.check_and_send_notifications", "job"):
+            jobs = get_due_reminders(db, settings.REMINDER_CATCHUP_BATCH)
+            now = get_utc_now()
+            latest = latest_due_times(db, [job.event_id for job in jobs], now)
+            backlog = outbox.backlog(db) if jobs else 0
+            # (событие, шаблон) -> шаблон с подставленными полями события, общий для всех получателей тика
+            renderers = {}
+            for job in jobs:
+                reason = drop_reason(job, latest.get(job.event_id), now)
+                if reason is None and backlog >= settings.REMINDER_OUTBOX_BACKLOG > 0:
+                    logger.info(f"Outbox backlog {backlog}: remaining due reminders wait for the next tick")
+                    break
+                try:
+                    if reason is not None:
+                        drop_reminder(job, reason, now)
+                        queued, skipped = 0, 0
+                    else:
+                        queued, skipped = fan_out_reminder(db, job, renderers)
+                    # Сообщения и отметка sent - одна транзакция: напоминание не теряется и не дублируется
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"Error expanding reminder {job.id}: {e}", exc_info=True)
+                    continue
+                if reason is not None:
+                    metrics.REMINDERS_DROPPED.labels(reason).inc()
+                    logger.info(f"Reminder {job.id} for event {job.event_id} dropped: {reason}")
+                    continue
+                backlog += queued
+                if skipped:
+                    metrics.OUTBOUND_MESSAGES.labels("scheduler", "skipped").inc(skipped)
+                logger.info(f"Reminder {job.id} for event {job.event_id}: {queued} queued, {skipped} undeliverable")
     finally:
         db.close()
+        metrics.SCHEDULER_TICK_SECONDS.observe(time.perf_counter() - started)
+    # Заодно - повторы, срок которых подошёл
+    outbox.kick(bot_instance)
 
 
-async def send_notification_async(db, scheduled_notification):
-    """Асинхронная отправка уведомления"""
-    try:
-        from database.models import Registration, Event, EventNotification
-        from bot.handlers.notification_handlers import get_notification_keyboard
-        from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
-        
-        registration = db.query(Registration).filter(
-            Registration.id == scheduled_notification.registration_id
-        ).first()
-        
-        if not registration:
-            logger.warning(f"Registration {scheduled_notification.registration_id} not found")
-            return False
-        
-        event = db.query(Event).filter(Event.id == scheduled_notification.event_id).first()
-        if not event:
-            logger.warning(f"Event {scheduled_notification.event_id} not found")
-            return False
-        
+async def drain_outbox():
+    """Повторы и продолжение рассылок, прерванных перезапуском"""
+    if not bot_instance:
+        return
+    with loop_watchdog.track("scheduler.drain_outbox", "job"):
+        await outbox.drain(bot_instance)
+
+
+async def flush_organizer_digests():
+    """Отправить накопленные сводки ответов организаторам"""
+    if not bot_instance:
+        return
+    with loop_watchdog.track("scheduler.flush_organizer_digests", "job"):
+        await organizer_digest.flush(bot_instance)
+
+
+def default_reminder_text(event) -> str:
+    """Текст напоминания, если у уведомления нет шаблона"""
+    from utils.timezone import format_event_datetime
+    
+    message_text = f"🔔 Напоминание о событии!\n\n"
+    message_text += f"📅 {event.title}\n"
+    message_text += f"📆 Дата: {format_event_datetime(event.date_time)}\n"
+    
+    if event.description:
+        message_text += f"\n{event.description}\n"
+    return message_text
+
+
+def get_event_renderer(db, event, template_id: Optional[int], renderers: Optional[dict] = None) -> BoundTemplate:
+    """Шаблон с подставленными полями события; `renderers` - кэш на одну рассылку (тик планировщика)"""
+    key = (event.id, template_id)
+    if renderers is not None and key in renderers:
+        return renderers[key]
+    template = db.get(NotificationTemplate, template_id) if template_id else None
+    if template is not None:
+        renderer = compile_template(template).bind(event)
+    else:
+        renderer = BoundTemplate([default_reminder_text(event)])
+    if renderers is not None:
+        renderers[key] = renderer
+    return renderer
+
+
+def fan_out_reminder(db, job, renderers: Optional[dict] = None) -> Tuple[int, int]:
+    """Поставить напоминание в outbox всем текущим регистрациям события (commit - на стороне вызывающего).
+
+    Регистрации читаются потоком (server-side cursor в PostgreSQL) пачками по FANOUT_CHUNK,
+    так что память не зависит от размера события. Недоступные получатели отсеиваются тем же
+    запросом. Возвращает (поставлено в outbox, пропущено недоступных).
+    """
+    from database.models import Event, EventNotification, Registration, User
+    from bot.handlers.notification_handlers import get_notification_keyboard
+    
+    now = get_utc_now()
+    queued = skipped = 0
+    event = db.get(Event, job.event_id)
+    if event is not None:
         # Проверяем, нужно ли добавлять кнопки
-        include_buttons = True
         event_notif = db.query(EventNotification).filter(
             EventNotification.event_id == event.id,
             EventNotification.enabled == True
         ).first()
+        include_buttons = event_notif.include_buttons if event_notif else True
         
-        if event_notif:
-            include_buttons = event_notif.include_buttons
-        
-        # Формируем сообщение
-        from utils.timezone import format_event_datetime
-        
-        message_text = f"🔔 Напоминание о событии!\n\n"
-        message_text += f"📅 {event.title}\n"
-        message_text += f"📆 Дата: {format_event_datetime(event.date_time)}\n"
-        
-        if event.description:
-            message_text += f"\n{event.description}\n"
-        
-        # Отправляем сообщение с кнопками или без
-        try:
-            if include_buttons:
-                await bot_instance.send_message(
-                    chat_id=registration.user_telegram_id,
-                    text=message_text,
-                    reply_markup=get_notification_keyboard(registration.id)
-                )
-            else:
-                await bot_instance.send_message(
-                    chat_id=registration.user_telegram_id,
-                    text=message_text
-                )
-            
-            # Отмечаем как отправленное
-            scheduled_notification.sent = True
-            scheduled_notification.sent_at = get_utc_now()
-            db.commit()
-            
-            logger.info(f"Notification {scheduled_notification.id} sent successfully to user {registration.user_telegram_id}")
-            return True
-            
-        except TelegramForbiddenError as e:
-            # Пользователь заблокировал бота или удалил диалог
-            logger.warning(f"Cannot send notification {scheduled_notification.id} to user {registration.user_telegram_id}: user blocked bot or chat not found. Error: {e}")
-            # Отмечаем как отправленное, чтобы не пытаться снова
-            scheduled_notification.sent = True
-            scheduled_notification.sent_at = get_utc_now()
-            db.commit()
-            return False
-            
-        except TelegramBadRequest as e:
-            # Другие ошибки Telegram API (неверный chat_id и т.д.)
-            logger.error(f"Telegram API error sending notification {scheduled_notification.id} to user {registration.user_telegram_id}: {e}")
-            # Отмечаем как отправленное, чтобы не пытаться снова
-            scheduled_notification.sent = True
-            scheduled_notification.sent_at = get_utc_now()
-            db.commit()
-            return False
-            
-    except Exception as e:
-        logger.error(f"Unexpected error sending notification {scheduled_notification.id}: {e}", exc_info=True)
-        return False
+        # Литералы и поля события склеены один раз на тик, для получателя - только поля анкеты
+        renderer = get_event_renderer(db, event, job.template_id, renderers)
+        result = db.execute(
+            select(
+                Registration.id,
+                Registration.user_telegram_id,
+                Registration.data_json,
+                delivery_health.undeliverable(now).label("undeliverable"),
+            )
+            .outerjoin(User, User.telegram_id == Registration.user_telegram_id)
+            .where(Registration.event_id == event.id)
+            .execution_options(stream_results=True, yield_per=FANOUT_CHUNK)
+        )
+        for chunk in result.partitions():
+            messages = []
+            for registration_id, telegram_id, data_json, blocked in chunk:
+                if blocked:
+                    skipped += 1
+                    continue
+                messages.append(outbox.build_message(
+                    f"reminder:{job.id}:{registration_id}",
+                    telegram_id,
+                    renderer.render(data_json),
+                    source="scheduler",
+                    priority=Priority.REMINDER,
+                    reply_markup=get_notification_keyboard(registration_id) if include_buttons else None,
+                ))
+            queued += outbox.enqueue(db, messages)
+    else:
+        logger.warning(f"Event {job.event_id} not found for reminder {job.id}")
+    
+    job.sent = True
+    job.sent_at = now
+    job.recipients_count = queued
+    job.skipped_count = skipped
+    return queued, skipped
+
+
+def leader_only(func):
+    """Задача планировщика, которую из всех реплик бота выполняет только лидер (services/leader.py)"""
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if leader_election.is_leader():
+                return await func(*args, **kwargs)
+    else:
+        # Синхронные задачи APScheduler выполняет в пуле потоков
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if leader_election.is_leader():
+                return func(*args, **kwargs)
+    return wrapper
 
 
 def start_scheduler():
     """Запустить планировщик"""
+    if settings.SCHEDULER_LEADER_ELECTION:
+        leader_election.start()
+        scheduler.add_job(
+            leader_election.renew,
+            trigger=IntervalTrigger(seconds=settings.SCHEDULER_LEASE_RENEW_SECONDS),
+            id='leader_lease',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
     scheduler.add_job(
-        check_and_send_notifications,
+        leader_only(check_and_send_notifications),
         trigger=IntervalTrigger(seconds=30),  # Проверяем каждые 30 секунд
         id='check_notifications',
         replace_existing=True
     )
+    if settings.OUTBOX_POLL_SECONDS > 0:
+        scheduler.add_job(
+            leader_only(drain_outbox),
+            trigger=IntervalTrigger(seconds=settings.OUTBOX_POLL_SECONDS),
+            id='outbox',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+    # Буфер сводок у каждой реплики свой - сбрасывают все
+    if settings.ORGANIZER_DIGEST_INTERVAL_SECONDS > 0:
+        scheduler.add_job(
+            flush_organizer_digests,
+            trigger=IntervalTrigger(seconds=settings.ORGANIZER_DIGEST_INTERVAL_SECONDS),
+            id='organizer_digests',
+            replace_existing=True
+        )
+    if is_sqlite() and settings.SQLITE_CHECKPOINT_INTERVAL > 0:
+        # Синхронная функция: APScheduler выполняет её в пуле потоков, не блокируя event loop
+        scheduler.add_job(
+            leader_only(checkpoint_wal),
+            trigger=IntervalTrigger(seconds=settings.SQLITE_CHECKPOINT_INTERVAL),
+            id='sqlite_wal_checkpoint',
+            replace_existing=True
+        )
+    if settings.EVENT_AUTO_ARCHIVE_ENABLED and settings.EVENT_LIFECYCLE_INTERVAL_MINUTES > 0:
+        scheduler.add_job(
+            leader_only(run_event_lifecycle),
+            trigger=IntervalTrigger(minutes=settings.EVENT_LIFECYCLE_INTERVAL_MINUTES),
+            id='event_lifecycle',
+            replace_existing=True
+        )
+    if settings.RETENTION_ENABLED and settings.RETENTION_INTERVAL_HOURS > 0:
+        scheduler.add_job(
+            leader_only(run_retention),
+            trigger=IntervalTrigger(hours=settings.RETENTION_INTERVAL_HOURS),
+            id='retention',
+            replace_existing=True
+        )
     scheduler.start()
-    logger.info("Notification scheduler started")
+    logger.info(f"Notification scheduler started (leader: {leader_election.is_leader()})")
 
 
 def stop_scheduler():
     """Остановить планировщик"""
-    scheduler.shutdown()
+    if scheduler.running:
+        scheduler.shutdown()
+    leader_election.release()
     logger.info("Notification scheduler stopped")
-
@@ -0,0 +1,37 @@
+"""
+Онлайн‑резервная копия SQLite‑базы без остановки бота и API.
+
+Запуск из каталога app/:
+    python -m tools.backup_db backups/event_registration.db
+    python -m tools.backup_db                 # имя файла с датой и временем
+"""
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+from database.database import backup_sqlite, is_sqlite
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Резервная копия SQLite через backup API")
+    parser.add_argument("dest", nargs="?", help="Файл назначения")
+    parser.add_argument("--pages", type=int, default=1024, help="Страниц за один шаг копирования")
+    args = parser.parse_args(argv)
+
+    if not is_sqlite():
+        print("DATABASE_URL не указывает на SQLite - используйте штатные средства вашей СУБД (pg_dump и т.п.)")
+        return 1
+
+    dest = Path(args.dest or f"backups/event_registration_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
+    if dest.exists():
+        print(f"Файл {dest} уже существует")
+        return 1
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    backup_sqlite(str(dest), pages=args.pages)
+    print(f"Резервная копия сохранена: {dest} ({dest.stat().st_size} байт)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Бенчмарк конкурентных чтений/записей SQLite: режим по умолчанию (rollback journal)
+против профиля из настроек (WAL, synchronous, busy_timeout, mmap, cache_size).
+
+Запуск из каталога app/:
+    python -m tools.bench_sqlite --seconds 10 --writers 4 --readers 8
+"""
+import argparse
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.exc import OperationalError
+from database.database import configure_sqlite, sqlite_pragmas
+from database.models import Base, ScheduledNotification
+
+DEFAULT_PRAGMAS = {"journal_mode": "DELETE", "synchronous": "FULL"}
+
+
+def run_profile(name: str, pragmas: dict, seconds: float, writers: int, readers: int, rows: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(
+            f"sqlite:///{Path(tmp) / 'bench.db'}",
+            connect_args={"check_same_thread": False},
+            pool_size=writers + readers,
+        )
+        configure_sqlite(engine, pragmas)
+        Base.metadata.create_all(bind=engine)
+
+        now = datetime.utcnow()
+        with engine.begin() as conn:
+            conn.execute(ScheduledNotification.__table__.insert(), [
+                {
+                    "event_id": i % 100, "registration_id": i, "notification_type": "custom",
+                    "scheduled_time": now + timedelta(minutes=i % 600 - 300), "sent": False, "created_at": now,
+                }
+                for i in range(1, rows + 1)
+            ])
+
+        counters = {"reads": 0, "writes": 0, "errors": 0}
+        lock = threading.Lock()
+        stop_at = time.perf_counter() + seconds
+
+        def bump(key):
+            with lock:
+                counters[key] += 1
+
+        def writer():
+            rnd = random.Random()
+            while time.perf_counter() < stop_at:
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(
+                            update(ScheduledNotification)
+                            .where(ScheduledNotification.id == rnd.randint(1, rows))
+                            .values(sent=True, sent_at=datetime.utcnow())
+                        )
+                    bump("writes")
+                except OperationalError:
+                    bump("errors")
+
+        def reader():
+            while time.perf_counter() < stop_at:
+                try:
+                    with engine.connect() as conn:
+                        conn.execute(
+                            select(ScheduledNotification.id).where(
+                                ScheduledNotification.sent == False,
+                                ScheduledNotification.scheduled_time <= datetime.utcnow()
+                            ).limit(100)
+                        ).fetchall()
+                    bump("reads")
+                except OperationalError:
+                    bump("errors")
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        threads += [threading.Thread(target=reader) for _ in range(readers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        engine.dispose()
+
+    return {
+        "profile": name,
+        "reads_per_sec": counters["reads"] / seconds,
+        "writes_per_sec": counters["writes"] / seconds,
+        "errors": counters["errors"],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк конкурентного доступа к SQLite")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    for name, pragmas in (("default", DEFAULT_PRAGMAS), ("profile", sqlite_pragmas())):
+        result = run_profile(name, pragmas, args.seconds, args.writers, args.readers, args.rows)
+        print(
+            f"{result['profile']:<8} reads/s={result['reads_per_sec']:>9.1f} "
+            f"writes/s={result['writes_per_sec']:>8.1f} errors={result['errors']}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
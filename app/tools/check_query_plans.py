@@ -0,0 +1,176 @@
+"""
+Проверка планов горячих запросов: ни один не должен деградировать до полного скана таблицы.
+
+Запуск из каталога app/:
+    python -m tools.check_query_plans                 # временная SQLite с тестовыми данными
+    python -m tools.check_query_plans --url <URL>     # существующая БД (SQLite или PostgreSQL)
+
+Код возврата 1, если хотя бы один запрос читает таблицу целиком.
+"""
+import argparse
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from sqlalchemy import create_engine, select, func, text
+from database.models import (
+    Base, User, Event, EventStatus, Registration, EventNotification, ReminderJob, ScheduledNotification
+)
+
+
+def hot_queries():
+    """Горячие запросы приложения (в том виде, в каком их строят handlers и сервисы)"""
+    now = datetime.utcnow()
+    return {
+        "due_reminders": select(ReminderJob).where(
+            ReminderJob.sent == False,
+            ReminderJob.scheduled_time <= now
+        ).order_by(ReminderJob.scheduled_time, ReminderJob.id).limit(20),
+        "latest_due_reminders": select(ReminderJob.event_id, func.max(ReminderJob.scheduled_time)).where(
+            ReminderJob.sent == False,
+            ReminderJob.scheduled_time <= now,
+            ReminderJob.event_id.in_([1, 2, 3])
+        ).group_by(ReminderJob.event_id),
+        "event_reminders": select(ReminderJob).where(
+            ReminderJob.event_id == 1
+        ).order_by(ReminderJob.scheduled_time.asc()),
+        "reminder_fan_out": select(Registration.id, Registration.user_telegram_id).outerjoin(
+            User, User.telegram_id == Registration.user_telegram_id
+        ).where(Registration.event_id == 1),
+        # Каскадное удаление истории при отмене регистрации
+        "registration_scheduled_notifications": select(ScheduledNotification).where(
+            ScheduledNotification.registration_id == 1
+        ),
+        "existing_registration": select(Registration).where(
+            Registration.event_id == 1,
+            Registration.user_telegram_id == 1001
+        ),
+        "event_registrations_count": select(func.count(Registration.id)).where(
+            Registration.event_id == 1
+        ),
+        "user_registrations": select(Registration).where(
+            Registration.user_telegram_id == 1001
+        ).order_by(Registration.created_at.desc()),
+        "enabled_event_notification": select(EventNotification).where(
+            EventNotification.event_id == 1,
+            EventNotification.enabled == True
+        ),
+        "active_events": select(Event).where(
+            Event.status.in_([EventStatus.APPROVED, EventStatus.ACTIVE])
+        ).order_by(Event.date_time.asc()),
+    }
+
+
+def seed(engine, events: int = 200, users: int = 500):
+    """
+    Заполнить пустую БД небольшим набором данных.
+    Как и в рабочей БД, большая часть событий - прошедшие и архивные.
+    ANALYZE не выполняется: приложение его не запускает, и планировщик
+    SQLite работает на эвристиках по умолчанию.
+    """
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": i, "telegram_id": 1000 + i, "full_name": f"User {i}", "role": "USER", "created_at": now}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(Event.__table__.insert(), [
+            {
+                "id": i, "title": f"Event {i}", "date_time": now + timedelta(days=i - events * 9 // 10),
+                "status": "APPROVED" if i > events * 9 // 10 else "ARCHIVED", "created_by": 1,
+                "created_at": now, "updated_at": now,
+            }
+            for i in range(1, events + 1)
+        ])
+        conn.execute(EventNotification.__table__.insert(), [
+            {"event_id": i, "custom_time": 60, "enabled": True, "include_buttons": True}
+            for i in range(1, events + 1)
+        ])
+        registrations = [
+            {
+                "id": e * users + u, "event_id": e, "user_telegram_id": 1000 + u,
+                "data_json": {}, "created_at": now,
+            }
+            for e in range(1, events + 1) for u in range(1, users + 1, 5)
+        ]
+        conn.execute(Registration.__table__.insert(), registrations)
+        conn.execute(ReminderJob.__table__.insert(), [
+            {
+                "event_id": i, "notification_type": "custom",
+                "scheduled_time": now + timedelta(hours=i - events // 2, minutes=-offset),
+                "sent": i < events // 2, "created_at": now,
+            }
+            for i in range(1, events + 1) for offset in (60, 1440)
+        ])
+        # История отправок до reminder_jobs
+        conn.execute(ScheduledNotification.__table__.insert(), [
+            {
+                "event_id": r["event_id"], "registration_id": r["id"], "notification_type": "custom",
+                "scheduled_time": now - timedelta(days=r["event_id"]), "sent": True, "created_at": now,
+            }
+            for r in registrations if r["event_id"] <= events // 2
+        ])
+
+
+def full_scans(conn, statement) -> list:
+    """Строки плана, в которых таблица читается целиком"""
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    sql = str(compiled)
+    params = compiled.params
+    if conn.dialect.name == "sqlite":
+        plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", _positional(compiled))]
+        return [line for line in plan if line.startswith("SCAN ") and " USING " not in line]
+    if conn.dialect.name == "postgresql":
+        # На маленьких таблицах Postgres честно выбирает Seq Scan - запрещаем его, чтобы проверить наличие индекса
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        plan = [row[0] for row in conn.execute(text(f"EXPLAIN {sql}"), params)]
+        return [line.strip() for line in plan if "Seq Scan" in line]
+    raise RuntimeError(f"Диалект {conn.dialect.name} не поддерживается")
+
+
+def _positional(compiled):
+    return tuple(_plain(compiled.params[name]) for name in compiled.positiontup)
+
+
+def _plain(value):
+    # Для плана важны только типы значений, а не их обработка драйвером
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return getattr(value, "name", value)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Проверка планов горячих запросов")
+    parser.add_argument("--url", help="URL существующей БД (по умолчанию - временная SQLite с тестовыми данными)")
+    args = parser.parse_args(argv)
+
+    tmp_dir = None
+    if args.url:
+        engine = create_engine(args.url)
+    else:
+        tmp_dir = tempfile.TemporaryDirectory()
+        engine = create_engine(f"sqlite:///{Path(tmp_dir.name) / 'plans.db'}")
+        seed(engine)
+
+    failed = 0
+    try:
+        with engine.connect() as conn:
+            for name, statement in hot_queries().items():
+                with conn.begin():
+                    scans = full_scans(conn, statement)
+                if scans:
+                    failed += 1
+                    print(f"FAIL {name}: {'; '.join(scans)}")
+                else:
+                    print(f"ok   {name}")
+    finally:
+        engine.dispose()
+        if tmp_dir:
+            tmp_dir.cleanup()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
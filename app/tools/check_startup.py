@@ -0,0 +1,93 @@
+"""
+Бюджет времени импорта точек входа (bot.main и api.main) по `python -X importtime`.
+
+Каждая точка входа импортируется в отдельном процессе несколько раз, берётся лучший
+результат. Кроме общего времени проверяется, что при старте не грузятся модули,
+нужные только в редких сценариях (openpyxl - экспорт в Excel, aiogram - в API).
+
+Запуск из каталога app/:
+    python -m tools.check_startup
+    python -m tools.check_startup --bot-budget-ms 3000 --api-budget-ms 1000 --runs 5
+
+Код возврата 1, если бюджет превышен или загружен запрещённый модуль.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+# Точка входа -> модули, которые не должны импортироваться при её старте
+FORBIDDEN = {
+    "bot.main": ("openpyxl",),
+    "api.main": ("openpyxl", "aiogram"),
+}
+
+
+def import_times(module: str, env: dict) -> dict:
+    """{модуль: (собственное время, накопленное время в мкс, имя с отступом вложенности)} для одного импорта"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} завершился с ошибкой:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, self_us, cumulative_us, name = (part for part in line.replace("import time:", "|", 1).split("|"))
+        times[name.strip()] = (int(self_us), int(cumulative_us), name)
+    return times
+
+
+def direct_imports(times: dict, top: int):
+    """Самые тяжёлые импорты первого уровня (отступ в выводе importtime - 3 пробела)"""
+    children = [(data[1], name) for name, data in times.items() if data[2].startswith("   ") and not data[2].startswith("    ")]
+    return sorted(children, reverse=True)[:top]
+
+
+def check(module: str, budget_ms: float, runs: int, top: int, env: dict) -> bool:
+    best = None
+    for _ in range(runs):
+        times = import_times(module, env)
+        if best is None or times[module][1] < best[module][1]:
+            best = times
+    total_ms = best[module][1] / 1000
+    ok = total_ms <= budget_ms
+    print(f"{'ok' if ok else 'OVER BUDGET':<12} {module}: {total_ms:.0f} ms (budget {budget_ms:.0f} ms)")
+    for cumulative_us, name in direct_imports(best, top):
+        print(f"{'':<14}{cumulative_us / 1000:8.1f} ms  {name}")
+
+    for forbidden in FORBIDDEN.get(module, ()):
+        if forbidden in best:
+            print(f"{'FORBIDDEN':<12} {module} imports {forbidden} at startup")
+            ok = False
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бюджет времени импорта bot.main и api.main")
+    parser.add_argument("--bot-budget-ms", type=float, default=4000)
+    parser.add_argument("--api-budget-ms", type=float, default=1500)
+    parser.add_argument("--runs", type=int, default=3, help="Импортов каждой точки входа (берётся лучший)")
+    parser.add_argument("--top", type=int, default=8, help="Сколько самых тяжёлых импортов показать")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="mclassbot-startup-") as tmp_dir:
+        env = dict(os.environ)
+        # Импорт не должен трогать рабочую БД и требовать настоящий токен
+        env["DATABASE_URL"] = f"sqlite:///{tmp_dir}/startup.db"
+        env.setdefault("BOT_TOKEN", "123456:startup-check")
+        results = [
+            check("bot.main", args.bot_budget_ms, args.runs, args.top, env),
+            check("api.main", args.api_budget_ms, args.runs, args.top, env),
+        ]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
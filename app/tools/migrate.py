@@ -0,0 +1,20 @@
+"""
+Привести схему БД к последней миграции - то же, что делает бот при старте (init_db).
+
+В отличие от `alembic upgrade head` понимает БД, созданные create_all без `alembic_version`:
+они помечаются базовой ревизией, и применяются только миграции после неё.
+
+Запуск из каталога app/:
+    python -m tools.migrate
+"""
+import logging
+from database.database import init_db
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    init_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Генератор синтетических данных масштаба продакшена для нагрузочных тестов.
+
+Создаёт пользователей, события с разными наборами полей, шаблоны и настройки уведомлений,
+права помощников, регистрации с data_json, напоминания ReminderJob (часть - просроченные, как
+после простоя планировщика) и историю отправок ScheduledNotification. Вставка идёт через
+Core bulk insert пачками, идентификаторы назначаются заранее - результат полностью
+определяется --seed.
+
+Запуск из каталога app/ (БД из DATABASE_URL или --url):
+    python -m tools.seed --reset                                  # ~1M строк
+    python -m tools.seed --reset --events 200 --users 5000 --registrations 20000 --scheduled 20000
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select, text
+from database.database import engine as default_engine, is_sqlite, make_engine
+from database.models import (
+    Base, User, UserRole, Event, EventStatus, EventField, FieldType, NotificationTemplate,
+    EventNotification, UserEventPermission, Registration, ReminderJob, ScheduledNotification
+)
+from utils.timezone import get_utc_now
+
+TELEGRAM_ID_BASE = 10_000_000
+
+FIRST_NAMES = ("Анна", "Иван", "Мария", "Пётр", "Ольга", "Дмитрий", "Елена", "Сергей", "Наталья", "Алексей")
+LAST_NAMES = ("Иванова", "Петров", "Смирнова", "Кузнецов", "Попова", "Соколов", "Лебедева", "Новиков")
+TITLES = ("Мастер-класс", "Лекция", "Воркшоп", "Встреча", "Экскурсия", "Семинар", "Конференция", "Тренинг")
+TOPICS = ("по керамике", "по Python", "о дизайне", "по фотографии", "о финансах", "по йоге", "о маркетинге")
+
+# Пул полей, из которого каждому событию достаётся свой набор
+FIELD_POOL = (
+    ("Имя", FieldType.TEXT, None),
+    ("Email", FieldType.EMAIL, None),
+    ("Телефон", FieldType.PHONE, None),
+    ("Возраст", FieldType.NUMBER, None),
+    ("Дата рождения", FieldType.DATE, None),
+    ("Город", FieldType.SELECT, ["Москва", "Санкт-Петербург", "Казань", "Новосибирск"]),
+    ("Уровень", FieldType.SELECT, ["Начальный", "Средний", "Продвинутый"]),
+    ("Комментарий", FieldType.TEXT, None),
+    ("Компания", FieldType.TEXT, None),
+)
+
+TEMPLATE_OFFSETS = (15, 30, 60, 180, 720, 1440, 2880)
+
+
+class Seeder:
+    def __init__(self, conn, seed: int, chunk: int, now: datetime = None):
+        self.conn = conn
+        self.rng = random.Random(seed)
+        self.chunk = chunk
+        # Все даты отсчитываются от now - с --now результат совпадает побайтно
+        self.now = (now or get_utc_now()).replace(microsecond=0)
+        self.counts = {}
+        # Для событий: (id, date_time, status, [(name, type, options)], [offset минут])
+        self.events = []
+
+    def bulk(self, model, rows):
+        """Вставить строки из итератора пачками по chunk"""
+        table = model.__table__
+        batch, total = [], 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.chunk:
+                self.conn.execute(insert(table), batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            self.conn.execute(insert(table), batch)
+            total += len(batch)
+        self.counts[table.name] = self.counts.get(table.name, 0) + total
+
+    # --- справочники ---
+
+    def users(self, count: int, admins: int, assistants: int):
+        rng = self.rng
+        for i in range(1, count + 1):
+            if i <= admins:
+                role = UserRole.ADMIN
+            elif i <= admins + assistants:
+                role = UserRole.ASSISTANT
+            else:
+                role = UserRole.USER
+            yield {
+                "id": i,
+                "telegram_id": TELEGRAM_ID_BASE + i,
+                "username": f"user{i}" if rng.random() < 0.7 else None,
+                "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "role": role,
+                "created_at": self.now - timedelta(minutes=rng.randint(0, 525600)),
+            }
+
+    def templates(self, count: int):
+        for i in range(1, count + 1):
+            absolute = i % 10 == 0
+            yield {
+                "id": i,
+                "name": f"Шаблон {i}",
+                "time_before_event": None if absolute else TEMPLATE_OFFSETS[i % len(TEMPLATE_OFFSETS)],
+                "absolute_datetime": self.now + timedelta(days=i) if absolute else None,
+                "message_template": "Напоминаем о событии {event_title} {event_date}",
+                "created_at": self.now,
+            }
+
+    # --- события ---
+
+    def plan_events(self, count: int, admins: int, templates: int):
+        rng = self.rng
+        events, fields, notifications = [], [], []
+        field_id = notification_id = 0
+        for event_id in range(1, count + 1):
+            date_time = self.now + timedelta(minutes=rng.randint(-365 * 1440, 90 * 1440))
+            if rng.random() < 0.05:
+                status = EventStatus.DRAFT
+            elif date_time < self.now:
+                status = EventStatus.ARCHIVED if rng.random() < 0.8 else EventStatus.ACTIVE
+            else:
+                status = EventStatus.ACTIVE if rng.random() < 0.7 else EventStatus.APPROVED
+            events.append({
+                "id": event_id,
+                "title": f"{rng.choice(TITLES)} {rng.choice(TOPICS)} #{event_id}",
+                "description": "Описание события. " * rng.randint(1, 20),
+                "date_time": date_time,
+                "status": status,
+                "created_by": rng.randint(1, max(1, admins)),
+                "max_participants": rng.choice((None, None, 20, 50, 100, 500)),
+                "archived_registrations_count": 0,
+                "created_at": date_time - timedelta(days=rng.randint(1, 60)),
+                "updated_at": self.now,
+            })
+
+            schema = rng.sample(FIELD_POOL, rng.randint(1, 6))
+            for order, (name, field_type, options) in enumerate(schema):
+                field_id += 1
+                fields.append({
+                    "id": field_id, "event_id": event_id, "field_name": name, "field_type": field_type,
+                    "required": rng.random() < 0.7, "order": order, "options": options,
+                })
+
+            offsets = []
+            for _ in range(rng.choice((0, 1, 1, 2, 3))):
+                notification_id += 1
+                template_id = rng.randint(1, templates) if templates and rng.random() < 0.6 else None
+                offset = TEMPLATE_OFFSETS[template_id % len(TEMPLATE_OFFSETS)] if template_id else rng.choice(TEMPLATE_OFFSETS)
+                offsets.append(offset)
+                notifications.append({
+                    "id": notification_id, "event_id": event_id, "template_id": template_id,
+                    "custom_time": None if template_id else offset,
+                    "enabled": rng.random() < 0.9, "include_buttons": rng.random() < 0.8,
+                    "notification_recipients": None,
+                })
+            self.events.append((event_id, date_time, status, schema, offsets))
+        return events, fields, notifications
+
+    def permissions(self, admins: int, assistants: int):
+        rng = self.rng
+        permission_id = 0
+        for user_id in range(admins + 1, admins + assistants + 1):
+            for event_id in rng.sample(range(1, len(self.events) + 1), min(len(self.events), rng.randint(1, 10))):
+                permission_id += 1
+                yield {
+                    "id": permission_id, "user_id": user_id, "event_id": event_id,
+                    "can_edit": rng.random() < 0.5, "can_view_registrations": True,
+                    "can_send_notifications": rng.random() < 0.7, "created_at": self.now,
+                }
+
+    # --- регистрации и уведомления ---
+
+    def field_value(self, field_type, options, n: int):
+        rng = self.rng
+        if field_type == FieldType.EMAIL:
+            return f"user{n}@example.com"
+        if field_type == FieldType.PHONE:
+            return f"+7 9{rng.randint(10, 99)} {rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}"
+        if field_type == FieldType.NUMBER:
+            return str(rng.randint(16, 70))
+        if field_type == FieldType.DATE:
+            return f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(1960, 2008)}"
+        if field_type == FieldType.SELECT:
+            return rng.choice(options)
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+    def registration_plan(self, total: int, users: int):
+        """Сколько регистраций на каждое событие: распределение с тяжёлым хвостом"""
+        rng = self.rng
+        open_events = [e for e in self.events if e[2] != EventStatus.DRAFT]
+        if not open_events or not total:
+            return []
+        weights = [rng.paretovariate(1.2) for _ in open_events]
+        scale = total / sum(weights)
+        plan = [(event, min(users, int(w * scale))) for event, w in zip(open_events, weights)]
+        # Добиваем остаток округления по событиям, где ещё есть свободные пользователи
+        missing = total - sum(size for _, size in plan)
+        index = 0
+        while missing > 0 and index < len(plan) * 2:
+            event, size = plan[index % len(plan)]
+            extra = min(missing, users - size)
+            plan[index % len(plan)] = (event, size + extra)
+            missing -= extra
+            index += 1
+        return plan
+
+    def reminder_jobs(self, overdue_ratio: float):
+        """Напоминание на каждое (событие, время); прошедшие разосланы, доля будущих - просрочена"""
+        rng = self.rng
+        job_id = 0
+        for event_id, date_time, status, schema, offsets in self.events:
+            if status == EventStatus.DRAFT:
+                continue
+            times = set()
+            for offset in offsets:
+                scheduled_time = date_time - timedelta(minutes=offset)
+                sent = scheduled_time < self.now
+                if not sent and rng.random() < overdue_ratio:
+                    # Просроченная очередь: как после простоя планировщика
+                    scheduled_time = self.now - timedelta(minutes=rng.randint(1, 600))
+                if scheduled_time in times:
+                    continue
+                times.add(scheduled_time)
+                job_id += 1
+                yield {
+                    "id": job_id, "event_id": event_id, "notification_type": "custom",
+                    "scheduled_time": scheduled_time, "sent": sent,
+                    "sent_at": scheduled_time if sent else None, "created_at": self.now,
+                }
+
+    def registrations_and_notifications(self, total: int, users: int, scheduled: int):
+        rng = self.rng
+        registrations, notifications = [], []
+        registration_id = notification_id = 0
+        for (event_id, date_time, status, schema, offsets), size in self.registration_plan(total, users):
+            for user_index in rng.sample(range(1, users + 1), size):
+                registration_id += 1
+                created_at = min(self.now, date_time) - timedelta(minutes=rng.randint(1, 43200))
+                registrations.append({
+                    "id": registration_id,
+                    "event_id": event_id,
+                    "user_telegram_id": TELEGRAM_ID_BASE + user_index,
+                    "data_json": {
+                        name: self.field_value(field_type, options, user_index)
+                        for name, field_type, options in schema
+                    },
+                    "confirmed": rng.choice((None, None, True, False)),
+                    "created_at": created_at,
+                })
+                for offset in offsets:
+                    if notification_id >= scheduled:
+                        break
+                    scheduled_time = date_time - timedelta(minutes=offset)
+                    if scheduled_time >= self.now:
+                        # Будущие напоминания - в reminder_jobs, здесь только история; в --scheduled не считаются
+                        continue
+                    notification_id += 1
+                    notifications.append({
+                        "id": notification_id,
+                        "event_id": event_id,
+                        "registration_id": registration_id,
+                        "notification_type": "custom",
+                        "scheduled_time": scheduled_time,
+                        "sent": True,
+                        "sent_at": scheduled_time,
+                        "created_at": created_at,
+                    })
+                if len(registrations) >= self.chunk:
+                    self.bulk(Registration, registrations)
+                    registrations = []
+                if len(notifications) >= self.chunk:
+                    self.bulk(ScheduledNotification, notifications)
+                    notifications = []
+        self.bulk(Registration, registrations)
+        self.bulk(ScheduledNotification, notifications)
+
+
+def reset_sequences(conn):
+    """После вставки явных id сдвинуть последовательности PostgreSQL"""
+    if conn.dialect.name != "postgresql":
+        return
+    for table in Base.metadata.sorted_tables:
+        if "id" in table.c:
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+            ))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Синтетические данные для нагрузочных тестов")
+    parser.add_argument("--url", help="URL БД вместо DATABASE_URL")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Пересоздать таблицы (все данные будут удалены)")
+    parser.add_argument("--users", type=int, default=150000)
+    parser.add_argument("--admins", type=int, default=3)
+    parser.add_argument("--assistants", type=int, default=50)
+    parser.add_argument("--events", type=int, default=3000)
+    parser.add_argument("--templates", type=int, default=30)
+    parser.add_argument("--registrations", type=int, default=500000)
+    parser.add_argument("--scheduled", type=int, default=350000, help="Строк истории ScheduledNotification")
+    parser.add_argument("--overdue-ratio", type=float, default=0.05, help="Доля просроченных неразосланных напоминаний")
+    parser.add_argument("--chunk", type=int, default=10000, help="Строк в одном INSERT")
+    parser.add_argument("--now", type=datetime.fromisoformat, help="Точка отсчёта дат (UTC, ISO), по умолчанию - текущее время")
+    args = parser.parse_args(argv)
+
+    target = make_engine("seed", pool_size=1, max_overflow=0, url=args.url) if args.url else default_engine
+    started = time.perf_counter()
+
+    if args.reset:
+        Base.metadata.drop_all(bind=target)
+    Base.metadata.create_all(bind=target)
+
+    with target.begin() as conn:
+        for table in (User, Event, Registration):
+            if conn.execute(select(func.count()).select_from(table)).scalar():
+                print(f"Таблица {table.__tablename__} не пуста - используйте --reset")
+                return 1
+
+        if is_sqlite(str(target.url)):
+            # Данные одноразовые: скорость важнее устойчивости к сбою питания
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+
+        seeder = Seeder(conn, args.seed, args.chunk, args.now)
+        seeder.bulk(User, seeder.users(args.users, args.admins, args.assistants))
+        seeder.bulk(NotificationTemplate, seeder.templates(args.templates))
+        events, fields, notifications = seeder.plan_events(args.events, args.admins, args.templates)
+        seeder.bulk(Event, events)
+        seeder.bulk(EventField, fields)
+        seeder.bulk(EventNotification, notifications)
+        seeder.bulk(UserEventPermission, seeder.permissions(args.admins, args.assistants))
+        seeder.bulk(ReminderJob, seeder.reminder_jobs(args.overdue_ratio))
+        seeder.registrations_and_notifications(args.registrations, args.users, args.scheduled)
+        reset_sequences(conn)
+
+    elapsed = time.perf_counter() - started
+    total = sum(seeder.counts.values())
+    for name, count in seeder.counts.items():
+        print(f"{name:<28} {count:>9}")
+    print(f"Всего {total} строк за {elapsed:.1f} с ({total / elapsed:.0f} строк/с)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
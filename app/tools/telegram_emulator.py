@@ -0,0 +1,251 @@
+"""
+Локальный эмулятор Telegram Bot API для нагрузочного тестирования исходящего трафика.
+
+Поддерживает методы, которыми пользуется бот (sendMessage, sendPhoto, sendDocument,
+editMessageText, answerCallbackQuery, getFile, getUpdates, getMe, deleteWebhook), и ведёт
+себя как настоящий API под нагрузкой:
+- глобальный лимит и лимит на чат -> 429 с parameters.retry_after;
+- часть чатов «заблокировала бота» -> 403;
+- задержка ответа (latency ± jitter).
+
+Запуск из каталога app/:
+    python -m tools.telegram_emulator --port 8081 --global-rate 30 --chat-rate 1 --blocked-ratio 0.05
+
+Бот, планировщик и API направляются на эмулятор настройкой
+    TELEGRAM_API_BASE_URL=http://127.0.0.1:8081
+
+Служебные адреса:
+    GET  /emulator/stats    - счётчики по методам, 429 и 403
+    POST /emulator/updates  - поставить апдейты (JSON-объект или список) в очередь getUpdates
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import zlib
+from collections import Counter, defaultdict, deque
+from aiohttp import web
+
+SEND_METHODS = {"sendmessage", "sendphoto", "senddocument", "editmessagetext"}
+
+
+class SlidingWindow:
+    """Не больше `limit` событий за последние `period` секунд"""
+
+    def __init__(self, limit: float, period: float = 1.0):
+        self.limit = limit
+        self.period = period
+        self.hits = deque()
+
+    def retry_after(self, now: float) -> int:
+        """0, если событие укладывается в лимит, иначе секунды до повтора"""
+        while self.hits and now - self.hits[0] >= self.period:
+            self.hits.popleft()
+        if len(self.hits) >= self.limit:
+            return max(1, int(self.hits[0] + self.period - now + 0.999))
+        return 0
+
+    def hit(self, now: float):
+        self.hits.append(now)
+
+
+class TelegramEmulator:
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        group_rate_per_minute: float = 20,
+        blocked_ratio: float = 0.0,
+        blocked=(),
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        seed: int = 0,
+    ):
+        self.global_window = SlidingWindow(global_rate) if global_rate else None
+        self.chat_rate = chat_rate
+        self.group_rate_per_minute = group_rate_per_minute
+        self.chat_windows = {}
+        self.blocked_ratio = blocked_ratio
+        self.blocked = set(blocked)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.random = random.Random(seed)
+        self.updates = asyncio.Queue()
+        self.stats = defaultdict(Counter)
+        self.message_id = 0
+
+    # --- правила ---
+
+    def is_blocked(self, chat_id: int) -> bool:
+        if chat_id in self.blocked:
+            return True
+        # Детерминированно по chat_id: один и тот же пользователь всегда «заблокирован»
+        return self.blocked_ratio > 0 and zlib.crc32(str(chat_id).encode()) % 10000 < self.blocked_ratio * 10000
+
+    def chat_window(self, chat_id: int) -> SlidingWindow:
+        window = self.chat_windows.get(chat_id)
+        if window is None:
+            if chat_id < 0:
+                window = SlidingWindow(self.group_rate_per_minute, period=60)
+            else:
+                window = SlidingWindow(self.chat_rate)
+            self.chat_windows[chat_id] = window
+        return window
+
+    def check_limits(self, chat_id: int) -> int:
+        """Секунды до повтора; отклонённый запрос в лимитах не учитывается"""
+        now = time.monotonic()
+        windows = [self.chat_window(chat_id)] if self.chat_rate else []
+        if self.global_window:
+            windows.append(self.global_window)
+        retry_after = max((window.retry_after(now) for window in windows), default=0)
+        if not retry_after:
+            for window in windows:
+                window.hit(now)
+        return retry_after
+
+    # --- ответы ---
+
+    @staticmethod
+    def ok(result) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    @staticmethod
+    def error(code: int, description: str, **parameters) -> web.Response:
+        body = {"ok": False, "error_code": code, "description": description}
+        if parameters:
+            body["parameters"] = parameters
+        return web.json_response(body, status=code)
+
+    def message(self, chat_id: int, params: dict) -> dict:
+        self.message_id += 1
+        result = {
+            "message_id": int(params.get("message_id") or self.message_id),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+        }
+        if "text" in params:
+            result["text"] = params["text"]
+        if "caption" in params:
+            result["caption"] = params["caption"]
+        return result
+
+    async def read_params(self, request: web.Request) -> dict:
+        if request.content_type == "application/json":
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            # Файлы (sendPhoto/sendDocument) приходят как FileField - содержимое не нужно
+            params[key] = value if isinstance(value, str) else getattr(value, "filename", key)
+        params.update(request.query)
+        return params
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        name = method.lower()
+        params = await self.read_params(request)
+        self.stats["requests"][method] += 1
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+
+        if name == "getupdates":
+            return self.ok(await self.get_updates(params))
+        if name == "getme":
+            return self.ok({"id": 123456, "is_bot": True, "first_name": "Emulator", "username": "emulator_bot"})
+        if name in ("deletewebhook", "answercallbackquery"):
+            return self.ok(True)
+        if name == "getfile":
+            file_id = params.get("file_id", "file")
+            return self.ok({
+                "file_id": file_id, "file_unique_id": file_id, "file_size": 1024,
+                "file_path": f"documents/{file_id}",
+            })
+        if name not in SEND_METHODS:
+            self.stats["errors"]["404"] += 1
+            return self.error(404, "Not Found: method not found")
+
+        try:
+            chat_id = int(params["chat_id"])
+        except (KeyError, ValueError):
+            self.stats["errors"]["400"] += 1
+            return self.error(400, "Bad Request: chat not found")
+
+        if self.is_blocked(chat_id):
+            self.stats["errors"]["403"] += 1
+            return self.error(403, "Forbidden: bot was blocked by the user")
+
+        retry_after = self.check_limits(chat_id)
+        if retry_after:
+            self.stats["errors"]["429"] += 1
+            return self.error(429, f"Too Many Requests: retry after {retry_after}", retry_after=retry_after)
+
+        self.stats["delivered"][method] += 1
+        return self.ok(self.message(chat_id, params))
+
+    async def get_updates(self, params: dict) -> list:
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        updates = []
+        try:
+            updates.append(await asyncio.wait_for(self.updates.get(), timeout=timeout) if timeout else self.updates.get_nowait())
+        except (asyncio.TimeoutError, asyncio.QueueEmpty):
+            return []
+        while len(updates) < limit and not self.updates.empty():
+            updates.append(self.updates.get_nowait())
+        return updates
+
+    async def handle_file(self, request: web.Request) -> web.Response:
+        self.stats["requests"]["file"] += 1
+        return web.Response(body=b"\0" * 1024, content_type="application/octet-stream")
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({key: dict(value) for key, value in self.stats.items()})
+
+    async def handle_enqueue(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        for update in payload if isinstance(payload, list) else [payload]:
+            await self.updates.put(update)
+        return web.json_response({"queued": self.updates.qsize()})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/emulator/stats", self.handle_stats)
+        app.router.add_post("/emulator/updates", self.handle_enqueue)
+        app.router.add_get("/file/bot{token}/{path:.+}", self.handle_file)
+        app.router.add_route("*", "/bot{token}/{method}", self.handle_method)
+        return app
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Эмулятор Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--global-rate", type=float, default=30, help="Сообщений в секунду на бота (0 - без лимита)")
+    parser.add_argument("--chat-rate", type=float, default=1, help="Сообщений в секунду в один личный чат (0 - без лимита)")
+    parser.add_argument("--group-rate", type=float, default=20, help="Сообщений в минуту в одну группу")
+    parser.add_argument("--blocked-ratio", type=float, default=0.0, help="Доля чатов, заблокировавших бота")
+    parser.add_argument("--blocked", default="", help="chat_id, заблокировавшие бота, через запятую")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    emulator = TelegramEmulator(
+        global_rate=args.global_rate,
+        chat_rate=args.chat_rate,
+        group_rate_per_minute=args.group_rate,
+        blocked_ratio=args.blocked_ratio,
+        blocked=[int(v) for v in args.blocked.split(",") if v],
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        seed=args.seed,
+    )
+    print(f"TELEGRAM_API_BASE_URL=http://{args.host}:{args.port}")
+    web.run_app(emulator.app(), host=args.host, port=args.port, print=None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
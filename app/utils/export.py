@@ -1,8 +1,6 @@
 import csv
 import io
 from typing import List, Dict
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
 from sqlalchemy.orm import Session
 from database.models import Event, Registration, User
 
@@ -55,6 +53,10 @@ def export_registrations_to_csv(db: Session, event_id: int) -> str:
 
 def export_registrations_to_excel(db: Session, event_id: int) -> bytes:
     """Экспорт регистраций на событие в Excel"""
+    # openpyxl импортируется ~0.1 с - только при первом экспорте, а не при старте
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment
+    
     event = db.query(Event).filter(Event.id == event_id).first()
     if not event:
         raise ValueError("Событие не найдено")
@@ -0,0 +1,183 @@
+"""
+Логирование без записи в stderr из горячего пути.
+
+Handlers и планировщик кладут записи в очередь (QueueHandler), а форматирование и
+запись выполняет отдельный поток QueueListener. Записи ниже WARNING от «шумных»
+логгеров проходят через ограничение частоты (LOG_RATE_LIMITS) и сэмплирование
+(LOG_SAMPLING) ещё до постановки в очередь - отброшенная запись почти ничего не стоит.
+Предупреждения и ошибки не ограничиваются никогда.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Атрибуты LogRecord, которые не являются пользовательскими полями из extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON; поля из extra= попадают в объект как есть"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def parse_rules(raw: str) -> Dict[str, float]:
+    """'services.notification_service=20,api.routes.events=0.1' -> {логгер: число}"""
+    rules = {}
+    for part in (raw or "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name and value:
+            rules[name.strip()] = float(value)
+    return rules
+
+
+class _Bucket:
+    __slots__ = ("rate", "tokens", "updated", "suppressed")
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.suppressed = 0
+
+
+class HotLoopFilter(logging.Filter):
+    """Ограничение частоты и сэмплирование записей ниже WARNING по логгерам.
+
+    Правило для `services` действует и на `services.notification_service`.
+    Число отброшенных записей добавляется к следующей пропущенной как поле `suppressed`.
+    """
+
+    def __init__(self, rate_limits: Dict[str, float], sampling: Dict[str, float]):
+        super().__init__()
+        self.rate_limits = rate_limits
+        self.sampling = sampling
+        self._rules: Dict[str, Tuple[Optional[_Bucket], Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _lookup(rules: Dict[str, float], name: str) -> Optional[float]:
+        while name:
+            if name in rules:
+                return rules[name]
+            name = name.rpartition(".")[0]
+        return None
+
+    def _rule(self, name: str):
+        rule = self._rules.get(name)
+        if rule is None:
+            rate = self._lookup(self.rate_limits, name)
+            rule = self._rules[name] = (
+                _Bucket(rate) if rate else None,
+                self._lookup(self.sampling, name),
+            )
+        return rule
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        bucket, ratio = self._rule(record.name)
+        if ratio is not None and random.random() >= ratio:
+            return False
+        if bucket is None:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            bucket.tokens = min(bucket.rate, bucket.tokens + (now - bucket.updated) * bucket.rate)
+            bucket.updated = now
+            if bucket.tokens < 1:
+                bucket.suppressed += 1
+                return False
+            bucket.tokens -= 1
+            if bucket.suppressed:
+                record.suppressed = bucket.suppressed
+                bucket.suppressed = 0
+        return True
+
+
+class _QueueHandler(QueueHandler):
+    """Как QueueHandler, но трейсбек остаётся отдельным полем, а не частью сообщения"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    fmt: Optional[str] = None,
+    rate_limits: Optional[str] = None,
+    sampling: Optional[str] = None,
+    stream=None,
+) -> QueueListener:
+    """Настроить корневой логгер: очередь + поток-писатель. Параметры по умолчанию - из настроек"""
+    global _listener
+    from config import settings
+
+    shutdown_logging()
+    output = logging.StreamHandler(stream or sys.stderr)
+    if (fmt or settings.LOG_FORMAT).lower() == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    records = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(HotLoopFilter(
+        parse_rules(settings.LOG_RATE_LIMITS if rate_limits is None else rate_limits),
+        parse_rules(settings.LOG_SAMPLING if sampling is None else sampling),
+    ))
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel((level or settings.LOG_LEVEL).upper())
+
+    _listener = QueueListener(records, output)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Дописать очередь и остановить поток-писатель"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,141 @@
+"""
+Сторож event loop'а: непрерывно измеряет задержку (lag) и ловит синхронный код,
+надолго занявший loop (SQLAlchemy, openpyxl, чтение файлов в async handler'ах).
+
+- Корутина-пульс раз в `interval` засыпает и меряет, насколько позже проснулась:
+  это и есть lag, он идёт в гистограмму и в скользящее окно для перцентилей.
+- Поток-сторож следит за временем последнего пульса. Если loop не отвечает дольше
+  `threshold`, сторож снимает стек потока loop'а, определяет выполняющуюся задачу
+  и пишет в лог handler и тип апдейта, которые её создали (см. track()).
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Задача -> (handler, тип апдейта); пишется из loop'а, читается потоком-сторожем
+_inflight: Dict[asyncio.Task, Tuple[str, str]] = {}
+
+STACK_LIMIT = 15
+
+
+@contextmanager
+def track(label: str, kind: str):
+    """Привязать текущую задачу к handler'у и типу апдейта для отчётов о блокировках"""
+    task = asyncio.current_task()
+    if task is None:
+        yield
+        return
+    previous = _inflight.get(task)
+    _inflight[task] = (label, kind)
+    try:
+        yield
+    finally:
+        if previous is None:
+            _inflight.pop(task, None)
+        else:
+            _inflight[task] = previous
+
+
+class LoopWatchdog:
+    def __init__(self, interval_ms: int = 100, threshold_ms: int = 250, window: int = 600):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.recent = deque(maxlen=window)
+        self.last_beat = time.monotonic()
+        self._loop = None
+        self._thread_id = None
+        self._task = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Запустить из работающего event loop'а"""
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self._task = self._loop.create_task(self._heartbeat())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+        metrics.REGISTRY.on_scrape(self.refresh_metrics)
+        logger.info(
+            f"Event loop watchdog started: interval={self.interval * 1000:.0f} ms, "
+            f"threshold={self.threshold * 1000:.0f} ms"
+        )
+
+    def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.last_beat = now
+            self.recent.append(lag)
+            metrics.EVENT_LOOP_LAG.observe(lag)
+
+    def _watch(self):
+        reported = False
+        # Проверяем чаще порога, чтобы застать блокировку, пока она ещё идёт
+        check_every = max(self.threshold / 4, 0.01)
+        while not self._stopped.wait(check_every):
+            blocked = time.monotonic() - self.last_beat - self.interval
+            if blocked < self.threshold:
+                reported = False
+                continue
+            if not reported:
+                # Одна запись на блокировку: стек снят в момент, когда loop уже занят дольше порога
+                reported = True
+                self._report(blocked)
+
+    def _report(self, blocked: float):
+        task = asyncio.current_task(self._loop)
+        label, kind = _inflight.get(task, ("unknown", "unknown")) if task is not None else ("unknown", "-")
+        frame = sys._current_frames().get(self._thread_id)
+        stack = "".join(traceback.format_stack(frame, limit=STACK_LIMIT)) if frame is not None else ""
+        metrics.EVENT_LOOP_BLOCKS.labels(label).inc()
+        logger.warning(
+            f"Event loop blocked for {blocked * 1000:.0f}+ ms by {label} ({kind}), "
+            f"task {task.get_name() if task is not None else '-'}\n{stack}"
+        )
+
+    def percentile(self, pct: float) -> float:
+        values = sorted(self.recent)
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(pct / 100 * len(values)))]
+
+    def refresh_metrics(self):
+        """Перцентили lag за последние `window` пульсов (для /metrics)"""
+        for pct in (50, 90, 99):
+            metrics.EVENT_LOOP_LAG_QUANTILE.labels(str(pct / 100)).set(self.percentile(pct))
+        metrics.EVENT_LOOP_LAG_MAX.set(max(self.recent, default=0.0))
+
+
+_watchdog: Optional[LoopWatchdog] = None
+
+
+def start_loop_watchdog(interval_ms: int, threshold_ms: int) -> LoopWatchdog:
+    """Запустить сторожа для текущего loop'а (один на процесс)"""
+    global _watchdog
+    if _watchdog is None:
+        _watchdog = LoopWatchdog(interval_ms, threshold_ms)
+        _watchdog.start()
+    return _watchdog
+
+
+def stop_loop_watchdog():
+    global _watchdog
+    if _watchdog is not None:
+        _watchdog.stop()
+        _watchdog = None
@@ -0,0 +1,267 @@
+"""
+Метрики в текстовом формате Prometheus без внешних зависимостей.
+
+Счётчики и гистограммы обновляются под короткой блокировкой (доли микросекунды),
+дорогие значения (очередь уведомлений, пулы БД) считаются только при чтении /metrics
+через хуки `on_scrape`.
+"""
+import logging
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_labels(self.labelnames, values)} {child.value}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts, total = list(child.counts), child.sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), values + (le,))} {cumulative}")
+        label_str = _labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{label_str} {total}")
+        lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._scrape_hooks: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def on_scrape(self, hook: Callable[[], None]):
+        """Функция, обновляющая «дорогие» gauge перед каждым чтением метрик"""
+        if hook not in self._scrape_hooks:
+            self._scrape_hooks.append(hook)
+
+    def render(self) -> str:
+        for hook in self._scrape_hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.warning(f"Metrics hook {hook.__name__} failed: {e}")
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# --- Бот ---
+UPDATE_SECONDS = histogram("mclassbot_update_duration_seconds", "Время обработки апдейта", ("handler",))
+UPDATE_ERRORS = counter("mclassbot_update_errors_total", "Апдейты, завершившиеся исключением", ("handler",))
+UPDATE_QUERIES = histogram(
+    "mclassbot_update_db_queries", "SQL-запросов на апдейт", ("handler",), buckets=COUNT_BUCKETS
+)
+UPDATE_DB_SECONDS = histogram("mclassbot_update_db_seconds", "Время SQL-запросов на апдейт", ("handler",))
+
+# --- API ---
+HTTP_SECONDS = histogram("mclassbot_http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route", "status"))
+HTTP_QUERIES = histogram(
+    "mclassbot_http_db_queries", "SQL-запросов на HTTP-запрос", ("route",), buckets=COUNT_BUCKETS
+)
+
+# --- БД ---
+DB_QUERY_SECONDS = histogram("mclassbot_db_query_duration_seconds", "Время выполнения SQL-запроса", ("pool",), buckets=QUERY_BUCKETS)
+DB_POOL_CHECKED_OUT = gauge("mclassbot_db_pool_checked_out", "Выданные соединения пула", ("pool",))
+DB_POOL_WAIT_SECONDS = gauge("mclassbot_db_pool_wait_seconds_total", "Суммарное ожидание соединения", ("pool",))
+DB_POOL_TIMEOUTS = gauge("mclassbot_db_pool_timeouts_total", "Таймауты получения соединения", ("pool",))
+DB_BUDGET_EXCEEDED = counter(
+    "mclassbot_db_budget_exceeded_total", "Апдейты и HTTP-запросы, превысившие бюджет SQL-запросов", ("source",)
+)
+
+# --- Telegram API ---
+TELEGRAM_SECONDS = histogram("mclassbot_telegram_request_duration_seconds", "Время запроса к Bot API", ("method",))
+TELEGRAM_ERRORS = counter("mclassbot_telegram_errors_total", "Ошибки Bot API", ("method", "code"))
+
+# --- Уведомления ---
+OUTBOUND_MESSAGES = counter(
+    "mclassbot_outbound_messages_total", "Отправленные уведомления и рассылки", ("source", "result")
+)
+OUTBOUND_QUEUE_DEPTH = gauge("mclassbot_outbound_queue_depth", "Запросы, ждущие очереди отправки", ("priority",))
+OUTBOUND_QUEUE_WAIT = histogram(
+    "mclassbot_outbound_queue_wait_seconds", "Ожидание в очереди отправки до запроса к Bot API", ("priority",)
+)
+OUTBOX_MESSAGES = gauge("mclassbot_outbox_messages", "Незавершённые строки outbox", ("status",))
+SCHEDULER_TICK_SECONDS = histogram("mclassbot_scheduler_tick_duration_seconds", "Длительность прохода планировщика")
+SCHEDULER_LEADER = gauge("mclassbot_scheduler_leader", "1 - реплика-лидер выполняет фоновые задачи планировщика")
+SCHEDULER_LAG = gauge("mclassbot_scheduler_lag_seconds", "Сейчас минус самое раннее неотправленное scheduled_time")
+ORGANIZER_DIGEST_EVENTS = counter(
+    "mclassbot_organizer_digest_events_total", "Ответы участников, попавшие в сводки организаторам", ("kind",)
+)
+ORGANIZER_DIGEST_PENDING = gauge("mclassbot_organizer_digest_pending", "Ответы в буфере сводок, ещё не отправленные")
+ORGANIZER_RECIPIENTS_CACHE = counter(
+    "mclassbot_organizer_recipients_cache_total", "Обращения к кэшу получателей сообщений организаторам", ("result",)
+)
+REMINDERS_DROPPED = counter(
+    "mclassbot_reminders_dropped_total", "Напоминания, закрытые без отправки (опоздали, событие началось)", ("reason",)
+)
+NOTIFICATIONS_PENDING = gauge("mclassbot_notifications_pending", "Неразосланные напоминания, срок которых наступил")
+
+# --- Event loop ---
+EVENT_LOOP_LAG = histogram("mclassbot_event_loop_lag_seconds", "Задержка пробуждения пульса event loop'а", buckets=QUERY_BUCKETS)
+EVENT_LOOP_LAG_QUANTILE = gauge(
+    "mclassbot_event_loop_lag_quantile_seconds", "Перцентили задержки event loop'а в скользящем окне", ("quantile",)
+)
+EVENT_LOOP_LAG_MAX = gauge("mclassbot_event_loop_lag_max_seconds", "Максимальная задержка event loop'а в скользящем окне")
+EVENT_LOOP_BLOCKS = counter(
+    "mclassbot_event_loop_blocks_total", "Блокировки event loop'а дольше порога", ("handler",)
+)
+
+
+def register_default_collectors():
+    """Хуки для метрик, которые читаются из БД при каждом scrape"""
+    from database.instrumentation import refresh_pool_metrics
+    from services.notification_service import refresh_queue_metrics
+    from services.outbox import refresh_outbox_metrics
+
+    REGISTRY.on_scrape(refresh_pool_metrics)
+    REGISTRY.on_scrape(refresh_queue_metrics)
+    REGISTRY.on_scrape(refresh_outbox_metrics)
+
+
+async def start_metrics_server(host: str, port: int):
+    """HTTP-экспортер /metrics для процесса бота (polling-режим)"""
+    import asyncio
+    from aiohttp import web
+
+    async def handle(request):
+        body = await asyncio.get_running_loop().run_in_executor(None, REGISTRY.render)
+        return web.Response(body=body.encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Metrics exporter listening on http://{host}:{port}/metrics")
+    return runner
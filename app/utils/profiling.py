@@ -0,0 +1,182 @@
+"""
+Профилирование по запросу: статистический сэмплер стеков для следующих N апдейтов
+(HTTP-запросов) или T секунд, с фильтром по handler'у или префиксу callback_data/пути.
+
+Пока профилирование не запущено, middleware делает одну проверку `active_session() is None`
+и сразу передаёт апдейт дальше; поток-сэмплер существует только во время сессии.
+
+Сэмплер раз в `interval` снимает стек потока event loop (sys._current_frames), но только
+пока выполняется хотя бы один подходящий апдейт. Результат - формат «collapsed stacks»
+(`func (file:line);func (file:line) count`), его понимают flamegraph.pl, speedscope и inferno.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Кадры самого event loop'а одинаковы во всех стеках и только раздувают flamegraph
+_SKIP_FILES = (os.path.join("asyncio", "events.py"), os.path.join("asyncio", "base_events.py"))
+
+
+class ProfilingSession:
+    """Одна сессия профилирования"""
+
+    def __init__(self, prefix: str = "", max_updates: int = 0, seconds: float = 0, interval: float = 0.005):
+        self.prefix = prefix
+        self.max_updates = max_updates
+        self.interval = interval
+        self.started_at = datetime.utcnow()
+        self.started = time.monotonic()
+        self.deadline = self.started + seconds if seconds else None
+        self.samples = Counter()
+        self.updates = 0
+        self.inflight = 0
+        self.finished = False
+        self.duration = 0.0
+        self._on_finish = None
+        self._loop = None
+        self._thread_id = None
+
+    def matches(self, *names: Optional[str]) -> bool:
+        """Подходит ли апдейт под фильтр: handler, callback_data, путь HTTP-запроса"""
+        if not self.prefix:
+            return True
+        return any(name and name.startswith(self.prefix) for name in names)
+
+    @contextmanager
+    def track(self):
+        """Отметить выполнение подходящего апдейта: стеки снимаются только в это время"""
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self.updates += 1
+            if self.max_updates and self.updates >= self.max_updates:
+                _finish(self)
+
+    def describe(self) -> str:
+        target = f"'{self.prefix}'" if self.prefix else "все апдейты"
+        return (
+            f"Фильтр: {target}\n"
+            f"Апдейтов: {self.updates}, сэмплов: {sum(self.samples.values())}, "
+            f"длительность: {self.duration:.1f} с"
+        )
+
+
+_session: Optional[ProfilingSession] = None
+_last_session: Optional[ProfilingSession] = None
+_lock = threading.Lock()
+
+
+def active_session() -> Optional[ProfilingSession]:
+    return _session
+
+
+def last_session() -> Optional[ProfilingSession]:
+    """Последняя завершённая сессия (для выгрузки через API)"""
+    return _last_session
+
+
+def start_profiling(
+    prefix: str = "",
+    updates: int = 0,
+    seconds: float = 0,
+    interval_ms: int = 5,
+    on_finish: Optional[Callable[[ProfilingSession], Awaitable[None]]] = None,
+) -> ProfilingSession:
+    """Запустить сессию из event loop'а, который нужно профилировать.
+
+    `on_finish` - корутина, вызываемая в этом же loop'е после завершения сессии
+    (по числу апдейтов, по времени или через stop_profiling).
+    """
+    global _session
+    if not updates and not seconds:
+        raise ValueError("Укажите число апдейтов или длительность")
+    session = ProfilingSession(prefix, updates, seconds, interval_ms / 1000)
+    session._on_finish = on_finish
+    session._loop = asyncio.get_running_loop()
+    session._thread_id = threading.get_ident()
+    with _lock:
+        if _session is not None:
+            raise RuntimeError("Профилирование уже запущено")
+        _session = session
+    threading.Thread(target=_sample_loop, args=(session,), name="profiler", daemon=True).start()
+    logger.info(f"Profiling started: prefix={prefix!r} updates={updates} seconds={seconds}")
+    return session
+
+
+def stop_profiling() -> Optional[ProfilingSession]:
+    """Досрочно завершить текущую сессию"""
+    session = _session
+    if session is not None:
+        _finish(session)
+    return session
+
+
+def _finish(session: ProfilingSession):
+    global _session, _last_session
+    with _lock:
+        if session.finished:
+            return
+        session.finished = True
+        session.duration = time.monotonic() - session.started
+        if _session is session:
+            _session = None
+        _last_session = session
+    logger.info(f"Profiling finished: {session.updates} updates, {sum(session.samples.values())} samples")
+    if session._on_finish is not None:
+        # _finish вызывается и из потока-сэмплера (по таймеру), и из loop'а
+        session._loop.call_soon_threadsafe(_schedule_callback, session)
+
+
+def _schedule_callback(session: ProfilingSession):
+    task = asyncio.ensure_future(session._on_finish(session))
+    task.add_done_callback(_log_callback_error)
+
+
+def _log_callback_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Не удалось отправить результат профилирования: {task.exception()}")
+
+
+def _collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        if not code.co_filename.endswith(_SKIP_FILES):
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    stack.reverse()
+    return ";".join(stack)
+
+
+def _sample_loop(session: ProfilingSession):
+    while not session.finished:
+        time.sleep(session.interval)
+        if session.deadline is not None and time.monotonic() >= session.deadline:
+            _finish(session)
+            break
+        if not session.inflight:
+            continue
+        frame = sys._current_frames().get(session._thread_id)
+        if frame is not None:
+            session.samples[_collapse(frame)] += 1
+
+
+def render_collapsed(session: ProfilingSession) -> bytes:
+    """Стеки в формате collapsed (одна строка на стек, самые частые первыми)"""
+    lines = [f"{stack} {count}" for stack, count in session.samples.most_common()]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def result_filename(session: ProfilingSession, source: str) -> str:
+    return f"profile_{source}_{session.started_at:%Y%m%d_%H%M%S}.folded"
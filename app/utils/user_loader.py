@@ -0,0 +1,87 @@
+"""Пакетная загрузка пользователей в рамках одного апдейта"""
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy.orm import Session, object_session
+from database.models import User
+
+
+class UserLoader:
+    """
+    DataLoader для User: собирает запрошенные id, догружает недостающих
+    одним запросом с IN и кэширует результат до конца апдейта.
+
+    Загруженные объекты отсоединяются от сессии (expunge), поэтому их можно
+    читать и после commit/close сессии, которой они были загружены.
+    """
+
+    def __init__(self):
+        self._by_id: Dict[int, Optional[User]] = {}
+        self._by_telegram_id: Dict[int, Optional[User]] = {}
+
+    def prime(self, users: Iterable[User]):
+        """Положить уже загруженных пользователей в кэш"""
+        for u in users:
+            self._by_id[u.id] = u
+            self._by_telegram_id[u.telegram_id] = u
+            session = object_session(u)
+            if session is not None:
+                session.expunge(u)
+
+    def _fetch(self, db: Session, column, keys: List[int], cache: Dict[int, Optional[User]]):
+        missing = [k for k in dict.fromkeys(keys) if k is not None and k not in cache]
+        if not missing:
+            return
+        self.prime(db.query(User).filter(column.in_(missing)).all())
+        # Запоминаем и отсутствующих, чтобы не искать их повторно
+        for k in missing:
+            cache.setdefault(k, None)
+
+    def load_many(self, db: Session, user_ids: Iterable[int]) -> List[User]:
+        """Пользователи по User.id в порядке запроса (ненайденные пропускаются)"""
+        user_ids = list(user_ids)
+        self._fetch(db, User.id, user_ids, self._by_id)
+        return [u for u in (self._by_id.get(i) for i in dict.fromkeys(user_ids)) if u]
+
+    def load(self, db: Session, user_id: Optional[int]) -> Optional[User]:
+        """Пользователь по User.id"""
+        if user_id is None:
+            return None
+        self._fetch(db, User.id, [user_id], self._by_id)
+        return self._by_id.get(user_id)
+
+    def load_many_by_telegram_id(self, db: Session, telegram_ids: Iterable[int]) -> Dict[int, User]:
+        """Словарь telegram_id -> User (ненайденные пропускаются)"""
+        telegram_ids = list(telegram_ids)
+        self._fetch(db, User.telegram_id, telegram_ids, self._by_telegram_id)
+        return {
+            tid: self._by_telegram_id[tid]
+            for tid in telegram_ids
+            if self._by_telegram_id.get(tid)
+        }
+
+    def load_by_telegram_id(self, db: Session, telegram_id: int) -> Optional[User]:
+        """Пользователь по Telegram ID"""
+        self._fetch(db, User.telegram_id, [telegram_id], self._by_telegram_id)
+        return self._by_telegram_id.get(telegram_id)
+
+
+_current_loader: ContextVar[Optional[UserLoader]] = ContextVar("user_loader", default=None)
+
+
+def set_user_loader(loader: Optional[UserLoader]):
+    """Привязать загрузчик к текущему апдейту (возвращает токен для сброса)"""
+    return _current_loader.set(loader)
+
+
+def reset_user_loader(token):
+    """Отвязать загрузчик, установленный через set_user_loader"""
+    _current_loader.reset(token)
+
+
+def get_user_loader() -> UserLoader:
+    """
+    Загрузчик текущего апдейта. Вне апдейта (планировщик, API)
+    возвращается новый загрузчик без общего кэша.
+    """
+    loader = _current_loader.get()
+    return loader if loader is not None else UserLoader()